@@ -0,0 +1,431 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_pose.py
+
+키포인트 추출 / 채점 / 업로드 경로 벤치마크 (CPU, 합성 이미지 + 가짜 모델 -> 어디서 돌려도 같은 입력)
+
+- extract : 단계별 시간 (decode / infer / post-process / serialize / write) + images/s
+            infer 는 실제 UltraBackend / MPPoseBackend 코드에 가짜 모델(pose_models 풀)을 넣어 후처리까지 측정
+            run_pipeline 전체 처리량, extract_with_yolo(ultralytics 설치 시)도 포함
+- score   : pose_score.score_frames (greedy / optimal), GroupMatcher.match
+- api     : /capture, /capture_raw, /upload_video 를 프로세스 내 ASGI 클라이언트(TestClient)로 호출
+- 결과는 JSON 으로 저장, --compare 로 이전 결과와 비교해 --threshold 이상 느려지면 종료 코드 1
+
+    python benchmarks/bench_pose.py --out bench.json
+    python benchmarks/bench_pose.py --compare bench.json --threshold 0.15
+    python benchmarks/bench_pose.py --suite score --repeat 5
+    python benchmarks/bench_pose.py --backend ultra      # 실제 모델로 infer 측정 (설치된 경우)
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import datetime
+import statistics
+import contextlib
+from typing import Dict, Any, List, Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEBPAGE = os.path.join(ROOT, "webpage")
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+import make_pose_keypoints as mpk
+from pose_models import ModelPool
+
+# 결과 항목: name -> {"value", "unit", "better": "lower" | "higher"}
+RESULTS: Dict[str, Dict[str, Any]] = {}
+
+
+def record(name: str, value: float, unit: str, better: str = "lower"):
+    RESULTS[name] = {"value": round(float(value), 4), "unit": unit, "better": better}
+    print(f"  {name:<44} {value:12.3f} {unit}")
+
+
+def timeit(fn: Callable, repeat: int) -> float:
+    """median seconds of `repeat` runs (after one untimed warm-up run)"""
+    fn()
+    times = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def quiet():
+    """측정 대상 코드의 진행 로그([i/N], [save]) 숨김"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 1024.0 if sys.platform != "darwin" else rss / (1024.0 * 1024.0)
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024.0 * 1024.0)
+        except Exception:
+            return None
+
+
+# ---------------------------
+# 합성 입력 / 가짜 모델
+# ---------------------------
+
+def make_images(folder: str, n: int, w: int, h: int, seed: int = 0) -> List[str]:
+    rng = np.random.default_rng(seed)
+    mpk.has_cv2()
+    cv2 = mpk.cv2
+    paths = []
+    for i in range(n):
+        img = (rng.random((h // 8, w // 8, 3)) * 255).astype(np.uint8)
+        img = cv2.resize(img, (w, h), interpolation=cv2.INTER_LINEAR)   # JPEG 크기가 실제 사진과 비슷하도록 부드럽게
+        p = os.path.join(folder, f"{i + 1}.jpg")
+        cv2.imwrite(p, img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        paths.append(p)
+    return paths
+
+
+def fake_keypoints(rng, n_people: int, W: int, H: int) -> np.ndarray:
+    """(n, 17, 3) 사람 모양 키포인트 (몇 개는 score 0)"""
+    base = np.array([
+        [0, -3.2], [-.3, -3.4], [.3, -3.4], [-.6, -3.3], [.6, -3.3],
+        [-1, -2.4], [1, -2.4], [-1.4, -1.3], [1.4, -1.3], [-1.6, -.3], [1.6, -.3],
+        [-.6, 0], [.6, 0], [-.7, 1.6], [.7, 1.6], [-.7, 3.1], [.7, 3.1],
+    ], dtype=np.float32)
+    out = np.zeros((n_people, 17, 3), dtype=np.float32)
+    for i in range(n_people):
+        scale = H / 9.0 * rng.uniform(0.7, 1.0)
+        cx = W * (i + 0.5) / n_people
+        out[i, :, :2] = base * scale + [cx, H / 2] + rng.normal(0, scale * 0.08, (17, 2))
+        out[i, :, 2] = rng.uniform(0.4, 1.0, 17)
+        out[i, rng.random(17) < 0.1, 2] = 0.0
+    return out
+
+
+class _T:
+    """torch tensor 흉내 (.cpu().numpy())"""
+
+    def __init__(self, a):
+        self.a = a
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.a
+
+
+class _FakeYoloResult:
+    def __init__(self, kps: np.ndarray):
+        self.keypoints = type("K", (), {"data": _T(kps)})()
+        xy = kps[..., :2]
+        xyxy = np.concatenate([xy.min(axis=1), xy.max(axis=1)], axis=1) if len(kps) else np.zeros((0, 4))
+        self.boxes = type("B", (), {"conf": _T(np.full(len(kps), 0.9, np.float32)), "xyxy": _T(xyxy)})()
+
+
+class FakeYolo:
+    """ultralytics YOLO.predict 와 같은 모양의 결과 (이미지마다 1~4명, 시드 고정)"""
+
+    def __init__(self, infer_ms: float = 0.0):
+        self.infer_ms = infer_ms
+
+    def predict(self, source=None, **kw):
+        imgs = source if isinstance(source, list) else [source]
+        out = []
+        for img in imgs:
+            H, W = img.shape[:2]
+            rng = np.random.default_rng(int(img[0, 0].sum()) + W)
+            out.append(_FakeYoloResult(fake_keypoints(rng, 1 + int(rng.integers(0, 4)), W, H)))
+        if self.infer_ms:
+            time.sleep(self.infer_ms * len(imgs) / 1000.0)
+        return out
+
+
+class FakeMPPose:
+    """mediapipe Pose.process 결과 (33 landmarks, 정규화 좌표)"""
+
+    def process(self, img_rgb):
+        H, W = img_rgb.shape[:2]
+        rng = np.random.default_rng(int(img_rgb[0, 0].sum()))
+        kp = fake_keypoints(rng, 1, W, H)[0]
+        lms = []
+        for i in range(33):
+            x, y, s = kp[i % 17]
+            lms.append(type("L", (), {"x": x / W, "y": y / H, "visibility": float(s)})())
+        return type("R", (), {"pose_landmarks": type("P", (), {"landmark": lms})()})()
+
+
+def fake_pool(infer_ms: float) -> ModelPool:
+    return ModelPool(max_models=4, warmup=False, loaders={
+        "yolo": lambda w, i, d: (FakeYolo(infer_ms), lambda: None),
+        "mediapipe": lambda w, i, d: (FakeMPPose(), lambda: None),
+    })
+
+
+class BenchUltra(mpk.UltraBackend):
+    """UltraBackend 그대로 (가짜 모델 풀 주입, 설치 확인 생략)"""
+
+    def __init__(self, pool: ModelPool):
+        self.pool = pool
+
+
+class BenchMP(mpk.MPPoseBackend):
+    def __init__(self, pool: ModelPool):
+        self.pool = pool
+
+
+# ---------------------------
+# Suites
+# ---------------------------
+
+def bench_extract(args, workdir: str):
+    print("[extract]")
+    W, H = (int(v) for v in args.size.lower().split("x"))
+    folder = os.path.join(workdir, "matching", "1")
+    os.makedirs(folder)
+    imgs = make_images(folder, args.images, W, H)
+    pool = fake_pool(args.fake_infer_ms)
+
+    if args.backend == "fake":
+        backends = {"ultra": BenchUltra(pool), "mediapipe": BenchMP(pool)}
+    else:
+        backends = {args.backend: mpk.BACKENDS[mpk.resolve_backend(args.backend)]()}
+
+    # 단계별 (순차, 이미지당 평균)
+    for name, backend in backends.items():
+        decoder = mpk.make_decoder(backend)
+        stages = {"decode": [], "infer": [], "postprocess": [], "serialize": [], "write": []}
+        for _ in range(args.repeat):
+            for p in imgs:
+                t0 = time.perf_counter()
+                img, (w, h) = decoder(p)
+                t1 = time.perf_counter()
+                people = backend.infer(img, min_conf=0.3)
+                t2 = time.perf_counter()
+                mpk.rescale_people(people, img, w, h)
+                single_out, multi_out = mpk.build_outputs(people, w, h)
+                t3 = time.perf_counter()
+                payload = [json.dumps(o, ensure_ascii=False, indent=2) for o in (single_out, multi_out)]
+                t4 = time.perf_counter()
+                base = os.path.splitext(p)[0]
+                for ext, text in zip((".json", ".multi.json"), payload):
+                    with open(base + ext, "w", encoding="utf-8") as f:
+                        f.write(text)
+                t5 = time.perf_counter()
+                for k, v in zip(stages, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4)):
+                    stages[k].append(v)
+        for k, v in stages.items():
+            record(f"extract.{name}.{k}_ms", statistics.median(v) * 1000, "ms/img")
+        total = sum(statistics.median(v) for v in stages.values())
+        record(f"extract.{name}.sequential_ips", 1.0 / total, "img/s", "higher")
+
+    # 디코딩만: 원본 크기 vs 축소 디코딩 (YOLO 입력 640 기준)
+    for mode, min_size in (("full", 0), ("reduced", mpk.UltraBackend.input_size)):
+        decoder = mpk.ImageDecoder(min_size)
+        sec = timeit(lambda: [decoder(p) for p in imgs], args.repeat)
+        record(f"extract.decode_{mode}_ms", sec / len(imgs) * 1000, "ms/img")
+
+    # run_pipeline 전체 (decode 스레드 + 배치 추론 + writer 풀)
+    failed_dir = os.path.join(workdir, "matching", "failed")
+    os.makedirs(failed_dir, exist_ok=True)
+    first = next(iter(backends.values()))
+    with quiet():
+        sec = timeit(lambda: mpk.run_pipeline(imgs, first, True, 0.3, failed_dir,
+                                              batch_size=args.batch_size, workers=args.workers), args.repeat)
+    record("extract.pipeline_ips", len(imgs) / sec, "img/s", "higher")
+
+    # webpage/make_pose_keypoints_yolo.extract_with_yolo (ultralytics 는 main() 에서만 확인 -> FakeYolo 로 측정)
+    if WEBPAGE not in sys.path:
+        sys.path.insert(0, WEBPAGE)
+    import make_pose_keypoints_yolo as mpky
+    model = FakeYolo(args.fake_infer_ms)
+    decoded = [mpk.load_image(p) for p in imgs]
+    sec = timeit(lambda: [mpky.extract_with_yolo(img, model) for img in decoded], args.repeat)
+    record("extract.extract_with_yolo_ms", sec / len(decoded) * 1000, "ms/img")
+
+
+def bench_score(args, workdir: str):
+    print("[score]")
+    if WEBPAGE not in sys.path:
+        sys.path.insert(0, WEBPAGE)
+    from common.pose_score import score_frames
+    from common.group_match import GroupMatcher
+    from common.target_index import TargetIndex
+
+    rng = np.random.default_rng(1)
+    frames = args.frames
+    live, targets = [], []
+    for _ in range(frames):
+        n = int(rng.integers(1, 5))
+        live.append(fake_keypoints(rng, n, 640, 480))
+        targets.append(fake_keypoints(rng, n, 640, 480))
+
+    for mode in ("greedy", "optimal"):
+        sec = timeit(lambda: score_frames(live, targets, mode=mode), args.repeat)
+        record(f"score.score_frames.{mode}_us_per_frame", sec / frames * 1e6, "us/frame")
+
+    index = TargetIndex(os.path.join(workdir, "no_targets"))
+    index._publish(["1/1.jpg"], np.array([0, 4], np.int32), fake_keypoints(rng, 4, 640, 480),
+                   np.array([[640, 480]], np.int32), {})
+    matcher = GroupMatcher(index)
+    live4 = fake_keypoints(rng, 4, 640, 480)
+    sec = timeit(lambda: [matcher.match(live4, "1/1.jpg") for _ in range(200)], args.repeat)
+    record("score.group_match_4p_us", sec / 200 * 1e6, "us/call")
+
+
+def bench_api(args, workdir: str):
+    print("[api]")
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError as e:
+        print(f"  skipped ({e})")
+        return
+    if WEBPAGE not in sys.path:
+        sys.path.insert(0, WEBPAGE)
+    import base64
+    with quiet():
+        import main
+
+    mpk.has_cv2()
+    jpg = mpk.cv2.imencode(".jpg", (np.random.default_rng(2).random((480, 640, 3)) * 255).astype(np.uint8))[1].tobytes()
+    data_url = "data:image/jpeg;base64," + base64.b64encode(jpg).decode()
+    video = os.urandom(args.video_mb * 1024 * 1024)
+
+    def latencies(fn, n):
+        out = []
+        for _ in range(n):
+            with quiet():   # 서버 로그([capture] saved ...) 숨김
+                t0 = time.perf_counter()
+                r = fn()
+            out.append(time.perf_counter() - t0)
+            if r.status_code != 200 or r.json().get("status") != "ok":
+                raise RuntimeError(f"request failed: {r.status_code} {r.text[:200]}")
+        out.sort()
+        return out[len(out) // 2] * 1000, out[min(len(out) - 1, int(len(out) * 0.95))] * 1000
+
+    with TestClient(main.app) as c:
+        with quiet():
+            c.get("/play")
+        n = args.requests
+        for name, fn in (
+            ("capture", lambda: c.post("/capture", json={"image": data_url})),
+            ("capture_raw", lambda: c.post("/capture_raw", content=jpg, headers={"Content-Type": "image/jpeg"})),
+        ):
+            p50, p95 = latencies(fn, n)
+            record(f"api.{name}.p50_ms", p50, "ms")
+            record(f"api.{name}.p95_ms", p95, "ms")
+        p50, _ = latencies(lambda: c.post("/upload_video", files={"file": ("v.mp4", video, "video/mp4")}),
+                           max(1, n // 10))
+        record("api.upload_video.p50_ms", p50, "ms")
+        record("api.upload_video.MBps", args.video_mb / (p50 / 1000.0), "MB/s", "higher")
+
+
+SUITES = {
+    "extract": bench_extract,
+    "score": bench_score,
+    "api": bench_api,
+}
+
+
+# ---------------------------
+# 비교
+# ---------------------------
+
+def compare(baseline_path: str, threshold: float) -> int:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = json.load(f).get("results", {})
+    regressions = 0
+    print(f"[compare] vs {baseline_path} (threshold {threshold:.0%})")
+    for name, cur in sorted(RESULTS.items()):
+        old = base.get(name)
+        if not old or not old.get("value"):
+            continue
+        ratio = cur["value"] / old["value"]
+        worse = ratio - 1.0 if cur["better"] == "lower" else 1.0 - ratio
+        flag = "REGRESSION" if worse > threshold else ""
+        regressions += bool(flag)
+        print(f"  {name:<44} {old['value']:12.3f} -> {cur['value']:12.3f} {cur['unit']:<8} ({ratio - 1:+.1%}) {flag}")
+    print(f"[compare] {regressions} regression(s)")
+    return 1 if regressions else 0
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Pose pipeline benchmarks (synthetic images, stub models)")
+    p.add_argument("--suite", default="extract,score,api", help="Comma-separated: extract,score,api")
+    p.add_argument("--images", type=int, default=32, help="Synthetic images for extract (default 32)")
+    p.add_argument("--size", default="1280x720", help="Synthetic image size WxH")
+    p.add_argument("--repeat", type=int, default=3, help="Repeats per measurement (median)")
+    p.add_argument("--backend", choices=["fake", "ultra", "mediapipe"], default="fake",
+                   help="fake: stub models (default, reproducible) / real backend if installed")
+    p.add_argument("--fake-infer-ms", type=float, default=0.0, help="Simulated model time per image for fake models")
+    p.add_argument("--batch-size", type=int, default=8)
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--frames", type=int, default=2000, help="Frames for score_frames")
+    p.add_argument("--requests", type=int, default=50, help="Requests per API endpoint")
+    p.add_argument("--video-mb", type=int, default=8, help="Upload size for /upload_video")
+    p.add_argument("--out", default=None, help="Write results JSON here")
+    p.add_argument("--compare", default=None, help="Baseline results JSON to compare against")
+    p.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown ratio before failing (default 0.15)")
+    p.add_argument("--keep", action="store_true", help="Keep the temporary work folder")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    suites = [s.strip() for s in args.suite.split(",") if s.strip()]
+    for s in suites:
+        if s not in SUITES:
+            print(f"[error] unknown suite: {s} ({', '.join(SUITES)})")
+            sys.exit(2)
+
+    workdir = tempfile.mkdtemp(prefix="pose_bench_")
+    print(f"[info] work dir: {workdir}")
+    # 서버 코드가 쓰는 결과 폴더를 임시 폴더로 (common.common 이 처음 import 될 때 읽음)
+    os.environ["POSE_RESULT_DIR"] = os.path.join(workdir, "result_images")
+    os.environ["POSE_VIDEO_ANALYSIS"] = "0"
+    os.environ["POSE_SESSION_BACKEND"] = "memory"
+    os.makedirs(os.path.join(workdir, "result_images", "matching"), exist_ok=True)
+    try:
+        for s in suites:
+            SUITES[s](args, workdir)
+            rss = peak_rss_mb()
+            if rss is not None:
+                record(f"{s}.peak_rss_mb", rss, "MB")
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        mpk.has_cv2()
+        meta = {
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "opencv": getattr(mpk.cv2, "__version__", None),
+            "args": vars(args),
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": RESULTS}, f, ensure_ascii=False, indent=2)
+        print(f"[save] {args.out}")
+
+    if args.compare:
+        sys.exit(compare(args.compare, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
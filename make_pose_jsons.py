@@ -2,10 +2,18 @@
 from pathlib import Path
 import json
 
+from pose_manifest import Manifest
+
 # 1) 현재 스크립트 위치 기준으로 경로 계산
 HERE = Path(__file__).resolve().parent
 ROOT = HERE / "result_images" / "matching"   # WebContent/result_images/matching
 
+# 매니페스트 producer (DEFAULTS 를 바꾸면 버전도 올려서 재생성)
+PRODUCER = "defaults:bbox-v1"
+
+# 출력: <이미지>.bbox.json (키포인트 추출의 <이미지>.json / .multi.json 과 파일을 나눠 서로 덮어쓰지 않음)
+BBOX_SUFFIX = ".bbox.json"
+
 # 2) 폴더별 기본 bbox 값 (0~1 정규화 좌표)
 DEFAULTS = {
     # 중앙 한 명, 머리~발끝 커버
@@ -21,9 +29,37 @@ DEFAULTS = {
     "4": {"x": 0.05, "y": 0.05, "w": 0.90, "h": 0.88},
 }
 
+def default_bbox(group):
+    """인원 폴더별 기본 bbox (DEFAULTS 에 없는 5명 이상 폴더는 가장 넓은 4명 값)"""
+    return DEFAULTS.get(group) or DEFAULTS[max(DEFAULTS, key=int)]
+
+def groups():
+    """matching 아래 숫자 이름 폴더 전체 (인원수 순)"""
+    if not ROOT.exists():
+        return []
+    return sorted((p.name for p in ROOT.iterdir() if p.is_dir() and p.name.isdigit()), key=int)
+
+def bbox_path(img_path):
+    return img_path.with_suffix(BBOX_SUFFIX)
+
+def migrate_legacy(img_path, manifest):
+    """예전 버전이 <이미지>.json 에 쓴 {"bbox"} 만 있는 파일 -> <이미지>.bbox.json 으로 옮김"""
+    json_path = img_path.with_suffix(".json")
+    if not json_path.exists() or bbox_path(img_path).exists() or not manifest.has_record(str(img_path)):
+        return
+    try:
+        data = json.loads(json_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return
+    if isinstance(data, dict) and set(data) == {"bbox"}:
+        json_path.replace(bbox_path(img_path))
+        print(f"↪ 이동: {json_path.name} -> {bbox_path(img_path).name}")
+
 def gen():
     print(f"ROOT = {ROOT}")
-    for group in ["1", "2", "3", "4"]:
+    manifest = Manifest.open(str(ROOT), tool="make_pose_jsons")
+    manifest.prune()
+    for group in groups() or list(DEFAULTS):
         img_dir = ROOT / group
         if not img_dir.exists():
             print(f"❌ 폴더 없음: {img_dir}")
@@ -39,15 +75,18 @@ def gen():
             continue
 
         for img_path in images:
-            json_path = img_path.with_suffix(".json")
-            if json_path.exists():
-                print(f"⏭ 이미 있음: {json_path.name}")
+            migrate_legacy(img_path, manifest)
+            json_path = bbox_path(img_path)
+            need, why = manifest.needs_update(str(img_path), PRODUCER, outputs=[str(json_path)])
+            if not need:
                 continue
 
-            data = {"bbox": DEFAULTS[group]}
+            data = {"bbox": default_bbox(group)}
             json_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-            print(f"✅ 생성됨: {json_path.name}")
+            manifest.record(str(img_path), PRODUCER)
+            print(f"✅ 생성됨: {json_path.name} ({why})")
 
+    manifest.save()
     print("🎉 모든 JSON 파일 생성 완료!")
 
 if __name__ == "__main__":
@@ -9,10 +9,25 @@ make_pose_keypoints.py
 - 단일(.json) + 다인(.multi.json) 동시 출력
 - 실패 이미지는 result_images/matching/failed/ 로 이동(기존 json도 함께 이동)
 - 백엔드: ultralytics YOLO Pose(멀티) / MediaPipe Pose(단일) 자동 선택 또는 강제 지정
+- 파이프라인: 디코딩(스레드 풀) -> 배치 추론(--batch-size) -> JSON 저장(writer 풀), 처리량(images/s) 출력
+- --procs N: 이미지 목록을 N개 프로세스로 분할(프로세스마다 백엔드 1개, MediaPipe 멀티코어 활용)
+- 증분 재색인: matching/.pose_manifest.json (size/mtime/hash/producer) 기준으로 신규·변경·모델 변경 이미지만 처리
+- --format columnar|both: 폴더별 poses.npy (사람 x 17 x 3 float32 + bbox/score, memmap 가능) 저장 (pose_store.py)
+- ultralytics / mediapipe / cv2 / numpy 는 실제로 쓸 때 import (--help·인자 오류·처리할 이미지 없음은 즉시 종료)
+- --profile-startup: import / 모델 로딩 단계별 시간 출력 후 종료
+- 모델은 pose_models.POOL 에서 체크아웃 (로드 + warm-up 은 프로세스당 1회)
+- 디코딩: JPEG 은 백엔드 입력 크기(input_size) 이상이 남는 1/2·1/4·1/8 축소 디코딩 후 키포인트를 원본 px 로 환산
+  (--decode full 이면 항상 원본 크기), 다음 이미지는 스레드에서 미리 디코딩
+- --backend cascade: 빠른 YOLO-n 패스 후 품질 기준(유효 관절 수 / 평균 점수 / bbox)에 못 미친 이미지만
+  더 큰 imgsz -> 더 큰 모델 -> MediaPipe 순으로 다시 추론 (--cascade), 단계별 판정은 JSON meta.cascade 에 기록
+  (디코딩은 첫 단계 입력 크기 기준, 올라간 이미지만 뒷단계 최대 입력 크기로 다시 디코딩)
 
 Author: you
 """
 
+import time
+_T_START = time.perf_counter()
+
 import os
 import sys
 import glob
@@ -20,29 +35,78 @@ import json
 import shutil
 import argparse
 import datetime
-from typing import List, Dict, Any, Tuple
+import importlib
+import importlib.util
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Any, Tuple, Optional, Callable, Iterable, Iterator, TYPE_CHECKING
+
+from pose_manifest import Manifest, find_matching_root
+from pose_models import POOL, ModelPool
+
+if TYPE_CHECKING:
+    from pose_store import PoseStore
 
 # ---------------------------
-# Optional deps
+# Optional deps (lazy)
+# - import 자체가 수 초 걸리는 라이브러리는 백엔드 생성 / 이미지 디코딩 시점에 불러온다
+# - IMPORT_TIMES: 모듈별 import 시간 (--profile-startup)
 # ---------------------------
-_HAS_ULTRA = False
-_HAS_MP = False
+YOLO = None
+mp = None
+cv2 = None
+np = None
+IMPORT_TIMES: Dict[str, float] = {}
 
-try:
-    from ultralytics import YOLO
-    _HAS_ULTRA = True
-except Exception:
-    _HAS_ULTRA = False
 
-try:
-    import mediapipe as mp
-    import cv2
-    _HAS_MP = True
-except Exception:
-    _HAS_MP = False
-    cv2 = None
+def _module_available(name: str) -> bool:
+    """설치 여부만 확인 (import 하지 않음)"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
 
-from PIL import Image
+
+def _lazy_import(name: str):
+    """Import on first use and record how long it took. None if it cannot be imported."""
+    t0 = time.perf_counter()
+    try:
+        mod = importlib.import_module(name)
+    except Exception as e:
+        print(f"[warn] cannot import {name}: {e}")
+        return None
+    IMPORT_TIMES.setdefault(name, time.perf_counter() - t0)
+    return mod
+
+
+def _numpy():
+    global np
+    if np is None:
+        np = _lazy_import("numpy")
+    return np
+
+
+def has_cv2() -> bool:
+    global cv2
+    if cv2 is None:
+        _numpy()
+        cv2 = _lazy_import("cv2")
+    return cv2 is not None
+
+
+def has_ultra() -> bool:
+    global YOLO
+    if YOLO is None:
+        mod = _lazy_import("ultralytics")
+        YOLO = mod.YOLO if mod is not None else None
+    return YOLO is not None
+
+
+def has_mediapipe() -> bool:
+    global mp
+    if mp is None:
+        mp = _lazy_import("mediapipe")
+    return mp is not None and has_cv2()
 
 
 # ---------------------------
@@ -100,19 +164,28 @@ def is_image_path(p: str) -> bool:
 def ensure_dir(p: str):
     os.makedirs(p, exist_ok=True)
 
-def bbox_from_points(pxys: List[Tuple[float, float]], W: int, H: int) -> Tuple[int,int,int,int]:
-    xs = [x for x, y in pxys if x is not None and y is not None]
-    ys = [y for x, y in pxys if x is not None and y is not None]
-    if not xs or not ys:
-        return 0, 0, W, H
-    minx, maxx = max(0, min(xs)), min(W-1, max(xs))
-    miny, maxy = max(0, min(ys)), min(H-1, max(ys))
-    w = max(1, int(round(maxx - minx)))
-    h = max(1, int(round(maxy - miny)))
-    return int(round(minx)), int(round(miny)), w, h
+def kp_name(idx: int) -> str:
+    return COCO_NAMES[idx] if idx < len(COCO_NAMES) else f"k{idx}"
 
-def norm_xy(x: float, y: float, W: int, H: int) -> Tuple[float, float]:
-    return (float(x) / float(W), float(y) / float(H))
+def bboxes_from_points(pts, counts, W: int, H: int):
+    """
+    pts: (K, 2+) 모든 사람의 키포인트를 이어붙인 배열, counts: 사람별 점 개수
+    -> (N, 4) int64 bbox px (x, y, w, h). 점이 없는 사람은 (0, 0, W, H)
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    out = np.tile(np.array([0, 0, W, H], dtype=np.int64), (len(counts), 1))
+    has = np.flatnonzero(counts > 0)
+    if not len(has):
+        return out
+    starts = (np.cumsum(counts) - counts)[has]
+    lo = np.minimum.reduceat(pts[:, :2], starts, axis=0)
+    hi = np.maximum.reduceat(pts[:, :2], starts, axis=0)
+    lo = np.maximum(lo, 0)
+    hi = np.minimum(hi, [W - 1, H - 1])
+    # np.round / round() 모두 banker's rounding -> 기존 int(round(v)) 와 같은 값
+    out[has, :2] = np.round(lo)
+    out[has, 2:] = np.maximum(1, np.round(hi - lo))
+    return out
 
 def norm_bbox(x: int, y: int, w: int, h: int, W: int, H: int) -> Dict[str, float]:
     return {
@@ -159,64 +232,116 @@ def save_json(path: str, data: Dict[str, Any], overwrite: bool):
 
 class BackendBase:
     name = "base"
+    producer = "base"  # manifest id: backend + model; changing it re-indexes the library
+    input_size = 0     # long side the model actually looks at; images are decoded no smaller than this (0 = full size)
     def infer(self, img_bgr, min_conf: float) -> List[Dict[str, Any]]:
-        """Return list of people dict: { 'score':float, 'keypoints_px': [{'name', 'x','y','score'}] }"""
+        """
+        Return list of people dict: { 'score':float, 'slot':int, 'keypoints_px': [{'name', 'x','y','score'}] }
+        or, instead of 'keypoints_px', 'kps_px': (K, 3) float64 array in COCO order (score <= 0 = missing).
+        """
         raise NotImplementedError
 
+    def infer_batch(self, imgs_bgr: List[Any], min_conf: float) -> List[List[Dict[str, Any]]]:
+        """Batch version of infer(). Default: one image at a time (backends that cannot batch)."""
+        return [self.infer(img, min_conf=min_conf) for img in imgs_bgr]
+
+    def infer_sources(self, imgs_bgr: List[Any], sources: List[Tuple[str, Tuple[int, int]]],
+                      min_conf: float) -> List[List[Dict[str, Any]]]:
+        """
+        infer_batch() given where each image came from: sources[i] = (img_path, (W, H) source size).
+        Results are in imgs_bgr[i] pixels. Default ignores sources (only the cascade re-decodes).
+        """
+        return self.infer_batch(imgs_bgr, min_conf=min_conf)
+
 class UltraBackend(BackendBase):
     name = "ultra"
-    def __init__(self):
-        # yolo pose pretrained default
-        # If you have a specific model file, put its path here
-        self.model = YOLO("yolov8n-pose.pt")
+    producer = "ultra:yolov8n-pose.pt"
+    # yolo pose pretrained default
+    # If you have a specific model file, put its path here
+    weights = "yolov8n-pose.pt"
+    imgsz = None       # None = predict() default
+    input_size = 640   # predict() default imgsz: letterboxed to 640 on the long side
+
+    def __init__(self, pool: Optional[ModelPool] = None, weights: Optional[str] = None, imgsz: Optional[int] = None):
+        if not has_ultra():
+            raise RuntimeError("ultralytics not installed")
+        self.pool = pool or POOL
+        if weights or imgsz:
+            # cascade stage: other weights / input size -> its own producer id
+            self.weights = weights or self.weights
+            self.imgsz = imgsz
+            self.input_size = imgsz or self.input_size
+            self.producer = f"ultra:{self.weights}" + (f"@{imgsz}" if imgsz else "")
+        self.pool.preload("yolo", self.weights, imgsz=self.imgsz)   # load + warm-up once, reused by every infer_batch
 
     def infer(self, img_bgr, min_conf: float) -> List[Dict[str, Any]]:
-        H, W = img_bgr.shape[:2]
-        res = self.model.predict(source=img_bgr, verbose=False)
-        people = []
-        for r in res:
-            if r.keypoints is None:
-                continue
-            kps = r.keypoints.data.cpu().numpy()  # shape: [num, 17, 3]
-            # r.boxes.conf: per person conf
-            scores = r.boxes.conf.cpu().numpy() if r.boxes is not None else [0.0]*len(kps)
-            for i, kp in enumerate(kps):
-                conf_person = float(scores[i]) if i < len(scores) else float(kp[:,2].mean())
-                if conf_person < min_conf:
-                    continue
-                pts = []
-                for idx, (x, y, s) in enumerate(kp):
-                    name = COCO_NAMES[idx] if idx < len(COCO_NAMES) else f"k{idx}"
-                    if s <= 0:
-                        continue
-                    # clamp
-                    x = max(0, min(W-1, float(x)))
-                    y = max(0, min(H-1, float(y)))
-                    pts.append({"name": name, "x": x, "y": y, "score": float(s)})
-                if not pts:
-                    continue
-                people.append({"score": conf_person, "keypoints_px": pts})
-        # sort by x-center for stable slot
-        def x_center(person):
-            xs = [p["x"] for p in person["keypoints_px"]]
-            return sum(xs)/len(xs) if xs else 0.0
-        people.sort(key=x_center)
-        # add slot index
-        for i, p in enumerate(people):
-            p["slot"] = i
-        return people
+        return self.infer_batch([img_bgr], min_conf=min_conf)[0]
+
+    def infer_batch(self, imgs_bgr: List[Any], min_conf: float) -> List[List[Dict[str, Any]]]:
+        # one predict call for the whole batch -> one Results per image (same order)
+        with self.pool.checkout("yolo", self.weights, imgsz=self.imgsz) as model:
+            res = model.predict(list(imgs_bgr))
+        out = []
+        for img_bgr, r in zip(imgs_bgr, res):
+            H, W = img_bgr.shape[:2]
+            out.append(self._people_from_result(r, W, H, min_conf))
+        return out
+
+    @staticmethod
+    def _people_from_result(r, W: int, H: int, min_conf: float) -> List[Dict[str, Any]]:
+        """Results -> people with 'kps_px' arrays (threshold / clamp / slot order on the whole (N, 17, 3) array)."""
+        if r.keypoints is None:
+            return []
+        _numpy()
+        kps = r.keypoints.data.cpu().numpy()  # shape: [num, 17, 3]
+        n = len(kps)
+        if not n:
+            return []
+        # r.boxes.conf: per person conf (no boxes -> 0.0, fewer boxes than people -> mean keypoint score)
+        conf = np.zeros(n, dtype=np.float64)
+        if r.boxes is not None:
+            scores = np.asarray(r.boxes.conf.cpu().numpy(), dtype=np.float64).reshape(-1)
+            m = min(n, len(scores))
+            conf[:m] = scores[:m]
+            for i in range(m, n):
+                conf[i] = float(kps[i, :, 2].mean())
+
+        pts = kps.astype(np.float64)
+        # clamp
+        np.clip(pts[..., 0], 0, W - 1, out=pts[..., 0])
+        np.clip(pts[..., 1], 0, H - 1, out=pts[..., 1])
+        valid = pts[..., 2] > 0
+        cnt = valid.sum(axis=1)
+        keep = np.flatnonzero((conf >= min_conf) & (cnt > 0))
+        if not len(keep):
+            return []
+
+        # sort by x-center for stable slot (cumsum = 왼쪽부터 순서대로 더함 -> sum(xs) 와 같은 값)
+        xsum = np.cumsum(np.where(valid[keep], pts[keep, :, 0], 0.0), axis=1)[:, -1]
+        order = keep[np.argsort(xsum / cnt[keep], kind="stable")]
+        return [{"score": float(conf[i]), "slot": slot, "kps_px": pts[i]} for slot, i in enumerate(order)]
 
 class MPPoseBackend(BackendBase):
     name = "mediapipe"
-    def __init__(self):
+    producer = "mediapipe:pose-c1"
+    weights = "pose-c1"   # static_image_mode, model_complexity=1
+    input_size = 1024     # landmarks run on a 256x256 person crop -> keep enough pixels for small people
+
+    def __init__(self, pool: Optional[ModelPool] = None, weights: Optional[str] = None):
+        if not has_mediapipe():
+            raise RuntimeError("mediapipe/cv2 not available")
         # single-person
-        self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(static_image_mode=True, model_complexity=1, enable_segmentation=False)
+        self.pool = pool or POOL
+        if weights:
+            self.weights = weights
+            self.producer = f"mediapipe:{weights}"
+        self.pool.preload("mediapipe", self.weights)
 
     def infer(self, img_bgr, min_conf: float) -> List[Dict[str, Any]]:
         # MediaPipe expects RGB
         img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-        res = self.pose.process(img_rgb)
+        with self.pool.checkout("mediapipe", self.weights) as pose:
+            res = pose.process(img_rgb)
         H, W = img_bgr.shape[:2]
         if not res.pose_landmarks:
             return []
@@ -244,120 +369,750 @@ class MPPoseBackend(BackendBase):
         return [{"score": score, "slot": 0, "keypoints_px": pts}]
 
 
-def pick_backend(backend_arg: str) -> BackendBase:
+# ---------------------------
+# Cascade (quality-gated escalation)
+# ---------------------------
+
+class QualityGate:
+    """
+    Per-image quality check used by the cascade. Every person that counts (person score >= person_conf;
+    low-confidence background detections are ignored unless nobody reaches it) must have
+      - at least min_valid joints with score >= kp_conf and a mean valid-joint score >= min_score
+      - a keypoint bbox covering >= min_area of the image, long/short side ratio <= max_aspect
+    and a later stage must find at least as many people as the first pass (single-person backends
+    must not drop people from group images).
+    """
+
+    def __init__(self, min_valid: int = 10, min_score: float = 0.5, min_area: float = 0.01,
+                 max_aspect: float = 6.0, kp_conf: float = 0.3, person_conf: float = 0.5):
+        self.min_valid = min_valid
+        self.min_score = min_score
+        self.min_area = min_area
+        self.max_aspect = max_aspect
+        self.kp_conf = kp_conf
+        self.person_conf = person_conf
+
+    def spec(self) -> str:
+        return (f"v{self.min_valid},s{self.min_score},a{self.min_area},r{self.max_aspect},k{self.kp_conf},"
+                f"p{self.person_conf}")
+
+    def counted(self, people: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """people the gate looks at: person score >= person_conf (all of them if nobody reaches it)"""
+        main = [p for p in people if float(p.get("score", 1.0)) >= self.person_conf]
+        return main or list(people)
+
+    def check(self, people: List[Dict[str, Any]], W: int, H: int, min_people: int = 0) -> Dict[str, Any]:
+        """
+        -> {"people", "ignored", "valid", "avg_score", "area", "aspect", "passed", "reasons"}
+        (worst counted person per metric; "people" = counted persons, "ignored" = below person_conf)
+        """
+        counted = self.counted(people)
+        q = {"people": len(counted), "ignored": len(people) - len(counted), "valid": 0, "avg_score": 0.0,
+             "area": 0.0, "aspect": 0.0, "passed": False, "reasons": []}
+        if not people:
+            q["reasons"].append("no_person")
+            return q
+        _numpy()
+        valid, scores, areas, aspects = [], [], [], []
+        for p in counted:
+            pts = _person_points(p)[1]
+            ok = pts[:, 2] >= self.kp_conf
+            valid.append(int(ok.sum()))
+            scores.append(float(pts[ok, 2].mean()) if ok.any() else 0.0)
+            span = np.maximum(np.ptp(pts[ok, :2], axis=0), 1.0) if ok.sum() > 1 else np.ones(2)
+            areas.append(float(span[0] * span[1]) / float(W * H))
+            aspects.append(float(span.max() / span.min()))
+        q.update(valid=min(valid), avg_score=round(min(scores), 4), area=round(min(areas), 5),
+                 aspect=round(max(aspects), 2))
+        if q["valid"] < self.min_valid:
+            q["reasons"].append("few_joints")
+        if q["avg_score"] < self.min_score:
+            q["reasons"].append("low_score")
+        if q["area"] < self.min_area:
+            q["reasons"].append("small_bbox")
+        if q["aspect"] > self.max_aspect:
+            q["reasons"].append("odd_bbox")
+        if len(counted) < min_people:
+            q["reasons"].append("fewer_people")
+        q["passed"] = not q["reasons"]
+        return q
+
+
+# n@640 (fast path) -> n@1280 (small people) -> m@960 (larger model) -> MediaPipe heavy (single person)
+CASCADE_DEFAULT = "yolo:yolov8n-pose.pt@640,yolo:yolov8n-pose.pt@1280,yolo:yolov8m-pose.pt@960,mediapipe:pose-c2"
+
+
+def parse_cascade(spec: str) -> List[Tuple[str, str, Optional[int]]]:
+    """"kind:weights@imgsz,..." -> [(kind, weights, imgsz)]  (kind: yolo|ultra / mediapipe, @imgsz optional)"""
+    stages = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        kind, _, rest = item.partition(":")
+        kind = {"ultra": "yolo"}.get(kind.lower(), kind.lower())
+        if kind not in ("yolo", "mediapipe"):
+            raise ValueError(f"unknown cascade stage: {item}")
+        weights, _, size = rest.partition("@")
+        stages.append((kind, weights or ("yolov8n-pose.pt" if kind == "yolo" else "pose-c1"),
+                       int(size) if size else None))
+    if not stages:
+        raise ValueError("empty cascade")
+    return stages
+
+
+def _stage_id(stage: Tuple[str, str, Optional[int]]) -> str:
+    kind, weights, imgsz = stage
+    return f"{kind}:{weights}" + (f"@{imgsz}" if imgsz else "")
+
+
+class CascadeBackend(BackendBase):
+    """
+    Run the first (cheap) stage on every image; images whose result fails the QualityGate are re-run
+    on the next stage only. The first passing result is kept; if none passes, the best one seen
+    (most valid joints, then mean score) is kept and marked passed=false. Stages whose library is not
+    installed are skipped, later stages load their model on first escalation. Single-person stages
+    (MediaPipe) are skipped for images whose first pass counted more than one person.
+    Images are decoded for the first stage only (input_size); through infer_sources() an image that
+    escalates is re-decoded once at escalate_size (largest stage input) from its source path.
+    Every person dict gets "meta" = {"cascade": {stage, escalations, passed, trace: [per-stage decision]}}.
+    """
+    name = "cascade"
+
+    def __init__(self, pool: Optional[ModelPool] = None, stages: str = CASCADE_DEFAULT,
+                 gate: Optional[QualityGate] = None):
+        self.pool = pool or POOL
+        self.gate = gate or QualityGate()
+        self.stages = self.available_stages(stages)
+        if not self.stages:
+            raise RuntimeError("no cascade stage available (install ultralytics or mediapipe+opencv)")
+        self.producer = self.make_producer(stages, self.gate)
+        # decode for the fast pass only; escalated images are re-decoded for the larger stages
+        sizes = [self._stage_size(st) for st in self.stages]
+        self.input_size = sizes[0]
+        self.escalate_size = max(sizes)
+        self._escalate_decoder = ImageDecoder(self.escalate_size)
+        self._backends: Dict[int, BackendBase] = {}
+        self.stats = self.empty_stats()
+        self._stage_backend(0)
+
+    @staticmethod
+    def available_stages(spec: str, warn: bool = True) -> List[Tuple[str, str, Optional[int]]]:
+        """installed stages only (checked without importing)"""
+        ok = {"yolo": _module_available("ultralytics"),
+              "mediapipe": _module_available("mediapipe") and _module_available("cv2")}
+        stages = parse_cascade(spec)
+        for st in stages:
+            if warn and not ok[st[0]]:
+                print(f"[warn] cascade stage {_stage_id(st)} skipped ({st[0]} not installed)")
+        return [st for st in stages if ok[st[0]]]
+
+    @classmethod
+    def make_producer(cls, spec: str, gate: Optional[QualityGate] = None) -> str:
+        """manifest id: changing stages or gate thresholds re-indexes the library"""
+        ids = ">".join(_stage_id(st) for st in cls.available_stages(spec, warn=False))
+        return f"cascade:{ids}|{(gate or QualityGate()).spec()}"
+
+    @staticmethod
+    def _single_person(stage: Tuple[str, str, Optional[int]]) -> bool:
+        return stage[0] == "mediapipe"
+
+    @staticmethod
+    def _stage_size(stage: Tuple[str, str, Optional[int]]) -> int:
+        kind, _, imgsz = stage
+        return imgsz or (UltraBackend.input_size if kind == "yolo" else MPPoseBackend.input_size)
+
+    def _redecode(self, img, source: Tuple[str, Tuple[int, int]]):
+        """escalated image -> decode at escalate_size if the first decode was reduced below it, else img"""
+        path, (W, H) = source
+        if max(img.shape[:2]) >= min(self.escalate_size, max(W, H)):
+            return img
+        big, _ = self._escalate_decoder(path)
+        if big is None:
+            return img
+        self.stats["redecoded"] += 1
+        return big
+
+    def _stage_backend(self, i: int) -> BackendBase:
+        if i not in self._backends:
+            kind, weights, imgsz = self.stages[i]
+            self._backends[i] = (UltraBackend(self.pool, weights, imgsz) if kind == "yolo"
+                                 else MPPoseBackend(self.pool, weights))
+        return self._backends[i]
+
+    def empty_stats(self) -> Dict[str, Any]:
+        return {"images": 0, "escalations": 0, "redecoded": 0, "skipped": 0, "unresolved": 0, "failed": 0,
+                "accepted": {_stage_id(st): 0 for st in self.stages}}
+
+    def take_stats(self) -> Dict[str, Any]:
+        stats, self.stats = self.stats, self.empty_stats()
+        return stats
+
+    def infer(self, img_bgr, min_conf: float) -> List[Dict[str, Any]]:
+        return self.infer_batch([img_bgr], min_conf=min_conf)[0]
+
+    def infer_batch(self, imgs_bgr: List[Any], min_conf: float) -> List[List[Dict[str, Any]]]:
+        return self.infer_sources(imgs_bgr, None, min_conf=min_conf)
+
+    def infer_sources(self, imgs_bgr: List[Any], sources: Optional[List[Tuple[str, Tuple[int, int]]]],
+                      min_conf: float) -> List[List[Dict[str, Any]]]:
+        n = len(imgs_bgr)
+        imgs = list(imgs_bgr)   # what the next stage sees (larger decode after the first escalation)
+        traces: List[List[Dict[str, Any]]] = [[] for _ in range(n)]
+        best: List[Optional[Tuple[Any, List[Dict[str, Any]], int, bool]]] = [None] * n
+        first_count = [0] * n   # people the gate counted on the first pass
+        todo = list(range(n))
+        for si in range(len(self.stages)):
+            if not todo:
+                break
+            skipped = []
+            if self._single_person(self.stages[si]):
+                # a single-person model can only fail a group image with fewer_people -> pass it on
+                skipped = [i for i in todo if first_count[i] > 1]
+                for i in skipped:
+                    traces[i].append({"stage": _stage_id(self.stages[si]), "skipped": "group", "passed": False})
+                self.stats["skipped"] += len(skipped)
+                todo = [i for i in todo if first_count[i] <= 1]
+                if not todo:
+                    todo = skipped
+                    continue
+            if si > 0 and sources is not None:
+                for i in todo:
+                    if imgs[i] is imgs_bgr[i]:
+                        imgs[i] = self._redecode(imgs_bgr[i], sources[i])
+            try:
+                results = self._stage_backend(si).infer_batch([imgs[i] for i in todo], min_conf=min_conf)
+            except Exception as e:
+                # a later stage failing to load/run must not lose the earlier results
+                if si == 0:
+                    raise
+                print(f"[warn] cascade stage {_stage_id(self.stages[si])} failed: {e}")
+                for i in todo:
+                    traces[i].append({"stage": _stage_id(self.stages[si]), "error": str(e), "passed": False})
+                todo = sorted(todo + skipped)
+                continue
+            retry = list(skipped)
+            for i, people in zip(todo, results):
+                H, W = imgs_bgr[i].shape[:2]
+                if imgs[i] is not imgs_bgr[i]:
+                    rescale_people(people, imgs[i], W, H)   # back to the caller's image px
+                q = self.gate.check(people, W, H, min_people=first_count[i])
+                if si == 0:
+                    first_count[i] = q["people"]
+                traces[i].append(dict(stage=_stage_id(self.stages[si]), **q))
+                rank = (q["passed"], q["people"] >= first_count[i], q["valid"], q["avg_score"])
+                if people and (best[i] is None or rank > best[i][0]):
+                    best[i] = (rank, people, si, q["passed"])
+                if not q["passed"]:
+                    retry.append(i)
+            todo = sorted(retry)
+
+        out = []
+        for i in range(n):
+            escalations = sum(1 for t in traces[i] if "skipped" not in t) - 1
+            self.stats["images"] += 1
+            self.stats["escalations"] += escalations
+            if best[i] is None:
+                self.stats["failed"] += 1
+                print(f"[cascade] no person after {len(traces[i])} stage(s)")
+                out.append([])
+                continue
+            _, people, si, passed = best[i]
+            if passed:
+                self.stats["accepted"][_stage_id(self.stages[si])] += 1
+            else:
+                self.stats["unresolved"] += 1
+            meta = {"cascade": {"stage": _stage_id(self.stages[si]), "escalations": escalations,
+                                "passed": passed, "gate": self.gate.spec(), "trace": traces[i]}}
+            for p in people:
+                p["meta"] = meta
+            out.append(people)
+        return out
+
+    @staticmethod
+    def merge_stats(total: Optional[Dict[str, Any]], stats: Dict[str, Any]) -> Dict[str, Any]:
+        if total is None:
+            return {k: (dict(v) if isinstance(v, dict) else v) for k, v in stats.items()}
+        for k, v in stats.items():
+            if isinstance(v, dict):
+                for sid, c in v.items():
+                    total[k][sid] = total[k].get(sid, 0) + c
+            else:
+                total[k] += v
+        return total
+
+    @staticmethod
+    def report(stats: Dict[str, Any]):
+        n = max(1, stats["images"])
+        accepted = ", ".join(f"{sid}={c}" for sid, c in stats["accepted"].items())
+        first = next(iter(stats["accepted"].values()), 0)
+        print(f"[cascade] images={stats['images']} fast-path={first / n * 100:.1f}% accepted: {accepted}")
+        print(f"[cascade] escalations={stats['escalations']} re-decoded={stats.get('redecoded', 0)} "
+              f"single-person skipped={stats.get('skipped', 0)} "
+              f"below-gate kept={stats['unresolved']} "
+              f"failed={stats['failed']} ({stats['failed'] / n * 100:.1f}%)")
+
+
+def resolve_backend(backend_arg: str) -> str:
+    """Resolve --backend to a concrete backend name ("ultra" / "mediapipe") without importing or loading a model."""
+    ultra_ok = _module_available("ultralytics")
+    mp_ok = _module_available("mediapipe") and _module_available("cv2")
     b = backend_arg.lower()
+    if b == "cascade":
+        if not (ultra_ok or mp_ok):
+            print("[error] No backend available for cascade. Install ultralytics or mediapipe+opencv.")
+            sys.exit(1)
+        return "cascade"
     if b == "ultra":
-        if not _HAS_ULTRA:
+        if not ultra_ok:
             print("[warn] ultralytics not installed; falling back to MediaPipe")
         else:
-            return UltraBackend()
+            return "ultra"
     if b == "mediapipe":
-        if not _HAS_MP:
+        if not mp_ok:
             print("[error] mediapipe/cv2 not available.")
             sys.exit(1)
-        return MPPoseBackend()
+        return "mediapipe"
 
     # auto
-    if _HAS_ULTRA:
+    if ultra_ok:
         print("[info] backend=auto -> using ultralytics YOLO pose")
-        return UltraBackend()
-    elif _HAS_MP:
+        return "ultra"
+    elif mp_ok:
         print("[info] backend=auto -> using MediaPipe pose (single person)")
-        return MPPoseBackend()
+        return "mediapipe"
     else:
         print("[error] No backend available. Install ultralytics or mediapipe+opencv.")
         sys.exit(1)
 
 
+BACKENDS = {
+    "ultra": UltraBackend,
+    "mediapipe": MPPoseBackend,
+    "cascade": CascadeBackend,
+}
+
+
+def pick_backend(backend_arg: str) -> BackendBase:
+    return BACKENDS[resolve_backend(backend_arg)]()
+
+
 # ---------------------------
 # Main
 # ---------------------------
 
-def process_image(img_path: str, backend: BackendBase, overwrite: bool, min_conf: float, failed_dir: str):
+def load_image(img_path: str):
+    """Decode image as BGR ndarray at full size. Returns None if it cannot be read."""
+    return ImageDecoder()(img_path)[0]
+
+
+def jpeg_size(buf) -> Optional[Tuple[int, int]]:
+    """(W, H) from the JPEG SOF header (before EXIF rotation). None if not a JPEG."""
+    b = memoryview(buf)
+    n = len(b)
+    if n < 4 or b[0] != 0xFF or b[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < n:
+        if b[i] != 0xFF:
+            return None
+        marker = b[i + 1]
+        if marker == 0xFF:   # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:   # standalone markers (no length)
+            i += 2
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):   # SOFn
+            h = (b[i + 5] << 8) | b[i + 6]
+            w = (b[i + 7] << 8) | b[i + 8]
+            return (w, h) if w and h else None
+        i += 2 + ((b[i + 2] << 8) | b[i + 3])
+    return None
+
+
+class ImageDecoder:
+    """
+    img_path -> (BGR ndarray, (W, H) source size). (None, None) if it cannot be read.
+    min_size > 0: JPEGs are decoded with libjpeg DCT scaling (IMREAD_REDUCED_COLOR_2/4/8) at the
+    smallest factor that keeps the long side >= min_size. Other formats are always decoded at full size.
+    Reads through np.fromfile + imdecode so non-ASCII (Windows) paths work too.
+    """
+
+    REDUCE_FACTORS = (8, 4, 2)
+
+    def __init__(self, min_size: int = 0):
+        self.min_size = max(0, int(min_size or 0))
+
+    def reduce_factor(self, W: int, H: int) -> int:
+        if self.min_size:
+            for f in self.REDUCE_FACTORS:
+                if -(-max(W, H) // f) >= self.min_size:
+                    return f
+        return 1
+
+    def __call__(self, img_path: str):
+        if not has_cv2():
+            return None, None
+        try:
+            buf = np.fromfile(img_path, dtype=np.uint8)
+        except OSError:
+            return None, None
+        size = jpeg_size(buf) if self.min_size else None
+        f = self.reduce_factor(*size) if size else 1
+        img = cv2.imdecode(buf, getattr(cv2, f"IMREAD_REDUCED_COLOR_{f}") if f > 1 else cv2.IMREAD_COLOR)
+        if img is None:
+            return None, None
+        h, w = img.shape[:2]
+        if f == 1:
+            return img, (w, h)
+        W, H = size
+        # libjpeg 축소 크기는 ceil(W / f); 맞지 않으면 EXIF 회전(90/270)이 적용된 것
+        if (w, h) != (-(-W // f), -(-H // f)):
+            W, H = H, W
+        return img, (W, H)
+
+
+def make_decoder(backend: BackendBase, mode: str = "reduced") -> ImageDecoder:
+    """mode: reduced (backend.input_size 기준 축소 디코딩) / full"""
+    return ImageDecoder(backend.input_size if mode == "reduced" else 0)
+
+
+def rescale_people(people: List[Dict[str, Any]], img, W: int, H: int) -> List[Dict[str, Any]]:
+    """
+    Map keypoints inferred on a reduced decode back to source pixels (in place).
+    x <= w-1 on the decoded image -> x * W / w <= W - W / w <= W-1, so no re-clamping is needed.
+    """
+    h, w = img.shape[:2]
+    if (w, h) == (W, H):
+        return people
+    sx, sy = W / w, H / h
+    for p in people:
+        if "kps_px" in p:
+            p["kps_px"] = p["kps_px"] * np.array([sx, sy, 1.0])
+        else:
+            for kp in p["keypoints_px"]:
+                kp["x"], kp["y"] = kp["x"] * sx, kp["y"] * sy
+    return people
+
+
+def prefetch(items: Iterable[str], fn: Callable[[str], Any], pool: ThreadPoolExecutor,
+             ahead: int) -> Iterator[Tuple[str, Future]]:
+    """Yield (item, future of fn(item)) keeping up to `ahead` items submitted in advance."""
+    queue = deque()
+    it = iter(items)
+
+    def refill():
+        while len(queue) < ahead:
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            queue.append((item, pool.submit(fn, item)))
+
+    refill()
+    while queue:
+        item, fut = queue.popleft()
+        refill()
+        yield item, fut
+
+
+def _person_points(p: Dict[str, Any]) -> Tuple[List[str], Any]:
+    """person -> (names, (k, 3) float64 x, y, score) of its keypoints in output order"""
+    if "kps_px" in p:
+        kps = p["kps_px"]
+        idx = np.flatnonzero(kps[:, 2] > 0)
+        return [kp_name(i) for i in idx.tolist()], kps[idx]
+    kpx = p["keypoints_px"]
+    pts = np.array([(kp["x"], kp["y"], kp.get("score", 1.0)) for kp in kpx], dtype=np.float64).reshape(-1, 3)
+    return [kp["name"] for kp in kpx], pts
+
+
+def build_outputs(people: List[Dict[str, Any]], W: int, H: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Build (.json, .multi.json) payloads from backend people list."""
+    created_at = now_str()
+    _numpy()
+
+    # single choice: best person (by score), but also save .multi.json
+    best = max(range(len(people)), key=lambda i: people[i].get("score", 0.0))
+    # slot order already assigned
+
+    # 모든 사람의 키포인트를 한 배열로 이어붙여 bbox / 정규화를 한 번에 계산
+    names, parts = zip(*[_person_points(p) for p in people])
+    counts = [len(n) for n in names]
+    pts = np.concatenate(parts)
+    bboxes = bboxes_from_points(pts, counts, W, H).tolist()
+    xs, ys, ss = pts[:, 0].tolist(), pts[:, 1].tolist(), pts[:, 2].tolist()
+    nxs, nys = (pts[:, 0] / float(W)).tolist(), (pts[:, 1] / float(H)).tolist()
+
+    # per-person dicts (serialization boundary)
+    people_json = []
+    a = 0
+    for p, nm, c, (bx, by, bw, bh) in zip(people, names, counts, bboxes):
+        b = a + c
+        people_json.append({
+            "slot": int(p.get("slot", 0)),
+            "bbox_px": {"x": bx, "y": by, "w": bw, "h": bh},
+            "bbox": norm_bbox(bx, by, bw, bh, W, H),
+            "keypoints_px": [{"name": n, "x": x, "y": y, "score": sc} for n, x, y, sc in zip(nm, xs[a:b], ys[a:b], ss[a:b])],
+            "keypoints": [{"name": n, "x": x, "y": y} for n, x, y in zip(nm, nxs[a:b], nys[a:b])],
+            "score": float(p.get("score", 0.0))
+        })
+        a = b
+    best_json = people_json[best]
+    meta = people[best].get("meta")   # cascade: 단계별 품질 판정 기록
+
+    single_out = {
+        "version": "1.1",
+        "created_at": created_at,
+        "source_size": {"w": W, "h": H},
+        # 단일 파일에도 people 구조를 쓸 수도 있지만, 기존 호환을 위해 단일 인물 형태 유지
+        "bbox_px": best_json["bbox_px"],
+        "bbox": best_json["bbox"],
+        "keypoints_px": best_json["keypoints_px"],
+        "keypoints": best_json["keypoints"],
+        "slot": best_json["slot"],
+        "score": best_json["score"]
+    }
+    if meta:
+        single_out["meta"] = meta
+
+    multi_out = {
+        "version": "1.1",
+        "created_at": created_at,
+        "source_size": {"w": W, "h": H},
+        "people": people_json
+    }
+    if meta:
+        multi_out["meta"] = meta
+    return single_out, multi_out
+
+
+def write_outputs(img_path: str, single_out: Dict[str, Any], multi_out: Dict[str, Any], overwrite: bool,
+                  fmt: str = "json", store: Optional["PoseStore"] = None):
+    """fmt: json (.json + .multi.json) / columnar (store 에만) / both"""
+    if fmt != "columnar":
+        base = os.path.splitext(img_path)[0]
+        save_json(base + ".json", single_out, overwrite)
+        save_json(base + ".multi.json", multi_out, overwrite)
+    if store is not None:
+        size = multi_out["source_size"]
+        store.put(img_path, multi_out["people"], size["w"], size["h"])
+
+
+def process_image(img_path: str, backend: BackendBase, overwrite: bool, min_conf: float, failed_dir: str,
+                  fmt: str = "json", store: Optional["PoseStore"] = None,
+                  decoder: Optional[ImageDecoder] = None, prefetched: Optional[Future] = None) -> bool:
+    """
+    Sequential single-image path. Returns True when outputs were written.
+    prefetched: future of decoder(img_path) already submitted by the caller (decode overlaps the previous image).
+    """
     try:
         # Load image (BGR if using OpenCV pipeline, but for PIL we need W,H only)
-        if cv2 is not None:
-            img_bgr = cv2.imdecode(
-                np.fromfile(img_path, dtype=np.uint8), cv2.IMREAD_COLOR
-            ) if "|" in sys.executable else cv2.imread(img_path)
-            if img_bgr is None:
-                # fallback PIL to compute size, but backend needs ndarray; mark fail
-                with Image.open(img_path) as im:
-                    W, H = im.size
-                print(f"[fail] cannot read image by cv2: {img_path}")
-                move_to_failed(img_path, failed_dir, overwrite)
-                return
-            H, W = img_bgr.shape[:2]
-        else:
-            with Image.open(img_path) as im:
-                W, H = im.size
+        if not has_cv2():
             # backend will fail anyway without cv2; guard
             print("[error] OpenCV not available; cannot run backend. Move to failed.")
             move_to_failed(img_path, failed_dir, overwrite)
-            return
+            return False
+        if prefetched is not None:
+            img_bgr, size = prefetched.result()
+        else:
+            img_bgr, size = (decoder or make_decoder(backend))(img_path)
+        if img_bgr is None:
+            print(f"[fail] cannot read image by cv2: {img_path}")
+            move_to_failed(img_path, failed_dir, overwrite)
+            return False
+        W, H = size
 
-        people = backend.infer(img_bgr, min_conf=min_conf)
-        base = os.path.splitext(img_path)[0]
-        dirn = os.path.dirname(img_path)
+        people = rescale_people(backend.infer_sources([img_bgr], [(img_path, size)], min_conf=min_conf)[0],
+                                img_bgr, W, H)
         # failed dir is fixed to .../result_images/matching/failed under the *matching root* (handled by caller)
 
         if not people:
             print(f"[no person or low conf] {img_path}")
             move_to_failed(img_path, failed_dir, overwrite)
-            return
-
-        # build jsons
-        created_at = now_str()
-
-        # single choice: best person (by score), but also save .multi.json
-        best = max(people, key=lambda p: p.get("score", 0.0))
-        # slot order already assigned
-
-        # build per-person dicts
-        def build_person_dict(p: Dict[str, Any]) -> Dict[str, Any]:
-            kpx = p["keypoints_px"]
-            pxys = [(kp["x"], kp["y"]) for kp in kpx]
-            bx, by, bw, bh = bbox_from_points(pxys, W, H)
-            person = {
-                "slot": int(p.get("slot", 0)),
-                "bbox_px": {"x": bx, "y": by, "w": bw, "h": bh},
-                "bbox": norm_bbox(bx, by, bw, bh, W, H),
-                "keypoints_px": [{"name": kp["name"], "x": float(kp["x"]), "y": float(kp["y"]), "score": float(kp.get("score", 1.0))} for kp in kpx],
-                "keypoints": [{"name": kp["name"], "x": norm_xy(kp["x"], kp["y"], W, H)[0], "y": norm_xy(kp["x"], kp["y"], W, H)[1]} for kp in kpx],
-                "score": float(p.get("score", 0.0))
-            }
-            return person
-
-        people_json = [build_person_dict(p) for p in people]
-        best_json = build_person_dict(best)
-
-        single_out = {
-            "version": "1.1",
-            "created_at": created_at,
-            "source_size": {"w": W, "h": H},
-            # 단일 파일에도 people 구조를 쓸 수도 있지만, 기존 호환을 위해 단일 인물 형태 유지
-            "bbox_px": best_json["bbox_px"],
-            "bbox": best_json["bbox"],
-            "keypoints_px": best_json["keypoints_px"],
-            "keypoints": best_json["keypoints"],
-            "slot": best_json["slot"],
-            "score": best_json["score"]
-        }
-
-        multi_out = {
-            "version": "1.1",
-            "created_at": created_at,
-            "source_size": {"w": W, "h": H},
-            "people": people_json
-        }
+            return False
 
-        save_json(base + ".json", single_out, overwrite)
-        save_json(base + ".multi.json", multi_out, overwrite)
+        single_out, multi_out = build_outputs(people, W, H)
+        write_outputs(img_path, single_out, multi_out, overwrite, fmt, store)
+        return True
 
     except Exception as e:
         print(f"[error] {img_path}: {e}")
         # on error, move to failed
         move_to_failed(img_path, failed_dir, overwrite)
+        return False
+
+
+def run_pipeline(imgs: List[str], backend: BackendBase, overwrite: bool, min_conf: float, failed_dir: str,
+                 batch_size: int = 8, workers: int = 4,
+                 on_done: Optional[Callable[[str], None]] = None,
+                 fmt: str = "json", store: Optional["PoseStore"] = None,
+                 decoder: Optional[ImageDecoder] = None) -> Dict[str, Any]:
+    """
+    3-stage pipeline:
+      1) decode  : ThreadPoolExecutor(workers), keeps a bounded prefetch window ahead of inference
+                   (decoder: default make_decoder(backend) = reduced JPEG decode, keypoints mapped back to source px)
+      2) infer   : fixed-size batches -> backend.infer_sources() (one model.predict per batch on ultra;
+                   the cascade re-decodes escalated images from their source paths)
+      3) write   : JSON build + save on a writer pool so disk I/O overlaps the next batch
+                   (columnar rows go to `store`; written to poses.npy by store.save())
+    on_done(img_path) is called (main thread) for every image whose outputs were written.
+    Returns {"ok": n, "fail": n, "failed": [paths]}.
+    """
+    batch_size = max(1, int(batch_size))
+    workers = max(1, int(workers))
+    decoder = decoder or make_decoder(backend)
+    ahead = batch_size * 2 + workers
+    stats: Dict[str, Any] = {"ok": 0, "fail": 0, "failed": []}
+    total = len(imgs)
+
+    def fail(img_path: str, msg: str):
+        print(msg)
+        move_to_failed(img_path, failed_dir, overwrite)
+        if store is not None:
+            store.drop(img_path)
+        stats["fail"] += 1
+        stats["failed"].append(img_path)
+
+    def write_job(img_path: str, people, W: int, H: int):
+        single_out, multi_out = build_outputs(people, W, H)
+        write_outputs(img_path, single_out, multi_out, overwrite, fmt, store)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as decode_pool, \
+         ThreadPoolExecutor(max_workers=max(1, workers // 2), thread_name_prefix="write") as write_pool:
+
+        pending_writes = []
+
+        def flush(batch: List[Tuple[str, Any, Tuple[int, int]]]):
+            if not batch:
+                return
+            try:
+                results = backend.infer_sources([img for _, img, _ in batch],
+                                                [(img_path, size) for img_path, _, size in batch], min_conf=min_conf)
+            except Exception as e:
+                for img_path, _, _ in batch:
+                    fail(img_path, f"[error] {img_path}: {e}")
+                return
+            for (img_path, img, (W, H)), people in zip(batch, results):
+                if not people:
+                    fail(img_path, f"[no person or low conf] {img_path}")
+                    continue
+                rescale_people(people, img, W, H)
+                pending_writes.append((img_path, write_pool.submit(write_job, img_path, people, W, H)))
+
+        batch = []
+        done = 0
+        for img_path, fut in prefetch(imgs, decoder, decode_pool, ahead):
+            done += 1
+            print(f"[{done}/{total}] {img_path}")
+            try:
+                img, size = fut.result()
+            except Exception as e:
+                fail(img_path, f"[error] {img_path}: {e}")
+                continue
+            if img is None:
+                fail(img_path, f"[fail] cannot read image by cv2: {img_path}")
+                continue
+            batch.append((img_path, img, size))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        flush(batch)
+
+        for img_path, fut in pending_writes:
+            try:
+                fut.result()
+                stats["ok"] += 1
+                if on_done:
+                    on_done(img_path)
+            except Exception as e:
+                fail(img_path, f"[error] {img_path}: {e}")
+
+    return stats
+
+
+# ---------------------------
+# Multi-process sharding (MediaPipe: 1 core per Pose instance)
+# ---------------------------
+
+_WORKER_BACKEND: Optional[BackendBase] = None
+
+
+def _init_shard_worker(backend_name: str, backend_kw: Optional[Dict[str, Any]] = None):
+    """Process initializer: every worker owns its own backend instance."""
+    global _WORKER_BACKEND
+    if has_cv2():
+        # one process per core -> keep OpenCV from spawning its own threads
+        cv2.setNumThreads(1)
+    _WORKER_BACKEND = BACKENDS[backend_name](**(backend_kw or {}))
+
+
+def _process_shard(job: Tuple[List[str], bool, float, str, str, str]) -> Dict[str, Any]:
+    shard, overwrite, min_conf, failed_dir, fmt, decode = job
+    from pose_store import PoseStore
+    # columnar rows are collected here and merged into the parent's PoseStore
+    store = PoseStore() if fmt != "json" else None
+    decoder = make_decoder(_WORKER_BACKEND, decode)
+    done, failed = [], []
+    # next image decodes on a helper thread while the current one runs inference
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="decode") as decode_pool:
+        for img_path, fut in prefetch(shard, decoder, decode_pool, 1):
+            if process_image(img_path, _WORKER_BACKEND, overwrite, min_conf, failed_dir, fmt, store,
+                             prefetched=fut):
+                done.append(img_path)
+            else:
+                failed.append(img_path)
+    rows = store.pending() if store is not None else {}
+    cascade = _WORKER_BACKEND.take_stats() if isinstance(_WORKER_BACKEND, CascadeBackend) else None
+    return {"done": done, "failed": failed, "rows": rows, "pid": os.getpid(), "cascade": cascade}
+
+
+def run_sharded(imgs: List[str], backend_name: str, overwrite: bool, min_conf: float, failed_dir: str,
+                procs: int, chunk_size: int = 0,
+                on_done: Optional[Callable[[str], None]] = None,
+                fmt: str = "json", store: Optional["PoseStore"] = None,
+                decode: str = "reduced", backend_kw: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Shard images across `procs` worker processes (spawn context; each builds its own backend once).
+    Shards are small chunks handed out with imap_unordered so slow images do not stall one worker.
+    on_done(img_path) is called in the parent as each shard comes back.
+    Returns merged summary {"ok", "fail", "failed": [paths], "per_proc": {pid: ok+fail}}
+    (+ "cascade": merged escalation stats with --backend cascade).
+    """
+    import multiprocessing as mproc
+
+    procs = max(1, int(procs))
+    if chunk_size <= 0:
+        # ~8 shards per worker: good balance without much IPC
+        chunk_size = max(1, len(imgs) // (procs * 8))
+    shards = [imgs[i:i + chunk_size] for i in range(0, len(imgs), chunk_size)]
+    jobs = [(shard, overwrite, min_conf, failed_dir, fmt, decode) for shard in shards]
+
+    summary: Dict[str, Any] = {"ok": 0, "fail": 0, "failed": [], "per_proc": {}}
+    ctx = mproc.get_context("spawn")
+    with ctx.Pool(processes=procs, initializer=_init_shard_worker, initargs=(backend_name, backend_kw)) as pool:
+        done = 0
+        for res in pool.imap_unordered(_process_shard, jobs):
+            done += len(res["done"]) + len(res["failed"])
+            summary["ok"] += len(res["done"])
+            summary["fail"] += len(res["failed"])
+            summary["failed"].extend(res["failed"])
+            per = summary["per_proc"]
+            per[res["pid"]] = per.get(res["pid"], 0) + len(res["done"]) + len(res["failed"])
+            if res["cascade"]:
+                summary["cascade"] = CascadeBackend.merge_stats(summary.get("cascade"), res["cascade"])
+            if store is not None:
+                for img_path, rows in res["rows"].items():
+                    store.put_rows(img_path, rows)
+                for img_path in res["failed"]:
+                    store.drop(img_path)
+            if on_done:
+                for img_path in res["done"]:
+                    on_done(img_path)
+            print(f"[shard] {done}/{len(imgs)} (pid={res['pid']})")
+    summary["failed"].sort()
+    return summary
 
 
 def collect_images(root: str, recursive: bool, patterns: List[str]) -> List[str]:
@@ -374,43 +1129,147 @@ def collect_images(root: str, recursive: bool, patterns: List[str]) -> List[str]
     return files
 
 
+def image_size(img_path: str) -> Optional[Tuple[int, int]]:
+    """(W, H) from the JPEG SOF / PNG IHDR header without decoding. None if unknown or unreadable."""
+    try:
+        with open(img_path, "rb") as f:
+            head = f.read(1 << 18)   # EXIF/ICC segments come before SOF
+    except OSError:
+        return None
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and len(head) >= 24:
+        return int.from_bytes(head[16:20], "big"), int.from_bytes(head[20:24], "big")
+    return jpeg_size(head)
+
+
+def legacy_output_matches(img_path: str, multi_json: str) -> bool:
+    """
+    A JSON written before the manifest existed belongs to the current image if it is not older
+    than the image, or if its source_size is the image size (either orientation: EXIF rotation).
+    """
+    try:
+        if os.stat(multi_json).st_mtime_ns >= os.stat(img_path).st_mtime_ns:
+            return True
+        with open(multi_json, "r", encoding="utf-8") as f:
+            size = json.load(f).get("source_size") or {}
+    except (OSError, ValueError, AttributeError):
+        return False
+    dims = image_size(img_path)
+    return dims is not None and (size.get("w"), size.get("h")) in (dims, dims[::-1])
+
+
 def resolve_failed_dir(root: str) -> str:
     """
     - root 가 ".../result_images/matching" 인 경우 그 안의 "failed"를 반환
     - 하위(예: .../matching/1)를 넘겨도 상위 matching 을 찾아 failed 로 고정
     """
     # 탐색: root에서 위로 올라가며 'matching' 폴더를 찾는다
-    cur = os.path.abspath(root)
-    target = None
-    for _ in range(5):
-        base = os.path.basename(cur)
-        if base.lower() == "matching":
-            target = cur
-            break
-        parent = os.path.dirname(cur)
-        if parent == cur:
-            break
-        cur = parent
-    if target is None:
-        target = os.path.abspath(root)
-    failed = os.path.join(target, "failed")
+    failed = os.path.join(find_matching_root(root), "failed")
     ensure_dir(failed)
     return failed
 
 
+def select_for_update(imgs: List[str], manifest: Manifest, producer: str, overwrite: bool,
+                      fmt: str = "json", store: Optional["PoseStore"] = None) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Keep only images that are new / changed / indexed by another producer / missing outputs.
+    Legacy JSONs (no manifest record yet) are adopted without re-inference unless --overwrite,
+    but only when they match the current image (legacy_output_matches); stale ones are "legacy_stale".
+    With a columnar store, up-to-date images missing from poses.npy are converted from .multi.json.
+    Records of images that no longer exist are dropped first (reasons["pruned"]).
+    """
+    todo, reasons = [], {}
+    pruned = manifest.prune()
+    if pruned:
+        reasons["pruned"] = len(pruned)
+    for img in imgs:
+        base = os.path.splitext(img)[0]
+        json_outputs = [base + ".json", base + ".multi.json"]
+        if overwrite:
+            need, why = True, "overwrite"
+        else:
+            need, why = manifest.needs_update(img, producer, outputs=json_outputs if fmt != "columnar" else None)
+            if why == "new" and all(os.path.exists(o) for o in json_outputs):
+                if legacy_output_matches(img, json_outputs[1]):
+                    manifest.record(img, producer)
+                    need, why = False, "adopted"
+                else:
+                    why = "legacy_stale"
+            if not need and store is not None and not store.has(img):
+                if os.path.exists(json_outputs[1]):
+                    store.put_json(img, json_outputs[1])
+                    why = "converted"
+                else:
+                    need, why = True, "missing_output"
+        reasons[why] = reasons.get(why, 0) + 1
+        if need:
+            todo.append(img)
+    return todo, reasons
+
+
 def parse_args():
-    p = argparse.ArgumentParser(description="Generate pose keypoints JSONs (.json & .multi.json)")
+    p = argparse.ArgumentParser(description="Generate pose keypoints JSONs (.json & .multi.json) and/or columnar poses.npy")
     p.add_argument("--root", required=True, help="Root folder to scan (e.g., ...\\WebContent\\result_images\\matching)")
     p.add_argument("--recursive", action="store_true", help="Recurse into subdirectories")
     p.add_argument("--overwrite", action="store_true", help="Overwrite existing JSONs")
     p.add_argument("--min_conf", type=float, default=0.3, help="Minimum confidence to accept a person (0~1, default 0.3)")
-    p.add_argument("--backend", choices=["auto","ultra","mediapipe"], default="auto", help="Pose backend (default: auto)")
+    p.add_argument("--backend", choices=["auto","ultra","mediapipe","cascade"], default="auto",
+                   help="Pose backend (default: auto). cascade: fast pass + quality-gated escalation (--cascade)")
+    p.add_argument("--cascade", default=CASCADE_DEFAULT,
+                   help="Cascade stages in order, kind:weights[@imgsz] comma-separated (default: %(default)s)")
+    p.add_argument("--gate-min-valid", type=int, default=10, help="cascade: min joints with score >= 0.3 per person (default 10)")
+    p.add_argument("--gate-min-score", type=float, default=0.5, help="cascade: min mean score of valid joints (default 0.5)")
+    p.add_argument("--gate-min-area", type=float, default=0.01, help="cascade: min keypoint bbox area / image area (default 0.01)")
+    p.add_argument("--gate-person-conf", type=float, default=0.5,
+                   help="cascade: people below this score are ignored by the gate (background detections, default 0.5)")
     p.add_argument("--patterns", default="*.jpg,*.jpeg,*.png,*.bmp,*.webp", help="Comma-separated glob patterns")
+    p.add_argument("--batch-size", type=int, default=8, help="Images per inference call (default 8)")
+    p.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1), help="Decode/write worker threads")
+    p.add_argument("--procs", type=int, default=1,
+                   help="Shard images across N worker processes, each with its own backend (for MediaPipe; default 1)")
+    p.add_argument("--no-manifest", action="store_true",
+                   help="Ignore matching/.pose_manifest.json (process every image, old skip-if-exists behavior)")
+    p.add_argument("--format", choices=["json", "columnar", "both"], default="json",
+                   help="json: .json/.multi.json per image, columnar: one poses.npy per folder, both (default json)")
+    p.add_argument("--decode", choices=["reduced", "full"], default="reduced",
+                   help="reduced: JPEG DCT-scaled decode down to the backend input size (default) / full: always full size")
+    p.add_argument("--profile-startup", action="store_true",
+                   help="Report where startup time goes (imports, model load) and exit without processing")
     return p.parse_args()
 
 
+def profile_startup(backend_arg: str):
+    """--profile-startup: 단계별 시작 시간 (스크립트 import -> 백엔드 결정 -> numpy/cv2 -> 모델 로딩)"""
+    stages = [("script import + argparse", time.perf_counter() - _T_START)]
+
+    t0 = time.perf_counter()
+    name = resolve_backend(backend_arg)
+    stages.append((f"resolve backend ({name})", time.perf_counter() - t0))
+
+    t0 = time.perf_counter()
+    has_cv2()
+    stages.append(("numpy + cv2 import", time.perf_counter() - t0))
+
+    t0 = time.perf_counter()
+    try:
+        BACKENDS[name]()
+        stages.append((f"{name} backend (import + load + warm-up)", time.perf_counter() - t0))
+    except Exception as e:
+        stages.append((f"{name} backend failed: {e}", time.perf_counter() - t0))
+
+    total = sum(sec for _, sec in stages)
+    print("[startup] stage                                     time")
+    for label, sec in stages:
+        print(f"[startup] {label:<40} {sec * 1000:9.1f}ms")
+    print(f"[startup] {'total':<40} {total * 1000:9.1f}ms")
+    for mod, sec in sorted(IMPORT_TIMES.items(), key=lambda kv: -kv[1]):
+        print(f"[startup]   import {mod:<33} {sec * 1000:9.1f}ms")
+
+
 def main():
     args = parse_args()
+    if args.profile_startup:
+        profile_startup(args.backend)
+        return
     root = args.root
     patterns = [s.strip() for s in args.patterns.split(",") if s.strip()]
 
@@ -421,30 +1280,109 @@ def main():
     failed_dir = resolve_failed_dir(root)
     print(f"[info] failed dir: {failed_dir}")
 
-    backend = pick_backend(args.backend)
-    print(f"[info] backend: {backend.name}")
+    backend_name = resolve_backend(args.backend)
+    print(f"[info] backend: {backend_name}")
+    backend_kw: Dict[str, Any] = {}
+    producer = BACKENDS[backend_name].producer
+    if backend_name == "cascade":
+        try:
+            parse_cascade(args.cascade)
+        except ValueError as e:
+            print(f"[error] --cascade: {e}")
+            sys.exit(1)
+        gate = QualityGate(min_valid=args.gate_min_valid, min_score=args.gate_min_score, min_area=args.gate_min_area,
+                           person_conf=args.gate_person_conf)
+        backend_kw = {"stages": args.cascade, "gate": gate}
+        producer = CascadeBackend.make_producer(args.cascade, gate)
+        print(f"[info] cascade: {' -> '.join(_stage_id(st) for st in CascadeBackend.available_stages(args.cascade, warn=False))} "
+              f"(gate {gate.spec()})")
 
     imgs = collect_images(root, args.recursive, patterns)
     print(f"[info] images: {len(imgs)} file(s)")
 
+    manifest = None
+    overwrite = args.overwrite
+    store = None
+    if args.format != "json":
+        from pose_store import PoseStore
+        store = PoseStore()
+    if not args.no_manifest:
+        manifest = Manifest.open(find_matching_root(root), tool="make_pose_keypoints")
+        imgs, reasons = select_for_update(imgs, manifest, producer, args.overwrite, args.format, store)
+        print(f"[info] manifest: {manifest.path}")
+        print("[info] to process: " + ", ".join(f"{k}={v}" for k, v in sorted(reasons.items())))
+        # 선택된 이미지는 신규/변경분이므로 기존 JSON 을 덮어쓴다
+        overwrite = True
+
     if not imgs:
+        if manifest:
+            manifest.save()
+        if store is not None:
+            for path in store.save():
+                print(f"[save] {path}")
         return
 
-    # numpy lazy import to support cv2.imdecode on Windows long path case
-    global np
-    import numpy as np
+    # numpy + cv2 are imported only now that there is work to do
+    if not has_cv2():
+        print("[error] OpenCV not available; cannot run backend.")
+        sys.exit(1)
 
-    for i, img in enumerate(imgs, 1):
-        print(f"[{i}/{len(imgs)}] {img}")
-        process_image(
-            img_path=img,
+    def on_done(img_path: str):
+        if manifest:
+            manifest.record(img_path, producer)
+
+    t0 = time.perf_counter()
+    if args.procs > 1:
+        if backend_name == "ultra":
+            print("[warn] --procs loads one YOLO model per process; --batch-size is usually faster for ultra")
+        stats = run_sharded(
+            imgs,
+            backend_name=backend_name,
+            overwrite=overwrite,
+            min_conf=args.min_conf,
+            failed_dir=failed_dir,
+            procs=args.procs,
+            on_done=on_done,
+            fmt=args.format,
+            store=store,
+            decode=args.decode,
+            backend_kw=backend_kw
+        )
+        mode = f"procs={args.procs}"
+    else:
+        backend = BACKENDS[backend_name](**backend_kw)
+        stats = run_pipeline(
+            imgs,
             backend=backend,
-            overwrite=args.overwrite,
+            overwrite=overwrite,
             min_conf=args.min_conf,
-            failed_dir=failed_dir
+            failed_dir=failed_dir,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            on_done=on_done,
+            fmt=args.format,
+            store=store,
+            decoder=make_decoder(backend, args.decode)
         )
-
-    print("[done] All images processed.")
+        mode = f"batch={args.batch_size}, workers={args.workers}"
+        if isinstance(backend, CascadeBackend):
+            stats["cascade"] = backend.take_stats()
+    elapsed = time.perf_counter() - t0
+
+    if manifest:
+        for f in stats.get("failed", []):
+            manifest.forget(f)
+        manifest.save()
+    if store is not None:
+        for path in store.save():
+            print(f"[save] {path}")
+
+    print(f"[done] ok={stats['ok']} fail={stats['fail']} total={len(imgs)}")
+    if stats.get("cascade"):
+        CascadeBackend.report(stats["cascade"])
+    for f in stats.get("failed", []):
+        print(f"[done] failed: {f}")
+    print(f"[done] {elapsed:.2f}s, {len(imgs) / max(elapsed, 1e-9):.2f} images/s ({mode})")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+pose_manifest.py
+
+- matching 라이브러리 증분 재색인용 매니페스트 (result_images/matching/.pose_manifest.json)
+- 이미지별 size / mtime / content hash(sha1) + 결과 JSON을 만든 도구·모델(producer) 기록
+- size+mtime 이 같으면 파일을 읽지 않고 skip, 다르면 hash 로 실제 변경 여부 확인
+- 도구(make_pose_keypoints / make_pose_keypoints_yolo / make_pose_jsons)별 섹션을 따로 관리
+
+    manifest = Manifest.open(find_matching_root(root), tool="make_pose_keypoints")
+    todo = [p for p in imgs if manifest.needs_update(p, producer, outputs=[...])[0]]
+    ...
+    manifest.record(p, producer)
+    manifest.save()
+"""
+
+import os
+import json
+import hashlib
+import datetime
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+MANIFEST_NAME = ".pose_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def find_matching_root(root: str) -> str:
+    """
+    root 에서 위로 올라가며 'matching' 폴더를 찾는다 (최대 5단계).
+    못 찾으면 root 자체를 반환.
+    """
+    cur = os.path.abspath(root)
+    for _ in range(5):
+        if os.path.basename(cur).lower() == "matching":
+            return cur
+        parent = os.path.dirname(cur)
+        if parent == cur:
+            break
+        cur = parent
+    return os.path.abspath(root)
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(chunk_size)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+class Manifest:
+    """Per-tool image -> {size, mtime_ns, sha1, producer, updated} records. Thread-safe record()/forget()."""
+
+    def __init__(self, matching_root: str, tool: str, records: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.root = os.path.abspath(matching_root)
+        self.path = os.path.join(self.root, MANIFEST_NAME)
+        self.tool = tool
+        self.records: Dict[str, Dict[str, Any]] = records or {}
+        self._lock = threading.Lock()
+        # sha1 computed in needs_update() is reused by record() (no second read)
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+
+    @classmethod
+    def open(cls, matching_root: str, tool: str) -> "Manifest":
+        data = cls._read(os.path.join(os.path.abspath(matching_root), MANIFEST_NAME))
+        return cls(matching_root, tool, records=dict(data.get("tools", {}).get(tool, {})))
+
+    @staticmethod
+    def _read(path: str) -> Dict[str, Any]:
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[warn] manifest unreadable, starting fresh: {path} ({e})")
+            return {}
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data
+
+    def key(self, img_path: str) -> str:
+        rel = os.path.relpath(os.path.abspath(img_path), self.root)
+        return rel.replace(os.sep, "/")
+
+    def needs_update(self, img_path: str, producer: str, outputs: Optional[List[str]] = None) -> Tuple[bool, str]:
+        """
+        Returns (needs_processing, reason). reason in
+        "new" / "changed" / "model" / "missing_output" / "unchanged" / "touched".
+        "touched" = mtime changed but content hash is identical (record refreshed, no work).
+        """
+        k = self.key(img_path)
+        st = os.stat(img_path)
+        rec = self.records.get(k)
+        if rec is None:
+            return True, "new"
+        if outputs and not all(os.path.exists(o) for o in outputs):
+            return True, "missing_output"
+
+        same_stat = rec.get("size") == st.st_size and rec.get("mtime_ns") == st.st_mtime_ns
+        if not same_stat:
+            digest = file_digest(img_path)
+            self._digests[k] = (st.st_size, st.st_mtime_ns, digest)
+            if digest != rec.get("sha1"):
+                return True, "changed"
+            if rec.get("producer") != producer:
+                return True, "model"
+            with self._lock:
+                rec["size"], rec["mtime_ns"] = st.st_size, st.st_mtime_ns
+            return False, "touched"
+
+        if rec.get("producer") != producer:
+            return True, "model"
+        return False, "unchanged"
+
+    def record(self, img_path: str, producer: str):
+        k = self.key(img_path)
+        st = os.stat(img_path)
+        cached = self._digests.pop(k, None)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            digest = cached[2]
+        else:
+            digest = file_digest(img_path)
+        rec = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha1": digest,
+            "producer": producer,
+            "updated": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            self.records[k] = rec
+
+    def has_record(self, img_path: str) -> bool:
+        return self.key(img_path) in self.records
+
+    def forget(self, img_path: str):
+        with self._lock:
+            self.records.pop(self.key(img_path), None)
+
+    def prune(self) -> List[str]:
+        """Drop records whose image no longer exists (deleted / moved to failed). Returns the removed keys."""
+        with self._lock:
+            gone = [k for k in self.records if not os.path.exists(os.path.join(self.root, k))]
+            for k in gone:
+                del self.records[k]
+        return gone
+
+    def save(self):
+        """Merge own tool section into the file on disk (other tools' sections kept) and replace atomically."""
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock:
+            data = self._read(self.path)
+            tools = data.get("tools", {})
+            tools[self.tool] = dict(sorted(self.records.items()))
+            out = {"version": MANIFEST_VERSION, "tools": tools}
+            tmp = self.path + f".tmp{os.getpid()}"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(out, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
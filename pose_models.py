@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+pose_models.py
+
+- 포즈 모델(YOLO pose / MediaPipe Pose) 공용 풀: make_pose_keypoints.py, make_pose_keypoints_yolo.py, 서버가 함께 사용
+- 키 = (kind, weights, imgsz, device) -> 로드 + warm-up 이 끝난 인스턴스를 보관해 재사용
+- checkout() 동안에는 한 스레드만 인스턴스를 사용 (YOLO predictor / MediaPipe graph 는 스레드 공유 불가)
+  같은 키로 동시에 요청하면 인스턴스를 하나 더 로드 (전체 최대 max_models 개)
+- 자리가 없으면 가장 오래 쉰 인스턴스부터 제거(LRU), idle_ttl 초 이상 쓰지 않은 인스턴스도 제거
+- 인스턴스별 load / warm-up 시간, 사용 횟수는 stats() 로 조회
+
+    with POOL.checkout("yolo", "yolov8n-pose.pt", imgsz=640) as m:
+        results = m.predict([img1, img2])
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+POOL_MAX_MODELS = int(os.environ.get("POSE_MODEL_POOL_MAX", "4"))
+POOL_IDLE_TTL = float(os.environ.get("POSE_MODEL_IDLE_S", "900"))
+
+ModelKey = Tuple[str, str, Optional[int], Optional[str]]
+
+
+# ---------------------------
+# Loaders: (weights, imgsz, device) -> (model, warmup callable)
+# ---------------------------
+
+def _load_yolo(weights: str, imgsz: Optional[int], device: Optional[str]):
+    from ultralytics import YOLO
+    model = YOLO(weights)
+
+    def warmup():
+        import numpy as np
+        size = imgsz or 640
+        model.predict(source=np.zeros((size, size, 3), dtype=np.uint8), imgsz=size, device=device, verbose=False)
+    return model, warmup
+
+
+def _load_mediapipe_pose(weights: str, imgsz: Optional[int], device: Optional[str]):
+    # weights = "pose-c{model_complexity}"
+    import mediapipe as mp
+    complexity = int(weights.rsplit("c", 1)[-1]) if weights.startswith("pose-c") else 1
+    model = mp.solutions.pose.Pose(static_image_mode=True, model_complexity=complexity, enable_segmentation=False)
+
+    def warmup():
+        import numpy as np
+        model.process(np.zeros((imgsz or 256, imgsz or 256, 3), dtype=np.uint8))
+    return model, warmup
+
+
+LOADERS: Dict[str, Callable] = {
+    "yolo": _load_yolo,
+    "mediapipe": _load_mediapipe_pose,
+}
+
+
+class PooledModel:
+    """풀에 들어있는 인스턴스 1개 (model + 사용 통계)."""
+
+    def __init__(self, key: ModelKey, model: Any, load_s: float, warmup_s: float):
+        self.key = key
+        self.model = model
+        self.load_s = load_s
+        self.warmup_s = warmup_s
+        self.uses = 0
+        self.busy_s = 0.0
+        self.last_used = time.monotonic()
+        self.in_use = False
+
+    @property
+    def imgsz(self) -> Optional[int]:
+        return self.key[2]
+
+    @property
+    def device(self) -> Optional[str]:
+        return self.key[3]
+
+    def predict(self, source, **kw):
+        """YOLO: 키의 imgsz / device 를 기본값으로 model.predict"""
+        if self.imgsz:
+            kw.setdefault("imgsz", self.imgsz)
+        if self.device:
+            kw.setdefault("device", self.device)
+        kw.setdefault("verbose", False)
+        return self.model.predict(source=source, **kw)
+
+    def process(self, img_rgb):
+        """MediaPipe Pose.process"""
+        return self.model.process(img_rgb)
+
+    def close(self):
+        close = getattr(self.model, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+    def info(self) -> Dict[str, Any]:
+        kind, weights, imgsz, device = self.key
+        return {
+            "kind": kind, "weights": weights, "imgsz": imgsz, "device": device,
+            "load_ms": round(self.load_s * 1000, 1),
+            "warmup_ms": round(self.warmup_s * 1000, 1),
+            "uses": self.uses,
+            "busy_ms": round(self.busy_s * 1000, 1),
+            "idle_s": 0.0 if self.in_use else round(time.monotonic() - self.last_used, 1),
+            "in_use": self.in_use,
+        }
+
+
+class ModelPool:
+    """Bounded pool of loaded + warmed-up models keyed by (kind, weights, imgsz, device). Thread-safe."""
+
+    def __init__(self, max_models: int = POOL_MAX_MODELS, idle_ttl: float = POOL_IDLE_TTL, warmup: bool = True,
+                 loaders: Optional[Dict[str, Callable]] = None):
+        self.max_models = max(1, int(max_models))
+        self.idle_ttl = idle_ttl
+        self.warmup = warmup
+        # kind -> loader (기본 LOADERS + 추가/교체분, 벤치마크의 가짜 모델 등)
+        self.loaders = dict(LOADERS, **(loaders or {}))
+        self._models: List[PooledModel] = []
+        self._loading = 0
+        self._cond = threading.Condition()
+
+    def make_key(self, kind: str, weights: str, imgsz: Optional[int] = None, device: Optional[str] = None) -> ModelKey:
+        if kind not in self.loaders:
+            raise ValueError(f"unknown model kind: {kind} ({'/'.join(self.loaders)})")
+        return (kind, str(weights), int(imgsz) if imgsz else None, str(device) if device else None)
+
+    def _evict_idle(self, need_slot: bool):
+        """(lock held) idle_ttl 지난 인스턴스 제거 + 자리가 필요하면 LRU 로 하나 더 제거"""
+        now = time.monotonic()
+        evicted = [m for m in self._models if not m.in_use and now - m.last_used > self.idle_ttl]
+        if need_slot and not evicted and len(self._models) + self._loading >= self.max_models:
+            idle = [m for m in self._models if not m.in_use]
+            if idle:
+                evicted.append(min(idle, key=lambda m: m.last_used))
+        for m in evicted:
+            self._models.remove(m)
+            print(f"[model_pool] evict {m.key} (uses={m.uses})")
+        return evicted
+
+    def _acquire(self, key: ModelKey) -> Optional[PooledModel]:
+        """idle 인스턴스를 잡거나, 새로 로드할 자리를 예약(None). 자리가 없으면 대기."""
+        with self._cond:
+            while True:
+                for m in self._models:
+                    if m.key == key and not m.in_use:
+                        m.in_use = True
+                        return m
+                evicted = self._evict_idle(need_slot=True)
+                for m in evicted:
+                    m.close()
+                if len(self._models) + self._loading < self.max_models:
+                    self._loading += 1
+                    return None
+                self._cond.wait()
+
+    def _load(self, key: ModelKey) -> PooledModel:
+        kind, weights, imgsz, device = key
+        try:
+            t0 = time.perf_counter()
+            model, warmup = self.loaders[kind](weights, imgsz, device)
+            load_s = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            if self.warmup:
+                warmup()
+            warmup_s = time.perf_counter() - t0
+        except BaseException:
+            with self._cond:
+                self._loading -= 1
+                self._cond.notify_all()
+            raise
+        pm = PooledModel(key, model, load_s, warmup_s)
+        pm.in_use = True
+        with self._cond:
+            self._loading -= 1
+            self._models.append(pm)
+        print(f"[model_pool] loaded {key} (load {load_s * 1000:.0f}ms, warm-up {warmup_s * 1000:.0f}ms)")
+        return pm
+
+    @contextmanager
+    def checkout(self, kind: str, weights: str, imgsz: Optional[int] = None, device: Optional[str] = None):
+        """with 블록 동안 이 스레드 전용 인스턴스 (PooledModel)"""
+        key = self.make_key(kind, weights, imgsz, device)
+        pm = self._acquire(key) or self._load(key)
+        t0 = time.perf_counter()
+        try:
+            yield pm
+        finally:
+            with self._cond:
+                pm.uses += 1
+                pm.busy_s += time.perf_counter() - t0
+                pm.last_used = time.monotonic()
+                pm.in_use = False
+                self._cond.notify_all()
+
+    def preload(self, kind: str, weights: str, imgsz: Optional[int] = None, device: Optional[str] = None) -> Dict[str, Any]:
+        """인스턴스 1개를 미리 로드 + warm-up (서버 시작 시)"""
+        with self.checkout(kind, weights, imgsz, device) as pm:
+            return pm.info()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            return [m.info() for m in self._models]
+
+    def close(self):
+        """idle 인스턴스 모두 해제"""
+        with self._cond:
+            idle = [m for m in self._models if not m.in_use]
+            for m in idle:
+                self._models.remove(m)
+        for m in idle:
+            m.close()
+
+
+# 프로세스 공용 풀 (CLI 는 프로세스마다, 서버는 워커 프로세스마다 1개)
+POOL = ModelPool()
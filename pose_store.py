@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+pose_store.py
+
+- matching 폴더별 컬럼형 키포인트 저장소 ({folder}/poses.npy)
+- 사람 1명 = 구조화 배열 1행: image, w, h, slot, score, bbox(x, y, w, h px), kps(17, 3: x, y, score px)
+- 이미지 이름 순(자연 정렬)으로 행이 묶여 있음, 포즈가 없는 이미지는 행이 없음
+- np.load(mmap_mode="r") 로 읽으므로 JSON 파싱 없이 바로 매핑 (서버 TargetIndex)
+- .json / .multi.json 은 make_pose_keypoints.py --format json|both 로 계속 출력 가능
+
+    store = PoseStore()
+    store.put(img_path, multi_out["people"], W, H)   # .multi.json 의 people 형식
+    store.save()                                     # 바뀐 폴더만 poses.npy 원자적 교체
+    rows = load_rows(folder)                         # memmap
+"""
+
+import os
+import json
+import threading
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+STORE_NAME = "poses.npy"
+
+# COCO 17 keypoints (YOLO pose order) - make_pose_keypoints.COCO_NAMES 와 같은 순서
+COCO_NAMES = [
+    "nose", "left_eye", "right_eye", "left_ear", "right_ear",
+    "left_shoulder", "right_shoulder", "left_elbow", "right_elbow",
+    "left_wrist", "right_wrist", "left_hip", "right_hip",
+    "left_knee", "right_knee", "left_ankle", "right_ankle"
+]
+_NAME_TO_IDX = {n: i for i, n in enumerate(COCO_NAMES)}
+
+POSE_DTYPE = np.dtype([
+    ("image", "U64"),
+    ("w", "<i4"),
+    ("h", "<i4"),
+    ("slot", "<i2"),
+    ("score", "<f4"),
+    ("bbox", "<f4", (4,)),
+    ("kps", "<f4", (len(COCO_NAMES), 3)),
+])
+
+
+def _natural_key(name: str):
+    stem = os.path.splitext(name)[0]
+    return (int(stem) if stem.isdigit() else float("inf"), name)
+
+
+def people_to_rows(image: str, people: List[Dict[str, Any]], W: int, H: int) -> np.ndarray:
+    """.multi.json people([{slot, score, bbox_px, keypoints_px}]) -> POSE_DTYPE 행 (slot 순)"""
+    rows = np.zeros(len(people), dtype=POSE_DTYPE)
+    rows["image"] = image
+    rows["w"], rows["h"] = W, H
+    for i, p in enumerate(sorted(people, key=lambda p: p.get("slot", 0))):
+        rows["slot"][i] = int(p.get("slot", i))
+        rows["score"][i] = float(p.get("score", 0.0))
+        kps = rows["kps"][i]
+        for kp in p.get("keypoints_px") or []:
+            j = _NAME_TO_IDX.get(kp.get("name"))
+            if j is not None:
+                kps[j] = (float(kp["x"]), float(kp["y"]), float(kp.get("score", 1.0)))
+        b = p.get("bbox_px")
+        if b:
+            rows["bbox"][i] = (b["x"], b["y"], b["w"], b["h"])
+        elif (kps[:, 2] > 0).any():
+            xy = kps[kps[:, 2] > 0, :2]
+            lo, hi = xy.min(axis=0), xy.max(axis=0)
+            rows["bbox"][i] = (lo[0], lo[1], hi[0] - lo[0], hi[1] - lo[1])
+    return rows
+
+
+def load_rows(folder: str, mmap: bool = True) -> Optional[np.ndarray]:
+    """{folder}/poses.npy -> POSE_DTYPE 배열 (기본 read-only memmap). 없거나 형식이 다르면 None."""
+    path = os.path.join(folder, STORE_NAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        rows = np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+    except (OSError, ValueError) as e:
+        print(f"[warn] pose store unreadable: {path} ({e})")
+        return None
+    if rows.dtype != POSE_DTYPE or rows.ndim != 1:
+        print(f"[warn] pose store format mismatch, ignored: {path}")
+        return None
+    return rows
+
+
+def group_rows(rows: np.ndarray) -> Dict[str, slice]:
+    """이미지 이름 -> 행 slice (행은 이미지별로 연속)"""
+    if rows is None or not len(rows):
+        return {}
+    names = rows["image"]
+    cuts = np.flatnonzero(names[1:] != names[:-1]) + 1
+    starts = np.concatenate([[0], cuts])
+    ends = np.concatenate([cuts, [len(rows)]])
+    return {str(names[s]): slice(int(s), int(e)) for s, e in zip(starts, ends)}
+
+
+class PoseStore:
+    """
+    폴더별 poses.npy 갱신기. put()/drop() 은 메모리에만 쌓고(스레드 안전),
+    save() 에서 폴더마다 기존 파일과 합쳐 한 번에 다시 쓴다.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, Optional[np.ndarray]] = {}   # abs img path -> rows (None = 삭제)
+        self._existing: Dict[str, Dict[str, slice]] = {}      # folder -> 기존 파일의 이미지 목록
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _split(img_path: str):
+        p = os.path.abspath(img_path)
+        return os.path.dirname(p), os.path.basename(p)
+
+    def has(self, img_path: str) -> bool:
+        folder, name = self._split(img_path)
+        with self._lock:
+            p = os.path.join(folder, name)
+            if p in self._pending:
+                return self._pending[p] is not None
+            if folder not in self._existing:
+                self._existing[folder] = group_rows(load_rows(folder))
+            return name in self._existing[folder]
+
+    def put(self, img_path: str, people: List[Dict[str, Any]], W: int, H: int):
+        self.put_rows(img_path, people_to_rows(os.path.basename(img_path), people, W, H))
+
+    def put_rows(self, img_path: str, rows: np.ndarray):
+        with self._lock:
+            self._pending[os.path.abspath(img_path)] = rows
+
+    def put_json(self, img_path: str, multi_json_path: str):
+        """기존 .multi.json 을 추론 없이 행으로 변환"""
+        with open(multi_json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        size = data.get("source_size") or {}
+        self.put(img_path, data.get("people") or [], int(size.get("w", 0)), int(size.get("h", 0)))
+
+    def drop(self, img_path: str):
+        with self._lock:
+            self._pending[os.path.abspath(img_path)] = None
+
+    def pending(self) -> Dict[str, Optional[np.ndarray]]:
+        """아직 저장하지 않은 변경분 (프로세스 샤드 -> 부모로 전달용)"""
+        with self._lock:
+            return dict(self._pending)
+
+    def save(self) -> List[str]:
+        """바뀐 폴더의 poses.npy 를 다시 쓴다 (이미지 파일이 사라진 행은 제거). 쓴 경로 목록 반환."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._existing.clear()
+        by_folder: Dict[str, Dict[str, Optional[np.ndarray]]] = {}
+        for p, rows in pending.items():
+            folder, name = self._split(p)
+            by_folder.setdefault(folder, {})[name] = rows
+
+        written = []
+        for folder, changes in sorted(by_folder.items()):
+            old = load_rows(folder, mmap=False)
+            images = {name: old[sl] for name, sl in group_rows(old).items()}
+            del old
+            images.update(changes)
+            parts = [images[n] for n in sorted(images, key=_natural_key)
+                     if images[n] is not None and len(images[n]) and os.path.exists(os.path.join(folder, n))]
+            path = os.path.join(folder, STORE_NAME)
+            if not parts:
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            tmp = path + f".tmp{os.getpid()}.npy"
+            np.save(tmp, np.concatenate(parts).astype(POSE_DTYPE, copy=False))
+            os.replace(tmp, path)
+            written.append(path)
+        return written
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+pose_tracking.py
+
+- 영상 / 웹캠 프레임 사이에서 사람을 이어 붙여 고정 ID(track id) 부여 + 키포인트 스무딩
+- 검출(백엔드 추론)은 detect_every 프레임마다 1번, 그 사이 프레임은 광류(cv2 Lucas-Kanade)로 키포인트만 추적
+  (cv2 가 없거나 프레임을 넘기지 않으면 등속 예측)
+- 연결: 예측 위치와 새 검출의 관절 평균 거리(몸 크기로 정규화)가 가까운 쌍부터 탐욕적으로 배정
+  첫 검출은 x-center 순으로 ID 를 받으므로 slot 순서는 기존(x 정렬)과 같고, 이후에는 ID 순서 유지
+- 필터: "one_euro"(기본, 느릴 때 강하게 / 빠를 때 약하게) / "ema" / "none"
+- video_analysis(세션 영상 분석)와 /ws/live(서버 추론) 가 함께 사용
+
+    tracker = PoseTracker(detect_every=3)
+    for t, frame in frames:
+        people = backend_kps(frame) if tracker.needs_detection() else None   # (n, 17, 3) px
+        for track_id, kps, score in tracker.update(t, people, frame):
+            ...
+"""
+
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+TRACK_FILTERS = ("one_euro", "ema", "none")
+FLOW_MAX_SIDE = 320        # 광류는 긴 변 320px 회색조에서 계산
+FLOW_WIN = (15, 15)
+FLOW_LEVELS = 3
+
+
+def _alpha(dt, cutoff):
+    tau = 1.0 / (2.0 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """좌표 배열 단위 1€ 필터 (Casiez et al. 2012). 값이 없는(mask=False) 좌표는 이전 값 유지."""
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.05, d_cutoff: float = 1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.x = None
+        self.dx = None
+        self.t = None
+        self.seen = None   # 한 번이라도 값이 있었던 좌표
+
+    def __call__(self, x, t: float, mask=None):
+        x = np.asarray(x, dtype=np.float64)
+        mask = np.ones(x.shape, bool) if mask is None else np.broadcast_to(mask, x.shape)
+        if self.x is None:
+            self.x, self.dx, self.t = x.copy(), np.zeros_like(x), t
+            self.seen = mask.copy()
+            return self.x.copy()
+        dt = max(t - self.t, 1e-3)
+        self.t = t
+        fresh = mask & ~self.seen       # 새로 보인 좌표는 필터 없이 시작
+        dx = np.where(mask & self.seen, (x - self.x) / dt, 0.0)
+        a_d = _alpha(dt, self.d_cutoff)
+        self.dx = a_d * dx + (1 - a_d) * self.dx
+        a = _alpha(dt, self.min_cutoff + self.beta * np.abs(self.dx))
+        self.x = np.where(mask, np.where(fresh, x, a * x + (1 - a) * self.x), self.x)
+        self.seen |= mask
+        return self.x.copy()
+
+
+class EmaFilter:
+    """지수 이동 평균 (alpha = 새 값 비중)."""
+
+    def __init__(self, alpha: float = 0.5):
+        self.alpha = alpha
+        self.x = None
+
+    def __call__(self, x, t: float, mask=None):
+        x = np.asarray(x, dtype=np.float64)
+        mask = np.ones(x.shape, bool) if mask is None else np.broadcast_to(mask, x.shape)
+        if self.x is None:
+            self.x = x.copy()
+        else:
+            self.x = np.where(mask, self.alpha * x + (1 - self.alpha) * self.x, self.x)
+        return self.x.copy()
+
+
+class NoFilter:
+    def __call__(self, x, t: float, mask=None):
+        return np.asarray(x, dtype=np.float64).copy()
+
+
+def make_filter(kind: str, **kw):
+    if kind == "one_euro":
+        return OneEuroFilter(**kw)
+    if kind == "ema":
+        return EmaFilter(**kw)
+    if kind == "none":
+        return NoFilter()
+    raise ValueError(f"unknown filter: {kind} ({'/'.join(TRACK_FILTERS)})")
+
+
+MIN_BODY_PX = 16.0
+
+
+def _body_size(kps) -> float:
+    """보이는 관절 bbox 대각선 (px, 최소 MIN_BODY_PX)"""
+    ok = kps[:, 2] > 0
+    if ok.sum() < 2:
+        return MIN_BODY_PX
+    pts = kps[ok, :2]
+    return max(MIN_BODY_PX, float(np.linalg.norm(pts.max(axis=0) - pts.min(axis=0))))
+
+
+def pose_distance(a, b) -> float:
+    """두 포즈의 공통 관절 평균 거리 / a 의 몸 크기 (공통 관절이 없으면 inf)"""
+    both = (a[:, 2] > 0) & (b[:, 2] > 0)
+    if not both.any():
+        return math.inf
+    d = np.linalg.norm(a[both, :2] - b[both, :2], axis=1).mean()
+    return float(d / _body_size(a))
+
+
+class Track:
+    """사람 1명 (고정 id + 예측용 원시 키포인트 + 출력용 스무딩 키포인트)."""
+
+    def __init__(self, track_id: int, kps, t: float, score: float, flt):
+        self.id = track_id
+        self.raw = np.asarray(kps, dtype=np.float64).copy()   # (17, 3) 마지막 검출 / 추적 위치
+        self.vel = np.zeros((len(self.raw), 2))                # px/s (등속 예측)
+        self.lost = np.zeros(len(self.raw), bool)              # 광류를 잃은 관절 (다음 검출까지 등속 예측)
+        self.t = t
+        self.det_xy, self.det_t = self.raw[:, :2].copy(), t   # 마지막 검출 (등속 예측 속도 계산)
+        self.score = score
+        self.filter = flt
+        self.misses = 0            # 연속으로 검출과 짝이 안 된 검출 프레임 수
+        self.hits = 1
+        self.smooth = self.filter(self.raw[:, :2], t, self.raw[:, 2:3] > 0)
+
+    def matched(self, kps, t: float, score: float):
+        kps = np.asarray(kps, dtype=np.float64)
+        both = (kps[:, 2] > 0) & (self.raw[:, 2] > 0)
+        if t > self.det_t:
+            self.vel[both] = (kps[both, :2] - self.det_xy[both]) / (t - self.det_t)
+        self.raw = kps.copy()
+        self.lost[:] = False
+        self.det_xy, self.det_t = kps[:, :2].copy(), t
+        self.score = score
+        self.misses = 0
+        self.hits += 1
+
+    def kps(self):
+        out = self.raw.copy()
+        out[:, :2] = self.smooth
+        return out
+
+
+class PoseTracker:
+    """프레임 순서대로 update() 를 호출. 스레드 하나에서만 사용."""
+
+    def __init__(self, detect_every: int = 3, filter: str = "one_euro", match_thresh: float = 0.6,
+                 max_misses: int = 2, flow: bool = True, filter_kw: Optional[Dict[str, Any]] = None):
+        if filter not in TRACK_FILTERS:
+            raise ValueError(f"unknown filter: {filter} ({'/'.join(TRACK_FILTERS)})")
+        self.detect_every = max(1, int(detect_every))
+        self.filter_kind = filter
+        self.filter_kw = filter_kw or {}
+        self.match_thresh = match_thresh
+        self.max_misses = max_misses
+        self.flow = flow
+        self.tracks: List[Track] = []
+        self.frames = 0
+        self.detections = 0
+        self._next_id = 1
+        self._prev_gray = None
+
+    def needs_detection(self) -> bool:
+        """이번 프레임에 검출을 돌려야 하는지 (detect_every 주기)"""
+        return self.frames % self.detect_every == 0
+
+    # ---- 예측 ----
+    def _gray(self, frame):
+        import cv2
+        h, w = frame.shape[:2]
+        s = min(1.0, FLOW_MAX_SIDE / max(h, w))
+        g = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if s < 1.0:
+            g = cv2.resize(g, (max(1, int(w * s)), max(1, int(h * s))), interpolation=cv2.INTER_AREA)
+        return g, s
+
+    def _predict(self, t: float, gray, scale: float):
+        """모든 트랙의 raw 를 이번 프레임 위치로 옮김 (광류 또는 등속)"""
+        if not self.tracks:
+            return
+        if gray is not None and self._prev_gray is not None and self._prev_gray.shape == gray.shape:
+            import cv2
+            pts = np.concatenate([tr.raw[:, :2] for tr in self.tracks]).astype(np.float32) * scale
+            nxt, st, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, pts.reshape(-1, 1, 2), None,
+                                                  winSize=FLOW_WIN, maxLevel=FLOW_LEVELS)
+            nxt = nxt.reshape(-1, 2) / scale
+            ok = st.reshape(-1).astype(bool)
+            for i, tr in enumerate(self.tracks):
+                sl = slice(i * len(tr.raw), (i + 1) * len(tr.raw))
+                dt = max(t - tr.t, 1e-3)
+                vis = tr.raw[:, 2] > 0
+                good = ok[sl] & vis & ~tr.lost
+                tr.vel[good] = (nxt[sl][good] - tr.raw[good, :2]) / dt
+                tr.raw[good, :2] = nxt[sl][good]
+                # 광류를 잃은 관절은 다음 검출까지 등속 예측 (detect_every 프레임 이내라 점수는 유지)
+                gone = vis & ~good
+                tr.raw[gone, :2] += tr.vel[gone] * dt
+                tr.lost |= gone
+                tr.t = t
+            return
+        for tr in self.tracks:
+            dt = t - tr.t
+            vis = tr.raw[:, 2] > 0
+            tr.raw[vis, :2] += tr.vel[vis] * dt
+            tr.t = t
+
+    # ---- 연결 ----
+    def _associate(self, dets):
+        """-> [(track 번호, det 번호)], 남은 track, 남은 det"""
+        pairs = []
+        for i, tr in enumerate(self.tracks):
+            for j, d in enumerate(dets):
+                c = pose_distance(tr.raw, d)
+                if c <= self.match_thresh:
+                    pairs.append((c, i, j))
+        pairs.sort()
+        used_t, used_d, matched = set(), set(), []
+        for _, i, j in pairs:
+            if i in used_t or j in used_d:
+                continue
+            used_t.add(i)
+            used_d.add(j)
+            matched.append((i, j))
+        rest_t = [i for i in range(len(self.tracks)) if i not in used_t]
+        rest_d = [j for j in range(len(dets)) if j not in used_d]
+        return matched, rest_t, rest_d
+
+    def update(self, t: float, people=None, frame=None, scores=None) -> List[Tuple[int, Any]]:
+        """
+        t: 초 / people: 이번 프레임 검출 (n, 17, 3) px (검출하지 않은 프레임은 None) / frame: BGR (광류용)
+        -> [(track_id, (17, 3) 스무딩 키포인트, 검출 점수)] track_id 순
+        """
+        gray, scale = (None, 1.0)
+        if self.flow and frame is not None:
+            try:
+                gray, scale = self._gray(frame)
+            except ImportError:
+                self.flow = False
+        self._predict(t, gray, scale)
+
+        if people is not None:
+            self.detections += 1
+            dets = [np.asarray(p, dtype=np.float64) for p in people]
+            scores = list(scores) if scores is not None else [float(d[:, 2].mean()) for d in dets]
+            matched, rest_t, rest_d = self._associate(dets)
+            for i, j in matched:
+                self.tracks[i].matched(dets[j], t, scores[j])
+            for i in rest_t:
+                self.tracks[i].misses += 1
+            # 새 사람은 x-center 순으로 ID 발급
+            rest_d.sort(key=lambda j: float(dets[j][dets[j][:, 2] > 0, 0].mean()) if (dets[j][:, 2] > 0).any() else 0.0)
+            for j in rest_d:
+                flt = make_filter(self.filter_kind, **self.filter_kw)
+                self.tracks.append(Track(self._next_id, dets[j], t, scores[j], flt))
+                self._next_id += 1
+            self.tracks = [tr for tr in self.tracks if tr.misses <= self.max_misses]
+            new_ids = {self.tracks[k].id for k in range(len(self.tracks) - len(rest_d), len(self.tracks))}
+        else:
+            new_ids = set()
+
+        for tr in self.tracks:
+            if tr.id not in new_ids:
+                tr.smooth = tr.filter(tr.raw[:, :2], t, tr.raw[:, 2:3] > 0)
+        self._prev_gray = gray
+        self.frames += 1
+        # 직전 검출에서 놓친 트랙(가려짐 등)은 내보내지 않음
+        return [(tr.id, tr.kps(), tr.score) for tr in sorted(self.tracks, key=lambda tr: tr.id) if tr.misses == 0]
+
+    def reset(self):
+        """처음 상태로 (다음 프레임부터 검출, ID 도 1부터)"""
+        self.tracks = []
+        self.frames = 0
+        self.detections = 0
+        self._next_id = 1
+        self._prev_gray = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"frames": self.frames, "detections": self.detections, "tracks": len(self.tracks),
+                "next_id": self._next_id}
@@ -0,0 +1,34 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# -------------------------
+# 테스트 공통 설정
+# - 서버 모듈(webpage/common, webpage/main.py)과 루트 스크립트를 import 할 수 있게 경로 추가
+# - result_images / var(세션 DB) 는 임시 폴더로 (저장소 트리에 파일을 만들지 않음)
+#   common.common 이 import 시점에 환경 변수를 읽으므로 모듈 import 전에 설정
+# -------------------------
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for p in (os.path.join(ROOT, "webpage"), ROOT):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+_TMP = tempfile.mkdtemp(prefix="pose-tests-")
+atexit.register(shutil.rmtree, _TMP, ignore_errors=True)
+os.environ.setdefault("POSE_RESULT_DIR", os.path.join(_TMP, "result_images"))
+os.environ.setdefault("POSE_VAR_DIR", os.path.join(_TMP, "var"))
+os.environ.setdefault("POSE_CATALOG_POLL_S", "0")
+os.environ.setdefault("POSE_SESSION_PURGE_S", "0")
+os.makedirs(os.path.join(os.environ["POSE_RESULT_DIR"], "matching"), exist_ok=True)
+
+
+@pytest.fixture
+def matching_dir(tmp_path):
+    root = tmp_path / "matching"
+    root.mkdir()
+    return root
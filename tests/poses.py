@@ -0,0 +1,30 @@
+import numpy as np
+
+from common.pose_score import COCO_NAMES
+
+# -------------------------
+# 테스트용 포즈 데이터 (px 좌표 (17, 3) / make_pose_keypoints 의 .multi.json 사람 항목)
+# -------------------------
+
+
+def make_pose(x0=100.0, y0=50.0, scale=1.0, arm=0.0):
+    """(17, 3) px 포즈: 서 있는 사람 + arm 만큼 팔을 든 모양 (어깨·엉덩이 포함 전 관절 score 0.9)"""
+    pts = {
+        "nose": (0, 0), "left_eye": (-4, -4), "right_eye": (4, -4), "left_ear": (-8, -2), "right_ear": (8, -2),
+        "left_shoulder": (-20, 30), "right_shoulder": (20, 30),
+        "left_elbow": (-30, 60 - arm), "right_elbow": (30, 60 - arm),
+        "left_wrist": (-35, 90 - 2 * arm), "right_wrist": (35, 90 - 2 * arm),
+        "left_hip": (-15, 100), "right_hip": (15, 100),
+        "left_knee": (-15, 140), "right_knee": (15, 140),
+        "left_ankle": (-15, 180), "right_ankle": (15, 180),
+    }
+    k = np.zeros((17, 3), np.float32)
+    for i, name in enumerate(COCO_NAMES):
+        dx, dy = pts[name]
+        k[i] = (x0 + dx * scale, y0 + dy * scale, 0.9)
+    return k
+
+
+def person_json(k, slot=0):
+    return {"slot": slot, "keypoints_px": [{"name": n, "x": float(x), "y": float(y), "score": float(s)}
+                                           for n, (x, y, s) in zip(COCO_NAMES, k)]}
@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+
+from common.best_pose import extract_best, peak_window, round_spans
+from poses import make_pose
+
+FPS = 10
+
+
+def _track(arms):
+    """프레임마다 한 명, arms[i] 만큼 팔을 든 포즈 (FPS 간격)"""
+    n = len(arms)
+    return {
+        "frame_idx": np.arange(n, dtype=np.int32) * 3,
+        "time_s": (np.arange(n) / FPS).astype(np.float32),
+        "offsets": np.arange(n + 1, dtype=np.int32),
+        "kps": np.stack([make_pose(arm=a) for a in arms]).astype(np.float32),
+    }
+
+
+def test_round_spans_uniform_without_marks():
+    times = np.linspace(0, 9, 10)
+    assert round_spans(times, 3) == pytest.approx([(0, 3), (3, 6), (6, 9)])
+    # 라운드 수보다 marks 가 적으면 균등 분할
+    assert round_spans(times, 3, marks=[[0, 1]]) == pytest.approx([(0, 3), (3, 6), (6, 9)])
+    assert round_spans([], 2) == [(0.0, 0.0), (0.0, 0.0)]
+
+
+def test_round_spans_scales_marks_by_record_length():
+    times = np.linspace(0, 20, 201)                 # 영상 20s
+    marks = [[1, 4], [5, 9.5]]
+    assert round_spans(times, 2, marks) == pytest.approx([(1, 4), (5, 9.5)])
+    # 클라이언트 시계로 10s 녹화 -> 영상 시간은 2배
+    assert round_spans(times, 2, marks, record_s=10) == pytest.approx([(2, 8), (10, 19)])
+    # 영상 범위 밖은 잘라냄
+    assert round_spans(times, 1, [[-3, 30]], record_s=20) == pytest.approx([(0, 20)])
+    for bad in (None, 0, -5):
+        assert round_spans(times, 2, marks, record_s=bad) == pytest.approx([(1, 4), (5, 9.5)])
+
+
+def test_peak_window_ignores_one_frame_spike():
+    scores = np.full(30, 0.5)
+    scores[3] = 1.0                                  # 한 프레임 튐
+    scores[15:20] = [0.85, 0.9, 0.95, 0.9, 0.85]     # 안정된 피크
+    i, k, mean, j = peak_window(scores, 5)
+    assert (i, k, j) == (15, 19, 17)
+    assert mean == pytest.approx(0.89)
+    # 윈도우가 1이면 튐이 그대로 최고
+    assert peak_window(scores, 1)[3] == 3
+    # 윈도우가 구간보다 길면 구간 전체
+    assert peak_window(scores[:3], 10)[:2] == (0, 2)
+
+
+def test_extract_best_finds_peak_per_round():
+    arms = [0.0] * 60
+    arms[5] = 40.0                                   # 라운드 1 의 한 프레임 튐
+    arms[20:26] = [38, 39, 40, 40, 39, 38]           # 라운드 1 피크 (2.0 ~ 2.5s)
+    arms[45:50] = [58, 59, 60, 59, 58]               # 라운드 2 피크 (4.5 ~ 4.9s)
+    track = _track(arms)
+    targets = [make_pose(arm=40)[None], make_pose(arm=60)[None], None]
+    marks = [[0, 3], [3, 5.9], [5.9, 5.9]]
+
+    rounds, curves = extract_best(track, targets, marks, window_s=0.5)
+    assert [r["round"] for r in rounds] == [1, 2, 3]
+
+    one, two, three = rounds
+    assert one["frames"] == 31 and len(curves[0]) == 31
+    assert 2.0 <= one["window"]["start_s"] and one["window"]["end_s"] <= 2.5
+    assert one["best"]["time_s"] in (pytest.approx(2.2), pytest.approx(2.3))
+    assert one["best"]["frame_idx"] in (66, 69)
+    assert one["best"]["percent"] == 100
+    assert two["best"]["time_s"] == pytest.approx(4.7) and two["best"]["frame_idx"] == 141
+    # 타겟 없는 라운드
+    assert three["frames"] == 0 and three["best"] is None and three["window"] is None
+    assert len(curves[2]) == 0
+
+
+def test_extract_best_maps_marks_with_record_length():
+    arms = [0.0] * 60
+    arms[40:45] = [40] * 5                           # 영상 4.0 ~ 4.4s
+    # 클라이언트 시계로 3s 녹화 (영상 5.9s) -> 라운드 [1.5, 2.5] 는 영상 [2.95, 4.92]
+    rounds, _ = extract_best(_track(arms), [make_pose(arm=40)[None]], [[1.5, 2.5]], window_s=0.5, record_s=3.0)
+    assert rounds[0]["start_s"] == pytest.approx(2.95, abs=1e-3)
+    assert rounds[0]["best"]["percent"] == 100 and 4.0 <= rounds[0]["best"]["time_s"] <= 4.4
+    # record_s 없이 marks 를 그대로 쓰면 피크를 놓침
+    rounds, _ = extract_best(_track(arms), [make_pose(arm=40)[None]], [[1.5, 2.5]], window_s=0.5)
+    assert rounds[0]["best"]["percent"] < 100
+
+
+# -------------------------
+# /result_redirect: 베스트 포즈 작업은 세션의 서버 날짜/폴더로
+# -------------------------
+SID = "test-best-pose-session"
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    pytest.importorskip("httpx")
+    import main
+    calls = []
+    monkeypatch.setattr(main.best_pose, "submit", lambda date, folder, *a: calls.append((date, folder)) or f"{date}/{folder}")
+    monkeypatch.setattr(main.render_cache, "prerender", lambda items: None)
+    return main, calls
+
+
+def _redirect(main, body):
+    from fastapi.testclient import TestClient
+    client = TestClient(main.app)
+    client.headers["X-Session-Id"] = SID
+    return client.post("/result_redirect", json=body, follow_redirects=False)
+
+
+def test_result_redirect_uses_session_date_and_folder(submitted):
+    main, calls = submitted
+    main.session_store.update(SID, capture_session="7", capture_count=3, video_session="7", session_date="2026-03-04")
+    # 클라이언트의 UTC 날짜(전날)와 다른 폴더는 무시
+    r = _redirect(main, {"date": "2026-03-03", "folder": "9", "player": "1", "targets": ["1.jpg"]})
+    assert r.status_code == 303
+    latest = main.session_store.get(SID)["latest"]
+    assert (latest["date"], latest["folder"]) == ("2026-03-04", "7")
+    assert latest["best_pose"] == "2026-03-04/7" and calls == [("2026-03-04", "7")]
+    assert "video_session" not in main.session_store.get(SID)
+    assert "session_date" not in main.session_store.get(SID)
+
+
+def test_result_redirect_without_session_skips_best_pose(submitted):
+    main, calls = submitted
+    main.session_store.delete(SID)
+    _redirect(main, {"date": "2026-03-03", "folder": "9", "player": "1", "targets": ["1.jpg"]})
+    latest = main.session_store.get(SID)["latest"]
+    assert (latest["date"], latest["folder"]) == ("2026-03-03", "9")
+    assert "best_pose" not in latest and calls == []
+
+
+def test_video_dir_follows_session_date(submitted):
+    main, _ = submitted
+    today, folder, path = main._video_session_dir({"video_session": "7", "session_date": "2026-03-04"})
+    assert (today, folder) == ("2026-03-04", "7")
+    assert path.endswith(main.os.path.join("video", "2026-03-04", "7"))
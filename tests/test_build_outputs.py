@@ -0,0 +1,194 @@
+import numpy as np
+import pytest
+
+import make_pose_keypoints as mpk
+
+# -------------------------
+# 기준 구현: 벡터화 이전 (baseline) make_pose_keypoints.py 의
+# UltraBackend.infer 후처리 + process_image 안의 build_person_dict 를 그대로 옮겨 둠
+# -------------------------
+COCO_NAMES = mpk.COCO_NAMES
+
+
+def ref_bbox_from_points(pxys, W, H):
+    xs = [x for x, y in pxys if x is not None and y is not None]
+    ys = [y for x, y in pxys if x is not None and y is not None]
+    if not xs or not ys:
+        return 0, 0, W, H
+    minx, maxx = max(0, min(xs)), min(W-1, max(xs))
+    miny, maxy = max(0, min(ys)), min(H-1, max(ys))
+    w = max(1, int(round(maxx - minx)))
+    h = max(1, int(round(maxy - miny)))
+    return int(round(minx)), int(round(miny)), w, h
+
+
+def ref_norm_xy(x, y, W, H):
+    return (float(x) / float(W), float(y) / float(H))
+
+
+def ref_norm_bbox(x, y, w, h, W, H):
+    return {
+        "x": float(x)/float(W),
+        "y": float(y)/float(H),
+        "w": float(w)/float(W),
+        "h": float(h)/float(H),
+    }
+
+
+def ref_ultra_people(res, W, H, min_conf):
+    people = []
+    for r in res:
+        if r.keypoints is None:
+            continue
+        kps = r.keypoints.data.cpu().numpy()  # shape: [num, 17, 3]
+        scores = r.boxes.conf.cpu().numpy() if r.boxes is not None else [0.0]*len(kps)
+        for i, kp in enumerate(kps):
+            conf_person = float(scores[i]) if i < len(scores) else float(kp[:,2].mean())
+            if conf_person < min_conf:
+                continue
+            pts = []
+            for idx, (x, y, s) in enumerate(kp):
+                name = COCO_NAMES[idx] if idx < len(COCO_NAMES) else f"k{idx}"
+                if s <= 0:
+                    continue
+                x = max(0, min(W-1, float(x)))
+                y = max(0, min(H-1, float(y)))
+                pts.append({"name": name, "x": x, "y": y, "score": float(s)})
+            if not pts:
+                continue
+            people.append({"score": conf_person, "keypoints_px": pts})
+
+    def x_center(person):
+        xs = [p["x"] for p in person["keypoints_px"]]
+        return sum(xs)/len(xs) if xs else 0.0
+    people.sort(key=x_center)
+    for i, p in enumerate(people):
+        p["slot"] = i
+    return people
+
+
+def ref_build_person_dict(p, W, H):
+    kpx = p["keypoints_px"]
+    pxys = [(kp["x"], kp["y"]) for kp in kpx]
+    bx, by, bw, bh = ref_bbox_from_points(pxys, W, H)
+    person = {
+        "slot": int(p.get("slot", 0)),
+        "bbox_px": {"x": bx, "y": by, "w": bw, "h": bh},
+        "bbox": ref_norm_bbox(bx, by, bw, bh, W, H),
+        "keypoints_px": [{"name": kp["name"], "x": float(kp["x"]), "y": float(kp["y"]), "score": float(kp.get("score", 1.0))} for kp in kpx],
+        "keypoints": [{"name": kp["name"], "x": ref_norm_xy(kp["x"], kp["y"], W, H)[0], "y": ref_norm_xy(kp["x"], kp["y"], W, H)[1]} for kp in kpx],
+        "score": float(p.get("score", 0.0))
+    }
+    return person
+
+
+# -------------------------
+# ultralytics Results 흉내 (.data / .conf 가 .cpu().numpy() 로 배열을 돌려줌)
+# -------------------------
+class _Tensor:
+    def __init__(self, a):
+        self.a = a
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.a
+
+
+class _Attr:
+    def __init__(self, **kw):
+        for k, v in kw.items():
+            setattr(self, k, _Tensor(v))
+
+
+class _Result:
+    def __init__(self, kps, conf):
+        self.keypoints = _Attr(data=kps)
+        self.boxes = None if conf is None else _Attr(conf=conf)
+
+
+def _random_result(rng, W, H):
+    n = int(rng.integers(1, 7))
+    kps = np.empty((n, 17, 3), np.float32)
+    kps[..., 0] = rng.uniform(-0.1 * W, 1.1 * W, (n, 17))      # 일부는 화면 밖 -> clamp
+    kps[..., 1] = rng.uniform(-0.1 * H, 1.1 * H, (n, 17))
+    kps[..., 2] = rng.uniform(0, 1, (n, 17))
+    half = rng.random((n, 17)) < 0.2                             # .5 좌표: 반올림 경계
+    kps[..., :2][half] = np.round(kps[..., :2][half]) + 0.5
+    kps[..., 2][rng.random((n, 17)) < 0.3] = 0.0                 # 안 보이는 관절
+    if rng.random() < 0.2:
+        kps[int(rng.integers(n)), :, 2] = 0.0                    # 관절이 하나도 없는 사람
+    if rng.random() < 0.1:
+        kps[:, :, 0] = 100.0                                     # x-center 동률 -> 안정 정렬
+    kind = rng.random()
+    if kind < 0.15:
+        conf = None                                              # boxes 없음 -> conf 0
+    elif kind < 0.3:
+        conf = rng.uniform(0, 1, int(rng.integers(0, n))).astype(np.float32)   # box 가 사람보다 적음
+    else:
+        conf = rng.uniform(0, 1, n).astype(np.float32)
+    return _Result(kps, conf)
+
+
+def _expected(people, W, H):
+    people_json = [ref_build_person_dict(p, W, H) for p in people]
+    best = ref_build_person_dict(max(people, key=lambda p: p.get("score", 0.0)), W, H)
+    return best, people_json
+
+
+def _strip(single, multi):
+    assert single["created_at"] == multi["created_at"]
+    return ({k: v for k, v in single.items() if k != "created_at"},
+            {k: v for k, v in multi.items() if k != "created_at"})
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_ultra_people_and_outputs_match_baseline(seed):
+    rng = np.random.default_rng(seed)
+    W, H = [(640, 480), (1920, 1080), (481, 853), (2560, 1920)][seed % 4]
+    r = _random_result(rng, W, H)
+    min_conf = 0.0 if seed % 5 == 0 else 0.3
+
+    ref = ref_ultra_people([r], W, H, min_conf)
+    got = mpk.UltraBackend._people_from_result(r, W, H, min_conf)
+    assert len(got) == len(ref)
+    if not ref:
+        return
+    single, multi = _strip(*mpk.build_outputs(got, W, H))
+    best, people_json = _expected(ref, W, H)
+
+    assert multi == {"version": "1.1", "source_size": {"w": W, "h": H}, "people": people_json}
+    assert single == {
+        "version": "1.1", "source_size": {"w": W, "h": H},
+        "bbox_px": best["bbox_px"], "bbox": best["bbox"], "keypoints_px": best["keypoints_px"],
+        "keypoints": best["keypoints"], "slot": best["slot"], "score": best["score"],
+    }
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_dict_people_match_baseline(seed):
+    # MediaPipe 처럼 keypoints_px dict 목록을 돌려주는 backend (점이 없는 사람 포함)
+    rng = np.random.default_rng(100 + seed)
+    W, H = 640, 480
+    people = []
+    for slot in range(int(rng.integers(1, 4))):
+        pts = [{"name": COCO_NAMES[j], "x": float(rng.uniform(-20, W + 20)), "y": float(rng.uniform(-20, H + 20)),
+                "score": float(rng.uniform(0.1, 1))} for j in range(17) if rng.random() < 0.7]
+        people.append({"score": float(rng.uniform(0, 1)), "slot": slot, "keypoints_px": pts})
+    single, multi = _strip(*mpk.build_outputs(people, W, H))
+    best, people_json = _expected(people, W, H)
+    assert multi["people"] == people_json
+    assert single["keypoints_px"] == best["keypoints_px"] and single["bbox_px"] == best["bbox_px"]
+
+
+def test_bboxes_from_points_matches_baseline():
+    rng = np.random.default_rng(7)
+    W, H = 800, 600
+    counts = rng.integers(0, 6, 50)
+    pts = np.round(rng.uniform(-50, 850, (int(counts.sum()), 2)) * 2) / 2
+    got = mpk.bboxes_from_points(pts, counts, W, H)
+    a = 0
+    for c, box in zip(counts, got.tolist()):
+        assert tuple(box) == ref_bbox_from_points([tuple(p) for p in pts[a:a + c].tolist()], W, H)
+        a += c
@@ -0,0 +1,208 @@
+import copy
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+import make_pose_keypoints as mpk
+from poses import make_pose
+
+W, H = 640, 480
+
+
+def person(x0=100.0, conf=0.9, joints=17, kp_score=0.9, scale=1.0):
+    """backend 형식의 사람 (kps_px (17, 3) float64), 앞쪽 joints 개 관절만 보임"""
+    k = make_pose(x0=x0, y0=50, scale=scale).astype(np.float64)
+    k[:, 2] = kp_score
+    k[joints:, 2] = 0.0
+    return {"score": conf, "slot": 0, "kps_px": k}
+
+
+def image(img_id, w=W, h=H):
+    img = np.zeros((h, w, 3), np.uint8)
+    img[0, 0, 0] = img_id
+    return img
+
+
+class Stage(mpk.BackendBase):
+    """answer(img_id, img) -> people. 호출마다 (img_id, shape) 기록"""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.seen = []
+
+    def infer_batch(self, imgs_bgr, min_conf):
+        self.seen.append([(int(img[0, 0, 0]), img.shape[:2]) for img in imgs_bgr])
+        return [copy.deepcopy(self.answer(int(img[0, 0, 0]), img)) for img in imgs_bgr]
+
+    def ids(self):
+        return sorted(i for call in self.seen for i, _ in call)
+
+
+class StubCascade(mpk.CascadeBackend):
+    def __init__(self, stages, spec, gate=None):
+        self._stubs = stages
+        super().__init__(pool=object(), stages=spec, gate=gate)
+
+    def _stage_backend(self, i):
+        return self._stubs[i]
+
+
+@pytest.fixture(autouse=True)
+def installed(monkeypatch):
+    monkeypatch.setattr(mpk, "_module_available", lambda name: True)
+
+
+# -------------------------
+# parse_cascade
+# -------------------------
+def test_parse_cascade_default():
+    assert mpk.parse_cascade(mpk.CASCADE_DEFAULT) == [
+        ("yolo", "yolov8n-pose.pt", 640), ("yolo", "yolov8n-pose.pt", 1280),
+        ("yolo", "yolov8m-pose.pt", 960), ("mediapipe", "pose-c2", None)]
+
+
+def test_parse_cascade_aliases_and_defaults():
+    assert mpk.parse_cascade(" ultra:x.pt , mediapipe ,") == [("yolo", "x.pt", None), ("mediapipe", "pose-c1", None)]
+    assert mpk.parse_cascade("YOLO:@960") == [("yolo", "yolov8n-pose.pt", 960)]
+
+
+@pytest.mark.parametrize("spec", ["", " , ", "openpose:x", "yolo:x@big"])
+def test_parse_cascade_rejects(spec):
+    with pytest.raises(ValueError):
+        mpk.parse_cascade(spec)
+
+
+# -------------------------
+# QualityGate
+# -------------------------
+def test_gate_passes_good_people():
+    q = mpk.QualityGate().check([person(100), person(400)], W, H)
+    assert q["passed"] and q["people"] == 2 and q["valid"] == 17 and q["reasons"] == []
+
+
+@pytest.mark.parametrize("p, reason", [
+    (person(joints=8), "few_joints"),
+    (person(kp_score=0.4), "low_score"),
+    (person(scale=0.2), "small_bbox"),
+])
+def test_gate_reasons(p, reason):
+    q = mpk.QualityGate().check([person(400), p], W, H)
+    assert not q["passed"] and reason in q["reasons"]
+
+
+def test_gate_odd_aspect_and_empty():
+    p = person()
+    p["kps_px"][:, 0] = 100.0   # 모든 관절이 한 세로줄
+    assert "odd_bbox" in mpk.QualityGate().check([p], W, H)["reasons"]
+    assert mpk.QualityGate().check([], W, H)["reasons"] == ["no_person"]
+
+
+def test_gate_ignores_low_confidence_background_person():
+    background = person(x0=500, conf=0.35, joints=5)
+    q = mpk.QualityGate().check([person(100), background], W, H)
+    assert q["passed"] and q["people"] == 1 and q["ignored"] == 1
+    # 기준을 넘는 사람이 없으면 모두 봄
+    q = mpk.QualityGate().check([background], W, H)
+    assert q["people"] == 1 and q["ignored"] == 0 and "few_joints" in q["reasons"]
+
+
+def test_gate_fewer_people_counts_only_main_people():
+    q = mpk.QualityGate().check([person(100), person(400, conf=0.2)], W, H, min_people=2)
+    assert q["reasons"] == ["fewer_people"]
+
+
+# -------------------------
+# CascadeBackend
+# -------------------------
+SPEC = "yolo:n@640,yolo:n@1280,yolo:m@960"
+
+
+def test_escalation_order_and_stats():
+    # 1: 첫 단계 통과 / 2: 두 번째 단계에서 통과 / 3: 끝까지 통과 못 함 (가장 나은 결과 유지)
+    s0 = Stage(lambda i, img: [person()] if i == 1 else [person(joints=6)])
+    s1 = Stage(lambda i, img: [person()] if i == 2 else [person(joints=9)])
+    s2 = Stage(lambda i, img: [person(joints=7)])
+    cascade = StubCascade([s0, s1, s2], SPEC)
+    out = cascade.infer_batch([image(1), image(2), image(3)], min_conf=0.3)
+
+    assert (s0.ids(), s1.ids(), s2.ids()) == ([1, 2, 3], [2, 3], [3])
+    metas = [people[0]["meta"]["cascade"] for people in out]
+    assert [(m["stage"], m["escalations"], m["passed"]) for m in metas] == [
+        ("yolo:n@640", 0, True), ("yolo:n@1280", 1, True), ("yolo:n@1280", 2, False)]
+    assert [t["stage"] for t in metas[2]["trace"]] == ["yolo:n@640", "yolo:n@1280", "yolo:m@960"]
+    assert int((out[2][0]["kps_px"][:, 2] > 0).sum()) == 9   # 셋 중 관절이 가장 많은 결과
+
+    stats = cascade.take_stats()
+    assert stats["images"] == 3 and stats["escalations"] == 3 and stats["unresolved"] == 1
+    assert stats["accepted"] == {"yolo:n@640": 1, "yolo:n@1280": 1, "yolo:m@960": 0}
+
+
+def test_no_person_anywhere_is_failed():
+    cascade = StubCascade([Stage(lambda i, img: []), Stage(lambda i, img: [])], "yolo:n@640,yolo:n@1280")
+    assert cascade.infer_batch([image(1)], min_conf=0.3) == [[]]
+    assert cascade.take_stats()["failed"] == 1
+
+
+def test_background_detection_does_not_escalate_group_image():
+    s0 = Stage(lambda i, img: [person(100), person(300), person(550, conf=0.35, joints=4)])
+    s1 = Stage(lambda i, img: [person()])
+    cascade = StubCascade([s0, s1], "yolo:n@640,mediapipe:pose-c2")
+    out = cascade.infer_batch([image(1)], min_conf=0.3)
+    assert len(out[0]) == 3 and out[0][0]["meta"]["cascade"]["passed"]
+    assert s1.seen == []
+
+
+def test_single_person_stage_skipped_for_group_images():
+    # 1: 두 명 중 한 명이 부족 -> MediaPipe 는 건너뛰고 다음 YOLO 로 / 2: 한 명 -> MediaPipe 까지
+    s0 = Stage(lambda i, img: [person(100), person(400, joints=8)] if i == 1 else [person(joints=8)])
+    mp = Stage(lambda i, img: [person()])
+    s2 = Stage(lambda i, img: [person(100), person(400)])
+    cascade = StubCascade([s0, mp, s2], "yolo:n@640,mediapipe:pose-c2,yolo:m@960")
+    out = cascade.infer_batch([image(1), image(2)], min_conf=0.3)
+
+    assert mp.ids() == [2] and s2.ids() == [1]
+    group = out[0][0]["meta"]["cascade"]
+    assert group["stage"] == "yolo:m@960" and group["passed"] and group["escalations"] == 1
+    assert group["trace"][1] == {"stage": "mediapipe:pose-c2", "skipped": "group", "passed": False}
+    assert out[1][0]["meta"]["cascade"]["stage"] == "mediapipe:pose-c2"
+    stats = cascade.take_stats()
+    assert stats["skipped"] == 1 and stats["escalations"] == 2
+
+
+def test_failing_later_stage_keeps_earlier_result():
+    def broken(i, img):
+        raise RuntimeError("model missing")
+    s0 = Stage(lambda i, img: [person(100), person(400, joints=8)])
+    cascade = StubCascade([s0, Stage(broken), Stage(lambda i, img: [person(joints=9)])],
+                          "yolo:n@640,yolo:n@1280,mediapipe")
+    out = cascade.infer_batch([image(1)], min_conf=0.3)
+    meta = out[0][0]["meta"]["cascade"]
+    assert len(out[0]) == 2 and meta["stage"] == "yolo:n@640" and not meta["passed"]
+    assert [t.get("error") or t.get("skipped") for t in meta["trace"][1:]] == ["model missing", "group"]
+
+
+def test_escalated_image_is_redecoded_and_mapped_back(tmp_path):
+    path = str(tmp_path / "big.jpg")
+    big = np.zeros((1920, 2560, 3), np.uint8)
+    big[:8, :8] = 7   # 축소 디코딩 후에도 img[0, 0, 0] 이 id 로 남게
+    cv2.imwrite(path, big)
+
+    # 두 번째 단계는 자기 입력 px 에서 x = 400 (= 원본 800, 첫 단계 입력 200)
+    s0 = Stage(lambda i, img: [person(joints=6)])
+    s1 = Stage(lambda i, img: [person(x0=400 * img.shape[1] / 1280)])
+    cascade = StubCascade([s0, s1], "yolo:n@640,yolo:n@1280")
+    assert (cascade.input_size, cascade.escalate_size) == (640, 1280)
+
+    img, size = mpk.make_decoder(cascade)(path)
+    assert img.shape[:2] == (480, 640) and size == (2560, 1920)
+    out = cascade.infer_sources([img], [(path, size)], min_conf=0.3)
+    assert s0.seen[0][0][1] == (480, 640) and s1.seen[0][0][1] == (960, 1280)
+    assert out[0][0]["kps_px"][0, 0] == pytest.approx(200.0)
+    assert cascade.take_stats()["redecoded"] == 1
+
+    # 소스 정보가 없으면 (infer_batch) 첫 디코딩 그대로
+    s1.seen.clear()
+    out = cascade.infer_batch([img], min_conf=0.3)
+    assert s1.seen[0][0][1] == (480, 640) and out[0][0]["kps_px"][0, 0] == pytest.approx(200.0)
@@ -0,0 +1,132 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+import make_pose_keypoints as mpk
+
+W, H = 2560, 1920
+# 관절 j 는 밝기 LEVELS[j] 인 48px 정사각형 (원본 px 중심)
+CENTERS = [(300 + 130 * j, 400 + 70 * (j % 5)) for j in range(17)]
+LEVELS = [40 + 12 * j for j in range(17)]
+
+
+def _exif_orientation(jpeg, orientation):
+    """SOI 바로 뒤에 Orientation 태그 하나만 있는 APP1(Exif) 삽입"""
+    tiff = b"II*\x00" + struct.pack("<I", 8) + struct.pack("<H", 1) \
+        + struct.pack("<HHIHH", 0x0112, 3, 1, orientation, 0) + struct.pack("<I", 0)
+    app1 = b"Exif\x00\x00" + tiff
+    return jpeg[:2] + b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + jpeg[2:]
+
+
+def _write_jpeg(path, orientation=None):
+    img = np.zeros((H, W, 3), np.uint8)
+    for (x, y), v in zip(CENTERS, LEVELS):
+        img[y - 24:y + 24, x - 24:x + 24] = v
+    data = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 100])[1].tobytes()
+    if orientation:
+        data = _exif_orientation(data, orientation)
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+class BlobBackend(mpk.BackendBase):
+    """관절 사각형(밝기로 구분)의 밝기 가중 중심을 키포인트로 (모델처럼 연속 좌표: 픽셀 i 의 중심 = i + 0.5)"""
+    name = "blob"
+    producer = "test:blob"
+    input_size = 640
+
+    def __init__(self):
+        self.shapes = []
+
+    def infer(self, img_bgr, min_conf):
+        self.shapes.append(img_bgr.shape[:2])
+        g = img_bgr[..., 0].astype(np.float64)
+        n, labels, stats, _ = cv2.connectedComponentsWithStats((g > 20).astype(np.uint8))
+        kps = np.zeros((17, 3))
+        for i in range(1, n):
+            x, y, w, h = stats[i, :4]
+            patch = g[y - 2:y + h + 2, x - 2:x + w + 2]      # 경계 번짐까지 포함한 밝기 가중 중심
+            j = int(np.abs(np.array(LEVELS) - np.median(g[labels == i])).argmin())
+            ys, xs = np.mgrid[y - 2:y + h + 2, x - 2:x + w + 2]
+            kps[j] = ((patch * xs).sum() / patch.sum() + 0.5, (patch * ys).sum() / patch.sum() + 0.5, 0.9)
+        return [{"score": 0.9, "slot": 0, "kps_px": kps}]
+
+
+def _run(path, decoder):
+    backend = BlobBackend()
+    img, size = decoder(path)
+    people = mpk.rescale_people(backend.infer_sources([img], [(path, size)], min_conf=0.1)[0], img, *size)
+    return people[0]["kps_px"], size, backend.shapes[0]
+
+
+def test_jpeg_size_reads_sof(tmp_path):
+    path = _write_jpeg(tmp_path / "a.jpg")
+    buf = np.fromfile(path, np.uint8)
+    assert mpk.jpeg_size(buf) == (W, H)
+    assert mpk.jpeg_size(np.frombuffer(_exif_orientation(buf.tobytes(), 6), np.uint8)) == (W, H)
+    assert mpk.jpeg_size(np.frombuffer(b"\x89PNG\r\n\x1a\n" + b"\0" * 32, np.uint8)) is None
+    assert mpk.jpeg_size(buf[:20]) is None
+
+
+@pytest.mark.parametrize("min_size, size, factor", [
+    (640, (2560, 1920), 4), (640, (5200, 3900), 8), (640, (1200, 900), 1),
+    (1280, (2560, 1920), 2), (0, (5200, 3900), 1),
+])
+def test_reduce_factor(min_size, size, factor):
+    assert mpk.ImageDecoder(min_size).reduce_factor(*size) == factor
+
+
+def test_reduced_decode_matches_full_decode(tmp_path):
+    path = _write_jpeg(tmp_path / "a.jpg")
+    full, full_size, full_shape = _run(path, mpk.ImageDecoder(0))
+    reduced, size, shape = _run(path, mpk.make_decoder(BlobBackend()))
+    assert full_shape == (H, W) and shape == (H // 4, W // 4)
+    assert size == full_size == (W, H)
+    assert np.abs(reduced[:, :2] - full[:, :2]).max() <= 1.0
+    assert full[:, :2] == pytest.approx(np.array(CENTERS, np.float64), abs=0.6)
+
+
+@pytest.mark.parametrize("orientation", [6, 8])
+def test_exif_rotation_swaps_source_size(tmp_path, orientation):
+    path = _write_jpeg(tmp_path / "r.jpg", orientation)
+    full, full_size, full_shape = _run(path, mpk.ImageDecoder(0))
+    reduced, size, shape = _run(path, mpk.ImageDecoder(640))
+    assert full_shape == (W, H) and shape == (W // 4, H // 4)   # 세로로 회전된 이미지
+    assert size == full_size == (H, W)
+    assert np.abs(reduced[:, :2] - full[:, :2]).max() <= 1.0
+
+
+def test_non_jpeg_is_decoded_full_size(tmp_path):
+    path = str(tmp_path / "a.png")
+    cv2.imwrite(path, np.zeros((300, 1400, 3), np.uint8))
+    img, size = mpk.ImageDecoder(640)(path)
+    assert img.shape[:2] == (300, 1400) and size == (1400, 300)
+    assert mpk.ImageDecoder(640)(str(tmp_path / "missing.jpg")) == (None, None)
+
+
+def test_rescale_people_both_formats():
+    img = np.zeros((480, 640, 3), np.uint8)
+    people = [{"kps_px": np.array([[100.0, 50.0, 0.9]])},
+              {"keypoints_px": [{"name": "nose", "x": 100.0, "y": 50.0, "score": 0.9}]}]
+    mpk.rescale_people(people, img, 2560, 1920)
+    assert people[0]["kps_px"].tolist() == [[400.0, 200.0, 0.9]]
+    assert (people[1]["keypoints_px"][0]["x"], people[1]["keypoints_px"][0]["y"]) == (400.0, 200.0)
+    same = [{"kps_px": np.array([[1.0, 2.0, 0.9]])}]
+    assert mpk.rescale_people(same, img, 640, 480)[0]["kps_px"].tolist() == [[1.0, 2.0, 0.9]]
+
+
+def test_process_image_writes_source_pixels(tmp_path):
+    path = _write_jpeg(tmp_path / "1.jpg", 6)
+    assert mpk.process_image(path, BlobBackend(), overwrite=True, min_conf=0.1, failed_dir=str(tmp_path / "failed"),
+                             decoder=mpk.ImageDecoder(640))
+    with open(tmp_path / "1.multi.json", encoding="utf-8") as f:
+        out = json.load(f)
+    assert out["source_size"] == {"w": H, "h": W}
+    full = _run(path, mpk.ImageDecoder(0))[0]
+    got = np.array([(kp["x"], kp["y"]) for kp in out["people"][0]["keypoints_px"]])
+    assert np.abs(got - full[:, :2]).max() <= 1.0
@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+import pytest
+
+from common.group_match import GroupMatcher
+from common.target_index import TargetIndex
+from poses import make_pose, person_json
+
+
+@pytest.fixture
+def group_index(matching_dir):
+    """matching/3/1.jpg: 팔 높이가 다른 3명 (왼쪽부터 slot 0, 1, 2)"""
+    gdir = matching_dir / "3"
+    gdir.mkdir()
+    (gdir / "1.jpg").write_bytes(b"x")
+    people = [person_json(make_pose(x0=100 + 200 * i, arm=30 * i), slot=i) for i in range(3)]
+    (gdir / "1.multi.json").write_text(json.dumps({"people": people, "source_size": {"w": 640, "h": 480}}))
+    return TargetIndex(root=str(matching_dir)).load(use_cache=False)
+
+
+def test_same_order_matches_each_slot(group_index):
+    live = np.stack([make_pose(x0=50 + 150 * i, scale=0.8, arm=30 * i) for i in range(3)])
+    result = GroupMatcher(group_index).match(live, "3/1.jpg")
+    assert result["score"] == pytest.approx(1.0)
+    assert [(p["live"], p["target"]) for p in result["pairs"]] == [(0, 0), (1, 1), (2, 2)]
+
+
+def test_shuffled_people_are_reassigned(group_index):
+    order = [2, 0, 1]
+    live = np.stack([make_pose(x0=100 + 200 * i, arm=30 * j) for i, j in enumerate(order)])
+    result = GroupMatcher(group_index).match(live, "3/1.jpg", mode="optimal")
+    assert result["score"] == pytest.approx(1.0)
+    assert [p["target"] for p in result["pairs"]] == order
+
+
+def test_joint_contributions_sum_to_cosine(group_index):
+    live = np.stack([make_pose(arm=60), make_pose(arm=0), make_pose(arm=30)])
+    result = GroupMatcher(group_index).match(live, "3/1.jpg")
+    for p in result["pairs"]:
+        cos = sum(p["joints"].values())
+        assert p["score"] == pytest.approx((cos + 1) / 2, abs=1e-4)
+
+
+def test_fewer_live_people_than_targets(group_index):
+    result = GroupMatcher(group_index).match(make_pose(arm=30)[None], "3/1.jpg")
+    assert len(result["pairs"]) == 1
+    assert result["pairs"][0]["target"] == 1
+
+
+def test_unknown_target_returns_none(group_index):
+    assert GroupMatcher(group_index).match(make_pose()[None], "3/99.jpg") is None
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_lifespan_starts_and_stops_in_order(monkeypatch):
+    calls = []
+
+    def record(name, result=None):
+        return lambda *a, **kw: calls.append(name) or result
+
+    async def purge():
+        calls.append("purge.start")
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            calls.append("purge.cancel")
+            raise
+
+    for obj, attr, name in [
+        (main.target_index, "load", "index.load"),
+        (main.pose_search, "sync", "search.sync"),
+        (main.target_catalog, "rebuild", "catalog.rebuild"),
+        (main.target_catalog, "start_watch", "catalog.start"),
+        (main.result_static, "prerender_variants", "static.prerender"),
+        (main.model_pool, "preload", "models.preload"),
+        (main.target_catalog, "stop_watch", "catalog.stop"),
+        (main.video_analyzer, "shutdown", "analyzer.stop"),
+        (main.best_pose, "shutdown", "best_pose.stop"),
+        (main.render_cache, "shutdown", "render_cache.stop"),
+        (main.live_batcher, "shutdown", "live.stop"),
+        (main.model_pool, "close", "models.close"),
+    ]:
+        monkeypatch.setattr(obj, attr, record(name, 0))
+    monkeypatch.setattr(main, "_purge_sessions", purge)
+    monkeypatch.setattr(main, "SESSION_PURGE_S", 60)
+    monkeypatch.setattr(main, "MODEL_PRELOAD", ["yolo:x.pt"])
+
+    with TestClient(main.app) as client:
+        started = list(calls)
+        assert client.get("/models").status_code == 200
+    assert started == ["index.load", "search.sync", "catalog.rebuild", "catalog.start", "purge.start",
+                       "static.prerender", "models.preload"]
+    assert calls[len(started):] == ["catalog.stop", "purge.cancel", "analyzer.stop", "best_pose.stop",
+                                    "render_cache.stop", "live.stop", "models.close"]
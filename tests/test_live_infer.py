@@ -0,0 +1,219 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from common.live_infer import LiveBatcher
+from poses import make_pose
+
+
+def frame(v):
+    """img[0, 0, 0] = v 인 작은 PNG (stub backend 가 v 로 사람 위치를 정함)"""
+    img = np.zeros((48, 64, 3), np.uint8)
+    img[0, 0, 0] = v
+    return cv2.imencode(".png", img)[1].tobytes()
+
+
+class StubBackend:
+    """infer_batch 호출마다 프레임 id 목록 기록. hold 를 clear 하면 entered 를 알린 뒤 풀릴 때까지 대기"""
+
+    def __init__(self):
+        self.calls = []
+        self.entered = threading.Event()
+        self.hold = threading.Event()
+        self.hold.set()
+
+    def infer_batch(self, imgs_bgr, min_conf):
+        self.calls.append([int(img[0, 0, 0]) for img in imgs_bgr])
+        self.entered.set()
+        self.hold.wait(5)
+        return [[{"score": 0.9, "kps_px": make_pose(x0=int(img[0, 0, 0])).astype(np.float64)}] for img in imgs_bgr]
+
+
+def _batcher(**kw):
+    kw.setdefault("detect_every", 1)
+    kw.setdefault("track_filter", "none")
+    b = LiveBatcher(**kw)
+    b._backend_obj = StubBackend()
+    return b, b._backend_obj
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 10))
+
+
+async def _blocked(b, backend, conn, v=1):
+    """backend 가 conn 의 프레임 하나를 처리 중인 상태로 만듦 -> 그 future"""
+    backend.hold.clear()
+    fut = b.submit(conn, 1, frame(v))
+    await asyncio.to_thread(backend.entered.wait, 5)
+    return fut
+
+
+def test_frames_from_connections_share_one_batch():
+    async def main():
+        b, backend = _batcher(max_batch=3, tick_ms=2000)
+        conns = [b.new_conn() for _ in range(3)]
+        target = make_pose(x0=20)[None]
+        futs = [b.submit(c, 1, frame(10 * (i + 1)), target if i == 1 else None) for i, c in enumerate(conns)]
+        out = await asyncio.gather(*futs)    # max_batch 가 차면 tick 을 기다리지 않고 실행
+        b.shutdown()
+        return b, backend, out
+
+    b, backend, out = run(main())
+    assert backend.calls == [[10, 20, 30]]
+    assert [(m["type"], m["seq"], m["batch"], m["detected"], m["ids"]) for m in out] == [("pose", 1, 3, True, [1])] * 3
+    assert out[0]["people"][0][0] == [10.0, 50.0, 0.9] and out[0]["size"] == [64, 48]
+    assert (out[0]["score"], out[1]["percent"]) == (None, 100)
+    assert b.info()["batches"] == 1 and b.info()["avg_batch"] == 3.0
+
+
+def test_tick_collects_frames_until_deadline():
+    async def main():
+        b, backend = _batcher(max_batch=8, tick_ms=150, max_age_ms=1000)
+        c1, c2 = b.new_conn(), b.new_conn()
+        f1 = b.submit(c1, 1, frame(1))
+        await asyncio.sleep(0.05)
+        f2 = b.submit(c2, 1, frame(2))
+        await asyncio.gather(f1, f2)
+        b.shutdown()
+        return backend
+
+    assert run(main()).calls == [[1, 2]]
+
+
+def test_older_pending_frame_is_superseded():
+    async def main():
+        b, backend = _batcher(tick_ms=0)
+        busy, conn = b.new_conn(), b.new_conn()
+        first = await _blocked(b, backend, busy)
+        old = b.submit(conn, 1, frame(5))
+        new = b.submit(conn, 2, frame(6))
+        dropped = await old
+        backend.hold.set()
+        out = await asyncio.gather(first, new)
+        b.shutdown()
+        return b, backend, dropped, out
+
+    b, backend, dropped, out = run(main())
+    assert dropped == {"type": "dropped", "seq": 1, "reason": "superseded"}
+    assert [(m["type"], m["seq"]) for m in out] == [("pose", 1), ("pose", 2)]
+    assert backend.calls == [[1], [6]]
+    assert b.info()["dropped"] == 1 and b.info()["frames"] == 3
+
+
+def test_frames_older_than_max_age_are_stale():
+    async def main():
+        b, backend = _batcher(tick_ms=0, max_age_ms=50)
+        busy, conn = b.new_conn(), b.new_conn()
+        first = await _blocked(b, backend, busy)
+        late = b.submit(conn, 1, frame(5))
+        await asyncio.sleep(0.15)
+        backend.hold.set()
+        out = await asyncio.gather(first, late)
+        b.shutdown()
+        return b, backend, out
+
+    b, backend, (first, late) = run(main())
+    assert first["type"] == "pose"
+    assert late == {"type": "dropped", "seq": 1, "reason": "stale"}
+    assert backend.calls == [[1]] and b.info()["stale"] == 1
+
+
+def test_closed_connection_future_is_cancelled():
+    async def main():
+        b, backend = _batcher(tick_ms=0)
+        busy, conn = b.new_conn(), b.new_conn()
+        first = await _blocked(b, backend, busy)
+        fut = b.submit(conn, 1, frame(5))
+        b.cancel(conn)
+        backend.hold.set()
+        await first
+        await asyncio.sleep(0.05)
+        b.shutdown()
+        return b, backend, fut, conn
+
+    b, backend, fut, conn = run(main())
+    assert fut.cancelled()
+    assert backend.calls == [[1]] and b.info()["pending"] == 0
+    assert conn not in b._trackers
+
+
+def test_detect_every_tracks_between_detections():
+    async def main():
+        b, backend = _batcher(tick_ms=0, detect_every=2)
+        conn = b.new_conn()
+        out = [await b.submit(conn, i, frame(40)) for i in (1, 2, 3)]
+        b.shutdown()
+        return b, backend, out
+
+    b, backend, out = run(main())
+    assert [m["detected"] for m in out] == [True, False, True]
+    assert backend.calls == [[40], [40]]
+    assert b.info()["inferred"] == 2 and b.info()["tracked"] == 1
+
+
+def test_shutdown_replies_to_pending_frames():
+    async def main():
+        b, backend = _batcher(tick_ms=0)
+        busy, conn = b.new_conn(), b.new_conn()
+        await _blocked(b, backend, busy)
+        fut = b.submit(conn, 7, frame(5))
+        b.shutdown()
+        msg = await fut
+        backend.hold.set()
+        return msg
+
+    assert run(main()) == {"type": "dropped", "seq": 7, "reason": "shutdown"}
+
+
+# -------------------------
+# /ws/live 프로토콜
+# -------------------------
+@pytest.fixture
+def ws_client(monkeypatch):
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    import main
+    b, backend = _batcher(tick_ms=0)
+    monkeypatch.setattr(main, "live_batcher", b)
+    monkeypatch.setattr(main, "LIVE_MAX_FRAME_BYTES", 4096)
+    yield TestClient(main.app), b
+    b.shutdown()
+
+
+def test_ws_live_protocol(ws_client):
+    client, b = ws_client
+    target = [[[float(x), float(y), float(s)] for x, y, s in make_pose(x0=30)]]
+    with client.websocket_connect("/ws/live") as ws:
+        # 타겟 없이 보낸 프레임: 추론만
+        ws.send_bytes(frame(30))
+        m = ws.receive_json()
+        assert (m["type"], m["seq"], m["score"], m["ids"]) == ("pose", 1, None, [1])
+
+        ws.send_json({"type": "target", "target": target, "mode": "optimal"})
+        assert ws.receive_json() == {"type": "target", "status": "ok", "mode": "optimal", "people": 1}
+        ws.send_bytes(frame(30))
+        m = ws.receive_json()
+        assert (m["seq"], m["percent"]) == (2, 100)
+
+        ws.send_json({"type": "keypoints", "seq": 9, "people": target})
+        assert ws.receive_json() == {"type": "score", "seq": 9, "people": 1, "score": 1.0, "percent": 100}
+
+        ws.send_bytes(b"\0" * 5000)
+        assert ws.receive_json() == {"type": "error", "seq": 3, "message": "frame too large"}
+        ws.send_bytes(b"not an image")
+        assert ws.receive_json() == {"type": "error", "seq": 4, "message": "cannot decode frame"}
+        ws.send_json({"type": "target", "mode": "fastest"})
+        assert ws.receive_json() == {"type": "error", "message": "unknown mode: fastest"}
+        ws.send_json({"type": "target", "target": "no/such.jpg"})
+        assert ws.receive_json() == {"type": "target", "status": "error", "message": "target not indexed"}
+        ws.send_text("{")
+        assert ws.receive_json() == {"type": "error", "message": "invalid json"}
+        ws.send_json({"type": "hello"})
+        assert ws.receive_json() == {"type": "error", "message": "unknown message type: hello"}
+    assert b.info()["frames"] == 3
+    assert b._conns == set() and b._trackers == {}
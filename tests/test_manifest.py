@@ -0,0 +1,129 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+import make_pose_keypoints as mpk
+from pose_manifest import Manifest
+
+PRODUCER = "test:producer"
+
+
+def _image(root, name, w=64, h=48):
+    path = root / "1" / name
+    path.parent.mkdir(exist_ok=True)
+    cv2.imwrite(str(path), np.zeros((h, w, 3), np.uint8))
+    return str(path)
+
+
+def _legacy_outputs(img, w, h, older):
+    """매니페스트가 생기기 전에 만들어진 .json / .multi.json (older: 이미지보다 100초 오래됨)"""
+    base = os.path.splitext(img)[0]
+    for suffix in (".json", ".multi.json"):
+        with open(base + suffix, "w", encoding="utf-8") as f:
+            json.dump({"source_size": {"w": w, "h": h}, "people": []}, f)
+        if older:
+            t = os.stat(img).st_mtime - 100
+            os.utime(base + suffix, (t, t))
+
+
+def _select(imgs, manifest, **kw):
+    todo, reasons = mpk.select_for_update(imgs, manifest, PRODUCER, False, **kw)
+    return [os.path.basename(p) for p in todo], reasons
+
+
+def test_new_images_are_selected(matching_dir):
+    img = _image(matching_dir, "1.jpg")
+    todo, reasons = _select([img], Manifest.open(str(matching_dir), "t"))
+    assert todo == ["1.jpg"] and reasons == {"new": 1}
+
+
+def test_adopts_legacy_json_newer_than_image(matching_dir):
+    img = _image(matching_dir, "1.jpg")
+    _legacy_outputs(img, 1, 1, older=False)   # 크기는 달라도 이미지보다 나중에 씀
+    m = Manifest.open(str(matching_dir), "t")
+    todo, reasons = _select([img], m)
+    assert todo == [] and reasons == {"adopted": 1}
+    assert m.has_record(img)
+
+
+@pytest.mark.parametrize("name", ["1.jpg", "1.png"])
+def test_adopts_older_legacy_json_with_matching_size(matching_dir, name):
+    img = _image(matching_dir, name, 64, 48)
+    _legacy_outputs(img, 64, 48, older=True)
+    todo, reasons = _select([img], Manifest.open(str(matching_dir), "t"))
+    assert todo == [] and reasons == {"adopted": 1}
+
+
+def test_adopts_rotated_source_size(matching_dir):
+    img = _image(matching_dir, "1.jpg", 64, 48)
+    _legacy_outputs(img, 48, 64, older=True)   # EXIF 회전이 적용된 크기
+    assert _select([img], Manifest.open(str(matching_dir), "t"))[0] == []
+
+
+def test_stale_legacy_json_is_reprocessed(matching_dir):
+    img = _image(matching_dir, "1.jpg", 64, 48)
+    _legacy_outputs(img, 32, 32, older=True)   # 이미지가 바뀐 뒤 남은 JSON
+    m = Manifest.open(str(matching_dir), "t")
+    todo, reasons = _select([img], m)
+    assert todo == ["1.jpg"] and reasons == {"legacy_stale": 1}
+    assert not m.has_record(img)
+
+
+def test_recorded_images_skip_until_changed(matching_dir):
+    img = _image(matching_dir, "1.jpg")
+    _legacy_outputs(img, 64, 48, older=False)
+    m = Manifest.open(str(matching_dir), "t")
+    m.record(img, PRODUCER)
+    assert _select([img], m) == ([], {"unchanged": 1})
+
+    # 같은 내용으로 mtime 만 바뀜 -> 해시 비교 후 skip
+    st = os.stat(img)
+    os.utime(img, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert _select([img], m) == ([], {"touched": 1})
+
+    cv2.imwrite(img, np.full((48, 64, 3), 255, np.uint8))
+    assert _select([img], m) == (["1.jpg"], {"changed": 1})
+
+    m.record(img, "other:producer")
+    assert _select([img], m) == (["1.jpg"], {"model": 1})
+
+
+def test_missing_output_is_reprocessed(matching_dir):
+    img = _image(matching_dir, "1.jpg")
+    _legacy_outputs(img, 64, 48, older=False)
+    m = Manifest.open(str(matching_dir), "t")
+    m.record(img, PRODUCER)
+    os.remove(os.path.splitext(img)[0] + ".multi.json")
+    assert _select([img], m) == (["1.jpg"], {"missing_output": 1})
+
+
+def test_prunes_records_of_deleted_images(matching_dir):
+    keep = _image(matching_dir, "1.jpg")
+    gone = _image(matching_dir, "2.jpg")
+    m = Manifest.open(str(matching_dir), "t")
+    m.record(keep, PRODUCER)
+    m.record(gone, PRODUCER)
+    os.remove(gone)
+
+    todo, reasons = _select([keep], m)
+    assert reasons["pruned"] == 1
+    assert m.has_record(keep) and not m.has_record(gone)
+
+    m.save()
+    assert sorted(Manifest.open(str(matching_dir), "t").records) == ["1/1.jpg"]
+
+
+def test_save_keeps_other_tool_sections(matching_dir):
+    img = _image(matching_dir, "1.jpg")
+    other = Manifest.open(str(matching_dir), "other")
+    other.record(img, "x")
+    other.save()
+    m = Manifest.open(str(matching_dir), "t")
+    m.record(img, PRODUCER)
+    m.save()
+    assert Manifest.open(str(matching_dir), "other").has_record(img)
+    assert Manifest.open(str(matching_dir), "t").has_record(img)
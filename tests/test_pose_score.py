@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from common.pose_score import (
+    greedy_assign, normalize_poses, optimal_assign, score_frames, similarity,
+)
+from poses import make_pose
+
+
+def test_identical_pose_scores_one():
+    k = make_pose()
+    assert score_frames([k[None]], [k[None]]) == pytest.approx([1.0])
+
+
+def test_translation_and_scale_invariant():
+    a = make_pose(x0=100, y0=50, scale=1.0, arm=20)
+    b = make_pose(x0=400, y0=300, scale=2.5, arm=20)
+    assert score_frames([a[None]], [b[None]])[0] == pytest.approx(1.0)
+
+
+def test_different_pose_scores_lower():
+    same, diff = score_frames([make_pose(arm=0)[None]] * 2,
+                              [make_pose(arm=0)[None], make_pose(arm=60)[None]])
+    assert same == pytest.approx(1.0)
+    assert 0.0 <= diff < same
+
+
+def test_missing_torso_is_invalid():
+    k = make_pose()
+    k[11, 2] = 0.0   # left_hip 없음
+    vecs, valid = normalize_poses(np.stack([make_pose(), k]))
+    assert valid.tolist() == [True, False]
+    assert score_frames([k[None]], [make_pose()[None]]) == pytest.approx([0.0])
+
+
+def test_batches_frames_with_different_people_counts():
+    a, b = make_pose(x0=100), make_pose(x0=300, arm=50)
+    live = [a[None], np.stack([a, b]), np.zeros((0, 17, 3)), np.stack([b, a])]
+    tgts = [a[None], np.stack([a, b]), a[None], np.stack([a, b])]
+    for mode in ("greedy", "optimal"):
+        scores = score_frames(live, tgts, mode=mode)
+        assert scores.shape == (4,)
+        assert scores[:2] == pytest.approx([1.0, 1.0])
+        assert scores[2] == 0.0
+    # 사람 순서가 바뀌어도 최적 배정은 1.0
+    assert score_frames(live[3:], tgts[3:], mode="optimal")[0] == pytest.approx(1.0)
+
+
+def test_matches_per_frame_similarity():
+    rng = np.random.default_rng(0)
+    live = [make_pose(arm=float(a))[None] for a in rng.uniform(0, 80, 20)]
+    tgts = [make_pose(arm=float(a))[None] for a in rng.uniform(0, 80, 20)]
+    va, _ = normalize_poses(np.concatenate(live))
+    vb, _ = normalize_poses(np.concatenate(tgts))
+    assert score_frames(live, tgts) == pytest.approx(similarity(va, vb))
+
+
+def test_length_mismatch_raises():
+    with pytest.raises(ValueError):
+        score_frames([make_pose()[None]], [])
+
+
+def test_optimal_beats_greedy_order_dependence():
+    # greedy 는 A0 이 B0 을 먼저 가져가서 A1 이 나쁜 짝을 받음
+    sim = np.array([[[0.9, 0.8], [0.85, 0.1]]])
+    ok = np.ones((1, 2), bool)
+    assert greedy_assign(sim, ok, ok).tolist() == [[0, 1]]
+    assert optimal_assign(sim, ok, ok).tolist() == [[1, 0]]
@@ -0,0 +1,159 @@
+import json
+
+import numpy as np
+import pytest
+
+from common import pose_search
+from common.pose_score import normalize_poses, similarity
+from common.pose_search import PoseSearchIndex
+from common.target_index import TargetIndex, TargetSnapshot
+from poses import make_pose, person_json
+
+LEGS = [13, 14, 15, 16]   # knee, ankle
+
+
+def _pose(arm=0.0, legs=0.0, noise=0.0, rng=None):
+    k = make_pose(arm=arm)
+    k[LEGS, 0] += np.array([-legs, legs, -2 * legs, 2 * legs], np.float32)
+    if noise:
+        k[:, :2] += rng.normal(0, noise, (17, 2)).astype(np.float32)
+    return k
+
+
+class _Fixed:
+    """snapshot() 만 있는 TargetIndex 대역 (그룹 1, 이미지당 한 명)"""
+
+    def __init__(self, kps):
+        keys = [f"1/{i}.jpg" for i in range(len(kps))]
+        self._snap = TargetSnapshot(keys, np.arange(len(kps) + 1, dtype=np.int32), np.asarray(kps, np.float32),
+                                    np.full((len(kps), 2), 640, np.int32), version=1,
+                                    found={k: (k, 0, 0) for k in keys})
+
+    def snapshot(self):
+        return self._snap
+
+
+def _library(rng, n):
+    return [_pose(arm=rng.uniform(0, 80), legs=rng.uniform(0, 20), noise=2.0, rng=rng) for _ in range(n)]
+
+
+def _search(kps, ivf_min, monkeypatch):
+    monkeypatch.setattr(pose_search, "SEARCH_IVF_MIN", ivf_min)
+    s = PoseSearchIndex(_Fixed(kps))
+    s.sync()
+    return s
+
+
+def test_ivf_recall_against_exact_scan(monkeypatch):
+    rng = np.random.default_rng(0)
+    kps = _library(rng, 3000)
+    ivf = _search(kps, 2048, monkeypatch)
+    exact = _search(kps, 10 ** 9, monkeypatch)
+    assert ivf.info()["1"]["clusters"] > 0 and exact.info()["1"]["clusters"] == 0
+
+    hits = total = 0
+    for q in _library(rng, 30):
+        qv = PoseSearchIndex.query_vectors(q[None])
+        want = exact.nearest("1", qv, k=10)
+        got = ivf.nearest("1", qv, k=10)
+        hits += len({k for k, _ in want} & {k for k, _ in got})
+        total += len(want)
+        # IVF 점수는 같은 식 -> 찾은 이미지의 점수는 전체 계산과 같음
+        exact_scores = dict(exact.nearest("1", qv, k=len(kps)))
+        for key, s in got:
+            assert s == pytest.approx(exact_scores[key], abs=1e-5)
+    assert hits / total >= 0.9
+
+
+def test_nearest_matches_similarity_order():
+    targets = np.stack([_pose(arm=a) for a in (0, 20, 40, 60)])
+    s = PoseSearchIndex(_Fixed(targets))
+    s.sync()
+    query = _pose(arm=38)[None]
+    want = similarity(normalize_poses(np.repeat(query, 4, axis=0))[0], normalize_poses(targets)[0])
+    found = s.nearest("1", PoseSearchIndex.query_vectors(query), k=4)
+    assert [k for k, _ in found] == [f"1/{i}.jpg" for i in np.argsort(-want)]
+    assert [v for _, v in found] == pytest.approx(sorted(want, reverse=True), abs=1e-5)
+    assert found[0][0] == "1/2.jpg"
+    assert s.nearest("9", PoseSearchIndex.query_vectors(_pose()[None])) is None
+
+
+def test_joint_weights_change_ranking():
+    # 0: 팔은 같고 다리가 다름 / 1: 다리는 같고 팔이 다름
+    s = PoseSearchIndex(_Fixed([_pose(arm=40, legs=25), _pose(arm=0, legs=0)]))
+    s.sync()
+    q = PoseSearchIndex.query_vectors(_pose(arm=40, legs=0)[None])
+    arms = {n: 10.0 for n in ("left_elbow", "right_elbow", "left_wrist", "right_wrist")}
+    legs = {n: 10.0 for n in ("left_knee", "right_knee", "left_ankle", "right_ankle")}
+    assert s.nearest("1", q, k=1, weights=arms)[0][0] == "1/0.jpg"
+    assert s.nearest("1", q, k=1, weights=legs)[0][0] == "1/1.jpg"
+    # 다리만 보면 1 은 완전히 같은 포즈
+    only_legs = dict.fromkeys(pose_search.JOINT_WEIGHT_NAMES, 0.0) | legs
+    assert s.nearest("1", q, k=1, weights=only_legs)[0] == ("1/1.jpg", pytest.approx(1.0))
+
+    with pytest.raises(ValueError):
+        s.nearest("1", q, weights={"left_ear": 1})
+    with pytest.raises(ValueError):
+        s.nearest("1", q, weights={"nose": -1})
+
+
+def test_exclude():
+    s = PoseSearchIndex(_Fixed([_pose(arm=a) for a in (0, 20, 40, 60)]))
+    s.sync()
+    q = PoseSearchIndex.query_vectors(_pose(arm=40)[None])
+    ranked = [k for k, _ in s.nearest("1", q, k=4)]
+    found = s.nearest("1", q, k=4, exclude=["1/2.jpg", "9/1.jpg"])
+    assert ranked[0] == "1/2.jpg" and [k for k, _ in found] == ranked[1:]
+    assert s.nearest("1", q, exclude=[f"1/{i}.jpg" for i in range(4)]) == []
+
+    picked = s.diverse("1", k=4, exclude=["1/0.jpg"], seed=1)
+    assert sorted(k for k, _ in picked) == ["1/1.jpg", "1/2.jpg", "1/3.jpg"]
+    assert "1/2.jpg" not in [k for k, _ in s.diverse("1", k=4, q=q, exclude=["1/2.jpg"])]
+
+
+def test_diverse_picks_distinct_poses_and_seed_repeats():
+    # 서로 다른 포즈 3개를 10장씩
+    rng = np.random.default_rng(1)
+    kps = [_pose(arm=a, noise=0.5, rng=rng) for a in (0, 40, 80) for _ in range(10)]
+    s = PoseSearchIndex(_Fixed(kps))
+    s.sync()
+
+    picked = s.diverse("1", k=3, seed=7)
+    assert sorted(int(k.split("/")[1].split(".")[0]) // 10 for k, _ in picked) == [0, 1, 2]
+    assert all(score is None for _, score in picked)
+    assert s.diverse("1", k=3, seed=7) == picked
+    assert len({tuple(k for k, _ in s.diverse("1", k=3, seed=i)) for i in range(10)}) > 1
+
+    # 질의가 있으면 가장 가까운 것부터, pool 안에서만
+    q = PoseSearchIndex.query_vectors(kps[25][None])
+    picked = s.diverse("1", k=3, q=q, pool=10, seed=0)
+    assert picked[0][0] == "1/25.jpg" and picked[0][1] == pytest.approx(1.0)
+    assert all(20 <= int(k.split("/")[1].split(".")[0]) < 30 for k, _ in picked)
+
+
+def _write_group(matching_dir, group, arms):
+    gdir = matching_dir / group
+    gdir.mkdir(exist_ok=True)
+    for i, arm in enumerate(arms, 1):
+        (gdir / f"{i}.jpg").write_bytes(b"x")
+        people = [person_json(make_pose(x0=100 + 200 * s, arm=arm), slot=s) for s in range(int(group))]
+        (gdir / f"{i}.multi.json").write_text(json.dumps({"people": people, "source_size": {"w": 640, "h": 480}}))
+
+
+def test_sync_rebuilds_only_changed_group(matching_dir):
+    _write_group(matching_dir, "1", [0, 30, 60])
+    _write_group(matching_dir, "2", [0, 30])
+    index = TargetIndex(root=str(matching_dir)).load(use_cache=False)
+    s = PoseSearchIndex(index)
+    assert s.sync() == ["1", "2"]
+    assert s.sync() == []
+    one, two = s.group("1"), s.group("2")
+
+    _write_group(matching_dir, "2", [0, 30, 60])
+    assert index.refresh()["added"] == ["2/3.jpg"]
+    assert s.sync() == ["2"]
+    assert s.group("1") is one and s.group("2") is not two
+    assert s.info()["2"] == {"images": 3, "poses": 6, "clusters": 0}
+
+    q = PoseSearchIndex.query_vectors(np.stack([make_pose(arm=60)] * 2))
+    assert s.nearest("2", q, k=1) == [("2/3.jpg", pytest.approx(1.0))]
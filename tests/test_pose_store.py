@@ -0,0 +1,169 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import pose_store
+from common.target_index import TargetIndex
+from pose_store import POSE_DTYPE, STORE_NAME, PoseStore, group_rows, load_rows, people_to_rows
+from poses import make_pose, person_json
+
+
+def _people(i, n=2):
+    """이미지 i: n 명 (slot 역순으로 넣어 정렬 확인), 여러 명이면 마지막 slot 은 발목 관절 없음"""
+    people = [person_json(make_pose(x0=100 * i + 50 * s, arm=5 * s), slot=s) for s in reversed(range(n))]
+    if n > 1:
+        people[0]["keypoints_px"] = people[0]["keypoints_px"][:-2]
+    for s, p in enumerate(people):
+        p["score"] = 0.5 + 0.1 * s
+    return people
+
+
+def _images(folder, names):
+    folder.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (folder / name).write_bytes(b"x")
+
+
+def test_people_to_rows():
+    rows = people_to_rows("3.jpg", _people(3), 640, 480)
+    assert rows.dtype == POSE_DTYPE and len(rows) == 2
+    assert rows["slot"].tolist() == [0, 1] and rows["image"].tolist() == ["3.jpg"] * 2
+    assert (rows["w"][0], rows["h"][0]) == (640, 480)
+    assert rows["kps"][0] == pytest.approx(make_pose(x0=300))
+    assert rows["kps"][1, -2:].tolist() == [[0, 0, 0]] * 2       # 없는 관절은 0
+    # bbox_px 가 없으면 보이는 관절에서
+    assert rows["bbox"][0].tolist() == pytest.approx([265, 46, 70, 184])
+
+
+def test_put_save_and_memmap_round_trip(tmp_path):
+    folder = tmp_path / "2"
+    _images(folder, ["10.jpg", "2.jpg", "1.jpg"])
+    store = PoseStore()
+    for name in ("10.jpg", "2.jpg", "1.jpg"):
+        store.put(str(folder / name), _people(int(name[:-4]), n=1 + int(name[:-4]) % 2), 640, 480)
+    assert store.has(str(folder / "2.jpg")) and not store.has(str(folder / "3.jpg"))
+    assert store.save() == [str(folder / STORE_NAME)]
+    assert store.pending() == {}
+
+    rows = load_rows(str(folder))
+    assert isinstance(rows, np.memmap) and not rows.flags.writeable
+    groups = group_rows(rows)
+    assert list(groups) == ["1.jpg", "2.jpg", "10.jpg"]          # 자연 정렬
+    assert [sl.stop - sl.start for sl in groups.values()] == [2, 1, 1]
+    assert rows[groups["10.jpg"]]["kps"][0] == pytest.approx(make_pose(x0=1000))
+    assert np.array_equal(load_rows(str(folder), mmap=False), np.asarray(rows))
+    # 새 인스턴스는 파일에서 has() 판단
+    assert PoseStore().has(str(folder / "10.jpg"))
+
+
+def test_save_merges_drops_and_replaces_atomically(tmp_path, monkeypatch):
+    folder = tmp_path / "1"
+    _images(folder, ["1.jpg", "2.jpg", "3.jpg"])
+    store = PoseStore()
+    for i in (1, 2, 3):
+        store.put(str(folder / f"{i}.jpg"), _people(i, n=1), 640, 480)
+    store.save()
+    path = str(folder / STORE_NAME)
+    before = load_rows(str(folder), mmap=False)
+
+    seen = []
+    real_replace = os.replace
+
+    def replace(src, dst):
+        # 교체 직전까지 기존 파일은 그대로, 새 내용은 임시 파일에
+        seen.append((os.path.dirname(src) == str(folder), np.array_equal(np.load(dst), before)))
+        real_replace(src, dst)
+    monkeypatch.setattr(pose_store.os, "replace", replace)
+
+    store.drop(str(folder / "2.jpg"))
+    store.put(str(folder / "3.jpg"), _people(3, n=2), 640, 480)
+    os.remove(folder / "1.jpg")                                   # 이미지가 사라진 행도 제거
+    assert store.save() == [path]
+    assert seen == [(True, True)]
+    assert sorted(os.listdir(folder)) == ["2.jpg", "3.jpg", STORE_NAME]   # 임시 파일 없음
+    rows = load_rows(str(folder))
+    assert list(group_rows(rows)) == ["3.jpg"] and len(rows) == 2
+
+    # 남은 행이 없으면 파일 삭제
+    store.drop(str(folder / "3.jpg"))
+    assert store.save() == []
+    assert not os.path.exists(path)
+
+
+def test_load_rows_rejects_missing_and_foreign_files(tmp_path):
+    assert load_rows(str(tmp_path)) is None
+    np.save(tmp_path / STORE_NAME, np.zeros(3, np.float32))
+    assert load_rows(str(tmp_path)) is None
+    (tmp_path / STORE_NAME).write_bytes(b"garbage")
+    assert load_rows(str(tmp_path)) is None
+    assert group_rows(None) == {}
+
+
+def test_put_json(tmp_path):
+    folder = tmp_path / "1"
+    _images(folder, ["1.jpg"])
+    (folder / "1.multi.json").write_text(json.dumps({"source_size": {"w": 800, "h": 600}, "people": _people(1)}))
+    store = PoseStore()
+    store.put_json(str(folder / "1.jpg"), str(folder / "1.multi.json"))
+    store.save()
+    rows = load_rows(str(folder))
+    assert np.array_equal(np.asarray(rows), people_to_rows("1.jpg", _people(1), 800, 600))
+
+
+# -------------------------
+# TargetIndex: poses.npy 에서 만든 인덱스 == .multi.json 에서 만든 인덱스
+# -------------------------
+def _write_multi_json(matching_dir):
+    for group, names in (("1", ["1.jpg", "2.jpg", "11.jpg"]), ("2", ["1.jpg", "3.png"])):
+        folder = matching_dir / group
+        _images(folder, names)
+        for k, name in enumerate(names):
+            people = _people(k + 1, n=int(group))
+            data = {"source_size": {"w": 640 + k, "h": 480}, "people": people}
+            (folder / (os.path.splitext(name)[0] + ".multi.json")).write_text(json.dumps(data))
+
+
+def _to_columnar(matching_dir, groups=("1", "2")):
+    store = PoseStore()
+    for group in groups:
+        for f in sorted((matching_dir / group).glob("*.multi.json")):
+            img = next(p for p in (matching_dir / group).iterdir() if p.name.split(".")[0] == f.name.split(".")[0]
+                       and not p.name.endswith(".json"))
+            store.put_json(str(img), str(f))
+            os.remove(f)
+    store.save()
+
+
+def _assert_same(a, b):
+    a, b = a.snapshot(), b.snapshot()
+    assert a.keys == b.keys
+    assert np.array_equal(a.offsets, b.offsets)
+    assert np.array_equal(a.kps, b.kps)
+    assert np.array_equal(a.sizes, b.sizes)
+
+
+def test_columnar_index_equals_json_index(matching_dir):
+    _write_multi_json(matching_dir)
+    from_json = TargetIndex(root=str(matching_dir)).build()
+    assert all(v[0].endswith(".multi.json") for v in from_json.found.values())
+
+    _to_columnar(matching_dir)
+    from_npy = TargetIndex(root=str(matching_dir)).build()
+    assert {os.path.basename(v[0]) for v in from_npy.found.values()} == {STORE_NAME}
+    assert list(from_npy.keys) == ["1/1.jpg", "1/2.jpg", "1/11.jpg", "2/1.jpg", "2/3.png"]
+    _assert_same(from_json, from_npy)
+
+
+def test_columnar_and_json_groups_mix(matching_dir):
+    _write_multi_json(matching_dir)
+    from_json = TargetIndex(root=str(matching_dir)).build()
+    _to_columnar(matching_dir, groups=("1",))
+    mixed = TargetIndex(root=str(matching_dir)).build()
+    _assert_same(from_json, mixed)
+
+    # poses.npy 에 행이 있어도 이미지가 없으면 무시
+    os.remove(matching_dir / "1" / "2.jpg")
+    index = TargetIndex(root=str(matching_dir)).build()
+    assert "1/2.jpg" not in index.found and list(index.keys)[:2] == ["1/1.jpg", "1/11.jpg"]
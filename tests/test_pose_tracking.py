@@ -0,0 +1,180 @@
+import numpy as np
+import pytest
+
+from pose_tracking import (
+    EmaFilter, NoFilter, OneEuroFilter, PoseTracker, make_filter, pose_distance,
+)
+from poses import make_pose
+
+FPS = 30.0
+
+
+def _tracker(**kw):
+    kw.setdefault("detect_every", 1)
+    kw.setdefault("filter", "none")
+    kw.setdefault("flow", False)
+    return PoseTracker(**kw)
+
+
+def _nose_x(kps):
+    return float(kps[0, 0])
+
+
+# -------------------------
+# 필터
+# -------------------------
+def test_one_euro_initial_state_and_constant_signal():
+    f = OneEuroFilter()
+    assert f.seen is None and f.x is None
+    for i in range(10):
+        out = f(np.array([5.0, 7.0]), i / FPS)
+    assert out == pytest.approx([5.0, 7.0])
+    assert f.seen.all()
+
+
+def test_one_euro_smooths_jitter_more_than_fast_motion():
+    rng = np.random.default_rng(0)
+    slow, fast = OneEuroFilter(beta=0.05), OneEuroFilter(beta=0.05)
+    jitter_err, lag = [], []
+    for i in range(60):
+        t = i / FPS
+        noise = rng.normal(0, 2.0)
+        jitter_err.append(abs(slow(np.array([100.0 + noise]), t)[0] - 100.0) / max(abs(noise), 1e-6))
+        x = 100.0 + 600.0 * t                                    # 600 px/s
+        lag.append(abs(fast(np.array([x]), t)[0] - x))
+    # 제자리 떨림은 크게 줄이고, 빠른 움직임은 몇 px 이내로 따라감
+    assert np.median(jitter_err[10:]) < 0.5
+    assert max(lag[10:]) < 10.0
+
+
+def test_one_euro_mask_keeps_old_and_starts_fresh_values():
+    f = OneEuroFilter()
+    f(np.array([1.0, 0.0]), 0.0, mask=np.array([True, False]))
+    out = f(np.array([50.0, 30.0]), 1 / FPS, mask=np.array([False, True]))
+    assert out[0] == 1.0            # 값이 없으면 이전 값
+    assert out[1] == 30.0           # 처음 보인 좌표는 필터 없이
+
+
+def test_ema_and_none():
+    f = EmaFilter(alpha=0.5)
+    f(np.array([0.0]), 0.0)
+    assert f(np.array([10.0]), 0.1)[0] == pytest.approx(5.0)
+    assert f(np.array([99.0]), 0.2, mask=np.array([False]))[0] == pytest.approx(5.0)
+    assert NoFilter()(np.array([3.0]), 0.0)[0] == 3.0
+
+
+def test_unknown_filter():
+    with pytest.raises(ValueError):
+        make_filter("kalman")
+    with pytest.raises(ValueError):
+        PoseTracker(filter="kalman")
+
+
+# -------------------------
+# 연결 / ID
+# -------------------------
+def test_pose_distance():
+    a = make_pose(x0=100)
+    assert pose_distance(a, a) == 0.0
+    assert pose_distance(a, make_pose(x0=110)) == pytest.approx(10.0 / np.hypot(70, 184), rel=1e-3)   # 관절 bbox 70 x 184
+    b = a.copy()
+    b[:, 2] = 0
+    assert pose_distance(a, b) == np.inf
+
+
+def test_first_ids_follow_x_order_and_stay_stable():
+    tr = _tracker()
+    out = tr.update(0.0, [make_pose(x0=400), make_pose(x0=100), make_pose(x0=250)])
+    assert [(tid, _nose_x(k)) for tid, k, _ in out] == [(1, 100), (2, 250), (3, 400)]
+    # 검출 순서가 바뀌어도 가까운 트랙으로
+    for i in range(1, 10):
+        out = tr.update(i / FPS, [make_pose(x0=250 + 2 * i), make_pose(x0=400 - 2 * i), make_pose(x0=100 + 2 * i)])
+        assert [(tid, _nose_x(k)) for tid, k, _ in out] == [(1, 100 + 2 * i), (2, 250 + 2 * i), (3, 400 - 2 * i)]
+
+
+def test_ids_survive_crossing():
+    # 두 사람이 서로 지나감 (팔 높이로 구분), 매 프레임 검출 순서는 무작위
+    rng = np.random.default_rng(3)
+    tr = _tracker()
+    for i in range(40):
+        a = make_pose(x0=100 + 10 * i, y0=50, arm=0)
+        b = make_pose(x0=500 - 10 * i, y0=60, arm=60)
+        dets = [a, b] if rng.random() < 0.5 else [b, a]
+        out = dict((tid, k) for tid, k, _ in tr.update(i / FPS, dets))
+        assert sorted(out) == [1, 2]
+        assert _nose_x(out[1]) == pytest.approx(100 + 10 * i)
+        assert _nose_x(out[2]) == pytest.approx(500 - 10 * i)
+    assert tr.stats()["next_id"] == 3
+
+
+def test_missed_tracks_are_hidden_then_dropped():
+    tr = _tracker(max_misses=2)
+    tr.update(0.0, [make_pose(x0=100), make_pose(x0=400)])
+    for i in range(1, 3):
+        out = tr.update(i / FPS, [make_pose(x0=100)])
+        assert [tid for tid, _, _ in out] == [1]     # 가려진 사람은 내보내지 않음
+        assert len(tr.tracks) == 2
+    tr.update(3 / FPS, [make_pose(x0=100)])
+    assert len(tr.tracks) == 1
+    # 다시 나타나면 새 ID
+    out = tr.update(4 / FPS, [make_pose(x0=100), make_pose(x0=400)])
+    assert [tid for tid, _, _ in out] == [1, 3]
+
+
+def test_far_detection_starts_new_track():
+    tr = _tracker(match_thresh=0.6)
+    tr.update(0.0, [make_pose(x0=100)])
+    out = tr.update(1 / FPS, [make_pose(x0=600)])
+    assert [tid for tid, _, _ in out] == [2]
+
+
+# -------------------------
+# detect-every-N / 예측
+# -------------------------
+def test_detect_every_n_and_reset():
+    tr = _tracker(detect_every=3)
+    phases = []
+    for i in range(7):
+        need = tr.needs_detection()
+        phases.append(need)
+        tr.update(i / FPS, [make_pose(x0=100)] if need else None)
+    assert phases == [True, False, False, True, False, False, True]
+    assert tr.stats() == {"frames": 7, "detections": 3, "tracks": 1, "next_id": 2}
+
+    tr.update(7 / FPS, None)
+    assert not tr.needs_detection()
+    tr.reset()
+    assert tr.needs_detection()
+    assert tr.stats() == {"frames": 0, "detections": 0, "tracks": 0, "next_id": 1}
+    assert tr.update(0.0, [make_pose(x0=300)])[0][0] == 1
+
+
+def test_constant_velocity_between_detections():
+    tr = _tracker(detect_every=3)
+    tr.update(0.0, [make_pose(x0=100)])
+    tr.update(0.1, [make_pose(x0=110)])                 # 100 px/s
+    out = tr.update(0.2, None)
+    assert _nose_x(out[0][1]) == pytest.approx(120.0)
+    out = tr.update(0.25, None)
+    assert _nose_x(out[0][1]) == pytest.approx(125.0)
+    # 다음 검출은 예측 위치 근처라 같은 트랙
+    out = tr.update(0.3, [make_pose(x0=131)])
+    assert out[0][0] == 1 and _nose_x(out[0][1]) == pytest.approx(131.0)
+
+
+def test_optical_flow_follows_moving_frame():
+    pytest.importorskip("cv2")
+    rng = np.random.default_rng(0)
+    texture = (rng.random((300, 400)) * 255).astype(np.uint8)
+    texture = np.repeat(np.repeat(texture, 2, axis=0), 2, axis=1)[:240, :320]   # 2px 블록 -> 광류가 잡기 쉽게
+
+    def frame(shift):
+        return np.roll(texture, shift, axis=1)
+
+    tr = _tracker(detect_every=4, flow=True)
+    tr.update(0.0, [make_pose(x0=150, y0=20)], frame(0))
+    for i in range(1, 4):
+        out = tr.update(i / FPS, None, frame(3 * i))
+        nose = out[0][1][0]
+        assert nose[0] == pytest.approx(150 + 3 * i, abs=0.5)
+        assert nose[1] == pytest.approx(20, abs=0.5)
@@ -0,0 +1,161 @@
+import threading
+
+import pytest
+
+from common import session_store
+from common.session_store import MemorySessionStore, SessionNumberAllocator, SQLiteSessionStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    monkeypatch.setattr(session_store, "time", c)
+    return c
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path, clock):
+    if request.param == "memory":
+        return MemorySessionStore(ttl=60)
+    return SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), ttl=60)
+
+
+def _count(store):
+    if isinstance(store, MemorySessionStore):
+        return len(store._data)
+    return store._conn().execute("SELECT COUNT(*) FROM session_expiry").fetchone()[0]
+
+
+def test_expires_after_ttl(store, clock):
+    store.update("sid-a", capture_session="3", latest={"best_ac": 90})
+    clock.now += 59
+    assert store.get("sid-a") == {"capture_session": "3", "latest": {"best_ac": 90}}
+    clock.now += 61
+    assert store.get("sid-a") is None
+
+
+def test_access_extends_ttl(store, clock):
+    store.update("sid-a", n=1)
+    for _ in range(5):
+        clock.now += 50
+        assert store.get("sid-a") == {"n": 1}
+    clock.now += 61
+    assert store.get("sid-a") is None
+
+
+def test_expired_session_starts_fresh(store, clock):
+    store.update("sid-a", capture_count=5, video_session="1")
+    clock.now += 120
+    assert store.incr("sid-a", "capture_count") == 1
+    assert store.get("sid-a") == {"capture_count": 1}
+
+
+def test_purge_drops_only_expired(store, clock):
+    store.update("old", n=1)
+    clock.now += 30
+    store.update("new", n=2)
+    clock.now += 40          # old: 70s, new: 40s
+    store.purge()
+    assert _count(store) == 1
+    assert store.get("new") == {"n": 2}
+    assert store.get("old") is None
+
+
+def test_discard_and_delete(store):
+    store.update("sid-a", a=1, b=2, c=3)
+    store.discard("sid-a", "a", "c")
+    assert store.get("sid-a") == {"b": 2}
+    store.delete("sid-a")
+    assert store.get("sid-a") is None
+
+
+def test_incr_is_atomic(store):
+    def work():
+        for _ in range(50):
+            store.incr("sid-a", "capture_count")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.get("sid-a")["capture_count"] == 400
+
+
+def test_memory_store_evicts_least_recent(clock):
+    store = MemorySessionStore(ttl=60, max_sessions=2)
+    store.update("a", n=1)
+    store.update("b", n=2)
+    store.get("a")           # a 가 최근
+    store.update("c", n=3)
+    assert store.get("b") is None
+    assert store.get("a") == {"n": 1} and store.get("c") == {"n": 3}
+
+
+# -------------------------
+# SessionNumberAllocator
+# -------------------------
+DAY = "2026-03-04"
+
+
+@pytest.fixture
+def bases(tmp_path):
+    return [str(tmp_path / "capture"), str(tmp_path / "video")]
+
+
+def test_allocate_creates_folders_in_every_base(tmp_path, bases):
+    alloc = SessionNumberAllocator(bases, str(tmp_path / "n.sqlite3"))
+    assert alloc.allocate(DAY) == ("1", [str(tmp_path / "capture" / DAY / "1"), str(tmp_path / "video" / DAY / "1")])
+    assert alloc.allocate(DAY)[0] == "2"
+    assert alloc.allocate("2026-03-05")[0] == "1"      # 날짜마다 따로
+    assert (tmp_path / "video" / DAY / "2").is_dir()
+
+
+def test_allocate_is_unique_across_threads_and_instances(tmp_path, bases):
+    db = str(tmp_path / "n.sqlite3")
+    allocs = [SessionNumberAllocator(bases, db), SessionNumberAllocator(bases, db)]   # 워커 두 개가 같은 DB
+    got, lock = [], threading.Lock()
+
+    def work(alloc):
+        for _ in range(25):
+            number, _ = alloc.allocate(DAY)
+            with lock:
+                got.append(int(number))
+
+    threads = [threading.Thread(target=work, args=(allocs[i % 2],)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(got) == list(range(1, 201))
+    for base in ("capture", "video"):
+        assert sorted(int(f.name) for f in (tmp_path / base / DAY).iterdir()) == list(range(1, 201))
+
+
+def test_first_allocation_starts_after_existing_folders(tmp_path, bases):
+    (tmp_path / "capture" / DAY / "3").mkdir(parents=True)
+    (tmp_path / "video" / DAY / "7").mkdir(parents=True)
+    (tmp_path / "video" / DAY / "notes").mkdir()
+    alloc = SessionNumberAllocator(bases, str(tmp_path / "n.sqlite3"))
+    assert alloc.allocate(DAY)[0] == "8"
+    # 스캔은 그날 처음 한 번만: 이후 생긴 큰 번호 폴더는 시퀀스가 따라잡을 때 건너뜀
+    (tmp_path / "capture" / DAY / "20").mkdir()
+    assert alloc.allocate(DAY)[0] == "9"
+
+
+def test_allocate_skips_existing_folder(tmp_path, bases):
+    alloc = SessionNumberAllocator(bases, str(tmp_path / "n.sqlite3"))
+    assert alloc.allocate(DAY)[0] == "1"
+    (tmp_path / "capture" / DAY / "2").mkdir()             # 수동으로 만든 폴더
+    (tmp_path / "capture" / DAY / "3").mkdir()
+    number, paths = alloc.allocate(DAY)
+    assert number == "4" and all(p.endswith("4") for p in paths)
+    assert not (tmp_path / "video" / DAY / "2").exists()
@@ -0,0 +1,153 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from common import static_cache
+from common.render_cache import CappedDir
+from common.static_cache import CachedStaticFiles, fingerprint, parse_range
+
+VIDEO = bytes(range(256)) * 40   # 10240 바이트
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),            # 끝까지
+    ("bytes=-100", (900, 999)),            # 끝에서 100 바이트
+    ("bytes=-5000", (0, 999)),             # 파일보다 긴 suffix -> 전체
+    ("bytes=990-5000", (990, 999)),        # 끝을 넘으면 잘라냄
+    ("bytes=0-0", (0, 0)),
+    ("bytes=0-9,20-29", None),             # 여러 구간 -> 전체 응답
+    ("bytes=9-0", None),
+    ("bytes=-", None),
+    ("items=0-9", None),
+    ("bytes=a-9", None),
+    ("", None),
+])
+def test_parse_range(value, expected):
+    assert parse_range(value, 1000) == expected
+
+
+@pytest.mark.parametrize("value", ["bytes=1000-", "bytes=5000-6000", "bytes=-0"])
+def test_parse_range_not_satisfiable(value):
+    with pytest.raises(ValueError):
+        parse_range(value, 1000)
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    monkeypatch.setattr(static_cache, "STATIC_GZIP_DIR", str(tmp_path / "var" / "static_gz"))
+    root = tmp_path / "result_images"
+    (root / "video").mkdir(parents=True)
+    (root / "video" / "a.mp4").write_bytes(VIDEO)
+    (root / "matching").mkdir()
+    app = FastAPI()
+    static = CachedStaticFiles(directory=str(root), mount="/s")
+    app.mount("/s", static)
+    return TestClient(app), static, root
+
+
+def test_range_and_suffix_range(site):
+    client, _, _ = site
+    r = client.get("/s/video/a.mp4", headers={"Range": "bytes=100-199"})
+    assert r.status_code == 206 and r.content == VIDEO[100:200]
+    assert r.headers["content-range"] == f"bytes 100-199/{len(VIDEO)}"
+    assert r.headers["accept-ranges"] == "bytes"
+
+    r = client.get("/s/video/a.mp4", headers={"Range": "bytes=-10"})
+    assert r.status_code == 206 and r.content == VIDEO[-10:]
+    r = client.get("/s/video/a.mp4", headers={"Range": "bytes=10000-"})
+    assert r.status_code == 206 and r.content == VIDEO[10000:]
+
+
+def test_multi_range_returns_full_file(site):
+    client, _, _ = site
+    r = client.get("/s/video/a.mp4", headers={"Range": "bytes=0-9,20-29"})
+    assert r.status_code == 200 and r.content == VIDEO
+
+
+def test_unsatisfiable_range_is_416(site):
+    client, _, _ = site
+    r = client.get("/s/video/a.mp4", headers={"Range": f"bytes={len(VIDEO)}-"})
+    assert r.status_code == 416
+    assert r.headers["content-range"] == f"bytes */{len(VIDEO)}"
+
+
+def test_if_range(site):
+    client, _, _ = site
+    etag = client.get("/s/video/a.mp4").headers["etag"]
+    r = client.get("/s/video/a.mp4", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert r.status_code == 206 and r.content == VIDEO[:10]
+    # 그 사이 파일이 바뀐 클라이언트 -> 부분이 아닌 전체
+    r = client.get("/s/video/a.mp4", headers={"Range": "bytes=0-9", "If-Range": '"stale-etag"'})
+    assert r.status_code == 200 and r.content == VIDEO
+
+
+def test_head_range(site):
+    client, _, _ = site
+    r = client.head("/s/video/a.mp4", headers={"Range": "bytes=0-99"})
+    assert r.status_code == 206 and r.content == b""
+    assert r.headers["content-length"] == "100"
+    assert r.headers["content-range"] == f"bytes 0-99/{len(VIDEO)}"
+
+
+def test_fingerprint_cache_control_and_dot_files(site):
+    client, _, root = site
+    (root / "matching" / "1.jpg").write_bytes(b"x")
+    (root / "matching" / ".target_index.npz").write_bytes(b"x")
+    fp = fingerprint(os.stat(root / "matching" / "1.jpg"))
+    assert "immutable" in client.get(f"/s/matching/1.jpg?v={fp}").headers["cache-control"]
+    assert client.get("/s/matching/1.jpg?v=old").headers["cache-control"] == "public, no-cache"
+    assert client.get("/s/matching/.target_index.npz").status_code == 404
+
+
+def _gz_files():
+    return sorted(os.path.basename(p) for _, _, p in CappedDir(static_cache.STATIC_GZIP_DIR, 0, ".gz").files())
+
+
+def test_gzip_cache_lives_outside_public_tree_and_replaces_old_version(site):
+    client, static, root = site
+    path = root / "matching" / "1.json"
+    path.write_text(json.dumps({"people": [{"slot": i} for i in range(200)]}))
+
+    r = client.get("/s/matching/1.json", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and r.json()["people"][199] == {"slot": 199}
+    assert static_cache.STATIC_GZIP_DIR.startswith(str(root.parent / "var"))
+    first = _gz_files()
+    assert len(first) == 1 and not any(".gz" in n for _, _, names in os.walk(root) for n in names)
+
+    path.write_text(json.dumps({"people": [{"slot": i, "v": 2} for i in range(200)]}))
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert client.get("/s/matching/1.json", headers={"Accept-Encoding": "gzip"}).json()["people"][0]["v"] == 2
+    second = _gz_files()
+    assert len(second) == 1 and second != first
+
+
+def test_gzip_cache_is_size_capped(site):
+    client, static, root = site
+    static._gz_dir.max_bytes = 2000
+    for i in range(20):
+        (root / "matching" / f"{i}.json").write_text(json.dumps({"i": i, "v": os.urandom(800).hex()}))
+        assert client.get(f"/s/matching/{i}.json", headers={"Accept-Encoding": "gzip"}).json()["i"] == i
+    total = sum(size for _, size, _ in static._gz_dir.files())
+    assert total <= 2000 and static._gz_dir.size == total
+
+
+def test_capped_dir_evicts_least_recent(tmp_path):
+    d = CappedDir(str(tmp_path), 300, ".bin")
+    for i in range(3):
+        p = tmp_path / f"{i}.bin"
+        p.write_bytes(b"x" * 100)
+        os.utime(p, (1000 + i, 1000 + i))
+        d.add(100)
+    os.utime(tmp_path / "0.bin", (2000, 2000))   # 0 을 최근에 씀
+    (tmp_path / "3.bin").write_bytes(b"x" * 100)
+    (tmp_path / "other.txt").write_bytes(b"x" * 1000)   # suffix 가 다르면 세지 않음
+    assert d.add(100, keep=str(tmp_path / "3.bin")) == 2
+    assert sorted(os.listdir(tmp_path)) == ["0.bin", "3.bin", "other.txt"]
+    assert d.size == 200
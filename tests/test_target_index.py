@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+
+import pytest
+
+from common.target_index import TargetIndex
+from poses import make_pose, person_json
+
+N_IMAGES = 6
+GENERATIONS = 12
+
+
+def _write(matching_dir, i, gen):
+    """1/<i>.jpg 의 .multi.json: gen 세대 -> 사람 (gen % 3) + 1 명, 모두 y0 = gen, x0 = 100 * i, w = gen + 1"""
+    gdir = matching_dir / "1"
+    gdir.mkdir(exist_ok=True)
+    img = gdir / f"{i}.jpg"
+    if not img.exists():
+        img.write_bytes(b"x")
+    people = [person_json(make_pose(x0=100 * i, y0=gen, arm=10 * s), slot=s) for s in range(gen % 3 + 1)]
+    tmp = gdir / f"{i}.tmp"
+    tmp.write_text(json.dumps({"people": people, "source_size": {"w": gen + 1, "h": 480}}))
+    os.replace(tmp, gdir / f"{i}.multi.json")
+
+
+def _check(snap):
+    """스냅샷 안의 keys / offsets / kps / sizes 가 같은 세대끼리 맞는지"""
+    for n, key in enumerate(snap.keys):
+        i = int(key.split("/")[1].split(".")[0])
+        people = snap.people(key)
+        gen = int(round(float(people[0][0, 1])))
+        assert len(people) == gen % 3 + 1, key
+        assert people[:, 0, 0].tolist() == [100 * i] * len(people), key
+        assert people[:, 0, 1].tolist() == [gen] * len(people), key
+        assert int(snap.sizes[n][0]) == gen + 1, key
+
+
+def test_refresh_reports_changes(matching_dir):
+    for i in range(1, 4):
+        _write(matching_dir, i, 0)
+    index = TargetIndex(root=str(matching_dir)).load(use_cache=False)
+    v = index.version
+    assert index.refresh() == {"added": [], "updated": [], "removed": []}
+    assert index.version == v
+
+    _write(matching_dir, 2, 1)
+    _write(matching_dir, 4, 0)
+    os.remove(matching_dir / "1" / "3.multi.json")
+    assert index.refresh() == {"added": ["1/4.jpg"], "updated": ["1/2.jpg"], "removed": ["1/3.jpg"]}
+    assert index.version == v + 1
+    assert list(index.snapshot().keys) == ["1/1.jpg", "1/2.jpg", "1/4.jpg"]
+    assert len(index.people("1/2.jpg")) == 2
+    _check(index.snapshot())
+
+
+def test_refresh_with_concurrent_readers(matching_dir):
+    for i in range(1, N_IMAGES + 1):
+        _write(matching_dir, i, 0)
+    index = TargetIndex(root=str(matching_dir)).load(use_cache=False)
+    stop = threading.Event()
+    errors, versions = [], []
+
+    def reader():
+        try:
+            while not stop.is_set():
+                snap = index.snapshot()
+                _check(snap)
+                versions.append(snap.version)
+        except Exception as e:   # noqa: BLE001 - 메인 스레드에서 다시 확인
+            errors.append(e)
+            stop.set()
+
+    def refresher():
+        while not stop.is_set():
+            index.refresh()
+
+    threads = [threading.Thread(target=reader) for _ in range(4)] + [threading.Thread(target=refresher)]
+    for t in threads:
+        t.start()
+    try:
+        for gen in range(1, GENERATIONS):
+            if stop.is_set():
+                break
+            for i in range(1, N_IMAGES + 1):
+                _write(matching_dir, i, gen)
+            index.refresh()
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+    assert not errors, errors[0]
+    assert len(set(versions)) > 1
+    index.refresh()
+    snap = index.snapshot()
+    _check(snap)
+    assert [len(snap.people(k)) for k in snap.keys] == [(GENERATIONS - 1) % 3 + 1] * N_IMAGES
+
+
+@pytest.mark.parametrize("key", ["1/99.jpg", "x"])
+def test_unknown_key(matching_dir, key):
+    _write(matching_dir, 1, 0)
+    index = TargetIndex(root=str(matching_dir)).load(use_cache=False)
+    assert index.people(key) is None and index.get(key) is None
@@ -0,0 +1,107 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect, Request
+
+import main
+
+SID = "test-upload-session"
+
+
+@pytest.fixture
+def client():
+    main.session_store.update(SID, video_session="1")
+    c = TestClient(main.app)
+    c.headers["X-Session-Id"] = SID
+    return c
+
+
+def _part(upload_id):
+    return main._part_path(main.session_store.get(SID), upload_id)
+
+
+def _request(receive):
+    scope = {"type": "http", "method": "POST", "path": "/upload_video/chunk", "query_string": b"",
+             "headers": [(b"x-session-id", SID.encode())]}
+    return Request(scope, receive)
+
+
+def test_offset_mismatch_and_resume(client):
+    data = os.urandom(5000)
+    uid = "resume-1"
+
+    r = client.post(f"/upload_video/chunk?upload_id={uid}&offset=0", content=data[:2000])
+    assert r.json() == {"status": "ok", "received": 2000}
+
+    # 같은 조각 재전송 / 건너뛴 offset -> 409 + 서버가 받은 크기
+    for offset in (0, 3000):
+        r = client.post(f"/upload_video/chunk?upload_id={uid}&offset={offset}", content=data[2000:])
+        assert r.status_code == 409 and r.json()["received"] == 2000
+
+    # 끊긴 뒤 상태 조회 -> 그 위치부터 이어 보냄
+    received = client.get(f"/upload_video/status?upload_id={uid}").json()["received"]
+    r = client.post(f"/upload_video/chunk?upload_id={uid}&offset={received}", content=data[received:])
+    assert r.json()["received"] == len(data)
+
+    assert client.post(f"/upload_video/complete?upload_id={uid}&size=1").status_code == 409
+    r = client.post(f"/upload_video/complete?upload_id={uid}&size={len(data)}")
+    assert r.json()["size"] == len(data)
+    today = main.datetime.now().strftime("%Y-%m-%d")
+    with open(os.path.join(main.IMG_RESULT_DIR, "video", today, "1", f"{today}.mp4"), "rb") as f:
+        assert f.read() == data
+    assert not os.path.exists(_part(uid))
+
+
+def test_invalid_upload_id(client):
+    assert client.post("/upload_video/chunk?upload_id=../x&offset=0", content=b"x").status_code == 400
+    assert client.post("/upload_video/complete?upload_id=nope").status_code == 404
+
+
+def test_disconnect_rolls_back_chunk(client):
+    uid = "disconnect-1"
+    client.post(f"/upload_video/chunk?upload_id={uid}&offset=0", content=b"a" * 100)
+
+    messages = iter([{"type": "http.request", "body": b"b" * 50, "more_body": True},
+                     {"type": "http.disconnect"}])
+
+    async def receive():
+        return next(messages)
+
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(main.upload_video_chunk(_request(receive), uid, offset=100))
+    with open(_part(uid), "rb") as f:
+        assert f.read() == b"a" * 100
+
+
+def test_concurrent_chunks_for_same_offset(client):
+    uid = "race-1"
+
+    async def run():
+        gate = asyncio.Event()
+
+        def sender(byte, wait):
+            chunks = [b"", byte * 10, byte * 10]
+
+            async def receive():
+                if wait and chunks[0] == b"":
+                    await gate.wait()   # 첫 요청은 offset 확인 뒤 본문을 늦게 보냄
+                chunks.pop(0)
+                return {"type": "http.request", "body": chunks[0], "more_body": len(chunks) > 1}
+            return receive
+
+        first = asyncio.create_task(main.upload_video_chunk(_request(sender(b"a", True)), uid, offset=0))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(main.upload_video_chunk(_request(sender(b"b", False)), uid, offset=0))
+        await asyncio.sleep(0.05)
+        gate.set()
+        return await first, await second
+
+    ok, conflict = asyncio.run(run())
+    assert ok == {"status": "ok", "received": 20}
+    assert conflict.status_code == 409
+    with open(_part(uid), "rb") as f:
+        assert f.read() == b"a" * 20
@@ -0,0 +1,241 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common.import_data import cv2, np, os, json, time, datetime
+from common.common import IMG_RESULT_CAP_DIR
+from common.pose_score import score_frames
+from common.video_analysis import video_path
+
+# -------------------------
+# 세션 영상에서 라운드별 베스트 포즈 추출 (백그라운드)
+# - 트랙(video_analysis 의 {date}.track.npz, 없으면 분석을 기다림)의 모든 프레임을
+#   각 라운드 타겟 키포인트와 score_frames 한 번으로 채점 (전 라운드를 이어 붙여 벡터화)
+# - 라운드 구간 = 클라이언트가 보낸 round_marks [[시작 s, 캡처 s], ...] (녹화 시작 기준, performance.now 시계)
+#   record_s(클라이언트가 잰 녹화 길이)가 있으면 영상 길이 / record_s 로 늘이거나 줄여 영상 시간에 맞춤
+#   (MediaRecorder 시작 지연·프레임 누락으로 두 시계가 어긋남), 없으면 영상 길이를 라운드 수로 균등 분할
+# - 점수는 서버 YOLO 키포인트 기준이라 클라이언트(MoveNet) 정확도와 척도가 다름
+#   -> 결과 화면은 프레임 선택에만 쓰고 표시 정확도는 클라이언트 값을 유지
+# - 라운드마다 BEST_WINDOW_S 이동 평균이 가장 높은 구간(피크 윈도우)을 찾고, 그 안의 최고 프레임을
+#   capture/{date}/{folder}/{date}_best_{round}.jpg 로 내보냄 (한 번의 순차 디코딩으로 모든 라운드)
+# - 결과(라운드별 유사도 시계열 포함)는 video/{date}/{folder}/{date}.best.json
+# -------------------------
+
+BEST_WINDOW_S = float(os.environ.get("POSE_BEST_WINDOW_S", "0.5"))
+BEST_MODE = os.environ.get("POSE_BEST_MODE", "greedy")              # greedy(JS 와 동일) | optimal
+BEST_TIMEOUT_S = float(os.environ.get("POSE_BEST_TIMEOUT_S", "600"))  # 영상 분석 대기 한도
+BEST_JPEG_QUALITY = 92
+
+BEST_SUFFIX = ".best.json"
+
+
+def best_path(mp4_path):
+    return os.path.splitext(mp4_path)[0] + BEST_SUFFIX
+
+
+def best_image_name(date, round_no):
+    return f"{date}_best_{round_no}.jpg"
+
+
+def round_spans(times, n_rounds, marks=None, record_s=None):
+    """
+    라운드별 (시작 s, 끝 s). marks 가 라운드 수만큼 있으면 영상 시간으로 환산
+    (record_s 가 있으면 영상 길이 / record_s 배, 0 ~ 영상 끝으로 자름), 아니면 균등 분할
+    """
+    end = float(times[-1]) if len(times) else 0.0
+    if marks and len(marks) >= n_rounds:
+        scale = end / float(record_s) if record_s and float(record_s) > 0 and end > 0 else 1.0
+        return [(min(max(float(a) * scale, 0.0), end), min(max(float(b) * scale, 0.0), end))
+                for a, b in marks[:n_rounds]]
+    edges = np.linspace(0.0, end, n_rounds + 1)
+    return [(float(edges[r]), float(edges[r + 1])) for r in range(n_rounds)]
+
+
+def peak_window(scores, w):
+    """
+    scores (k,) -> (시작, 끝(포함), 윈도우 평균, 최고 프레임 위치)
+    길이 w 이동 평균이 최대인 구간 안에서 점수가 가장 높은 프레임 (한 프레임짜리 튐은 무시됨)
+    """
+    w = max(1, min(w, len(scores)))
+    csum = np.concatenate([[0.0], np.cumsum(scores)])
+    means = (csum[w:] - csum[:-w]) / w
+    i = int(np.argmax(means))
+    j = i + int(np.argmax(scores[i:i + w]))
+    return i, i + w - 1, float(means[i]), j
+
+
+def read_frames(mp4_path, wanted):
+    """frame_idx 집합 -> {frame_idx: frame_bgr} (처음부터 순차로, 필요 없는 프레임은 grab() 만)"""
+    out = {}
+    if not wanted:
+        return out
+    last = max(wanted)
+    cap = cv2.VideoCapture(mp4_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"cannot open video: {mp4_path}")
+    try:
+        for idx in range(last + 1):
+            if not cap.grab():
+                break
+            if idx in wanted:
+                ok, frame = cap.retrieve()
+                if ok:
+                    out[idx] = frame
+    finally:
+        cap.release()
+    return out
+
+
+def _write_jpeg(path, frame):
+    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, BEST_JPEG_QUALITY])
+    if not ok:
+        raise RuntimeError(f"cannot encode frame: {path}")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(buf.tobytes())
+    os.replace(tmp, path)
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def extract_best(track, targets, marks=None, mode=BEST_MODE, window_s=BEST_WINDOW_S, record_s=None):
+    """
+    track   : video_analysis 트랙 dict
+    targets : 라운드별 타겟 키포인트 [(m, 17, 3)] (없는 라운드는 None)
+    record_s: 클라이언트가 잰 녹화 길이 (marks 를 영상 시간으로 환산, round_spans)
+    -> (라운드 결과 목록, 라운드별 프레임 점수 목록) - 이미지 저장은 하지 않음
+    """
+    times = track["time_s"].astype(np.float64)
+    offsets = track["offsets"]
+    kps = track["kps"]
+    spans = round_spans(times, len(targets), marks, record_s)
+
+    # 전 라운드의 (프레임, 타겟) 쌍을 이어 붙여 score_frames 한 번으로 채점
+    sel = [np.flatnonzero((times >= a) & (times <= b)) if tgt is not None and len(tgt) else np.zeros(0, np.intp)
+           for (a, b), tgt in zip(spans, targets)]
+    live = [kps[offsets[f]:offsets[f + 1]] for rows in sel for f in rows]
+    tgts = [tgt for rows, tgt in zip(sel, targets) for _ in rows]
+    flat = score_frames(live, tgts, mode=mode)
+
+    # 샘플 간격 -> 윈도우 프레임 수
+    dt = float(np.median(np.diff(times))) if len(times) > 1 else 0.0
+    w = max(1, int(round(window_s / dt))) if dt > 0 else 1
+
+    rounds, curves, pos = [], [], 0
+    for r, ((a, b), rows) in enumerate(zip(spans, sel)):
+        scores = flat[pos:pos + len(rows)]
+        pos += len(rows)
+        curves.append(scores)
+        item = {"round": r + 1, "start_s": round(a, 3), "end_s": round(b, 3), "frames": int(len(rows)),
+                "best": None, "window": None,
+                "series": {"time_s": [round(float(t), 3) for t in times[rows]],
+                           "score": [round(float(s), 4) for s in scores]}}
+        if len(rows):
+            i, k, mean, j = peak_window(scores, w)
+            s = float(scores[j])
+            item["window"] = {"start_s": round(float(times[rows[i]]), 3), "end_s": round(float(times[rows[k]]), 3),
+                              "score": round(mean, 6)}
+            item["best"] = {"time_s": round(float(times[rows[j]]), 3), "frame_idx": int(track["frame_idx"][rows[j]]),
+                            "score": round(s, 6),
+                            # JS Math.round(sim * 100) 와 같은 반올림
+                            "percent": int(np.floor(s * 100 + 0.5)), "image": None}
+        rounds.append(item)
+    return rounds, curves
+
+
+class BestPoseExtractor:
+    """라운드별 베스트 포즈 추출 작업 관리 (job_id = "{date}/{folder}", 영상 분석과 별도 스레드)."""
+
+    def __init__(self, video_analyzer, mode=BEST_MODE, window_s=BEST_WINDOW_S, on_done=None):
+        self.analyzer = video_analyzer
+        self.mode = mode
+        self.window_s = window_s
+        self.on_done = on_done   # (date, folder, result dict) -> None (썸네일 미리 생성 등)
+        self.jobs = {}
+        self._lock = threading.Lock()
+        # 영상 분석을 기다리는 작업이므로 분석 워커 풀과 분리 (같은 풀이면 서로 기다리다 멈춤)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="best-pose")
+
+    def submit(self, date, folder, player, target_names, targets, marks=None, record_s=None):
+        """targets: 라운드별 (m, 17, 3) 또는 None (키포인트 없는 타겟), record_s: 클라이언트 녹화 길이"""
+        job_id = f"{date}/{folder}"
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job and job["state"] in ("queued", "running"):
+                return job_id
+            self.jobs[job_id] = {
+                "job_id": job_id, "state": "queued", "result": None,
+                "submitted": datetime.now().isoformat(timespec="seconds"), "elapsed_s": None, "error": None,
+            }
+        self._pool.submit(self._run, job_id, date, str(folder), player, list(target_names), targets, marks,
+                          record_s)
+        return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update(self, job_id, **kw):
+        with self._lock:
+            self.jobs[job_id].update(kw)
+
+    def _run(self, job_id, date, folder, player, names, targets, marks, record_s=None):
+        t0 = time.perf_counter()
+        self._update(job_id, state="running")
+        try:
+            mp4 = video_path(date, folder)
+            if not os.path.exists(mp4):
+                raise RuntimeError(f"video not found: {mp4}")
+            track = self.analyzer.track(date, folder, timeout=BEST_TIMEOUT_S)
+            t1 = time.perf_counter()
+            rounds, _ = extract_best(track, targets, marks, mode=self.mode, window_s=self.window_s,
+                                     record_s=record_s)
+            score_ms = (time.perf_counter() - t1) * 1000
+
+            # 베스트 프레임을 캡처 폴더로 (영상은 한 번만 순차 디코딩)
+            frames = read_frames(mp4, {it["best"]["frame_idx"] for it in rounds if it["best"]})
+            cap_dir = os.path.join(IMG_RESULT_CAP_DIR, date, folder)
+            os.makedirs(cap_dir, exist_ok=True)
+            for it, name in zip(rounds, names):
+                it["target"] = name
+                best = it["best"]
+                if best and best["frame_idx"] in frames:
+                    best["image"] = best_image_name(date, it["round"])
+                    _write_jpeg(os.path.join(cap_dir, best["image"]), frames[best["frame_idx"]])
+
+            found = [it["best"]["percent"] for it in rounds if it["best"] and it["best"]["image"]]
+            result = {
+                "date": date, "folder": folder, "player": player, "mode": self.mode,
+                "window_s": self.window_s, "marks": bool(marks and len(marks) >= len(rounds)),
+                "record_s": record_s,
+                "fps": float(track["fps"]), "stride": int(track["stride"]),
+                "best_ac": max(found) if found else None,
+                "rounds": rounds,
+                "score_ms": round(score_ms, 2),
+                "created": datetime.now().isoformat(timespec="seconds"),
+            }
+            _write_json(best_path(mp4), result)
+            self._update(job_id, state="done", result=result, elapsed_s=round(time.perf_counter() - t0, 2))
+            print(f"[best_pose] {job_id}: {len(rounds)} rounds, best={result['best_ac']}% "
+                  f"(scored {sum(it['frames'] for it in rounds)} frames in {score_ms:.1f}ms)")
+            if self.on_done:
+                self.on_done(date, folder, result)
+        except Exception as e:
+            self._update(job_id, state="error", error=str(e), elapsed_s=round(time.perf_counter() - t0, 2))
+            print(f"[best_pose] {job_id} failed: {e}")
+
+    def load(self, date, folder):
+        """저장된 결과 (서버 재시작 후에도) - 없으면 None"""
+        try:
+            with open(best_path(video_path(date, folder)), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -8,14 +8,17 @@ IMG_DIR         = os.path.join(BASE_DIR, "images")
 IMG_PC_DIR      = os.path.join(IMG_DIR, "pc")
 IMG_MOBILE_DIR  = os.path.join(IMG_DIR, "mobile")
 
-# result_images(출력 및 저장)의 경로
-IMG_RESULT_DIR          = os.path.join(BASE_DIR, "result_images")
+# result_images(출력 및 저장)의 경로 (POSE_RESULT_DIR 로 변경 가능 - 벤치마크 등)
+IMG_RESULT_DIR          = os.environ.get("POSE_RESULT_DIR", os.path.join(BASE_DIR, "result_images"))
 IMG_RESULT_CAP_DIR      = os.path.join(IMG_RESULT_DIR, "capture")
 IMG_RESULT_CAP_SK_DIR   = os.path.join(IMG_RESULT_DIR, "capture_skeleton")
 IMG_RESULT_MAT_DIR      = os.path.join(IMG_RESULT_DIR, "matching")
 IMG_RESULT_MAT_SK_DIR   = os.path.join(IMG_RESULT_DIR, "matching_skeleton")
 IMG_RESULT_VIDEO_DIR    = os.path.join(IMG_RESULT_DIR, "video")
 
+# 서버 내부 상태(세션 DB 등)의 경로 - /static 으로 공개되는 result_images 밖에 둔다 (POSE_VAR_DIR 로 변경 가능)
+VAR_DIR = os.environ.get("POSE_VAR_DIR", os.path.join(BASE_DIR, "var"))
+
 # music(백그라운드 음악)의 경로
 MUSIC_DIR = os.path.join(BASE_DIR, "music")
 
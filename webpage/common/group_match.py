@@ -0,0 +1,58 @@
+from common.import_data import np, time
+from common.pose_score import NORM_ORDER, VEC_DIM, normalize_poses, similarity_matrix, ASSIGNERS
+
+# -------------------------
+# 단체(3·4인) 매칭
+# - 타겟 쪽 정규화 벡터는 TargetIndex 에 이미지별로 미리 계산돼 있음 -> 프레임마다 라이브 쪽만 계산
+# - 사람 x 사람 유사도 행렬을 한 번에 만들고 최적 배정(optimal_assign)
+# - 짝별 점수 + 관절별 기여도(코사인 분자를 관절 단위로 나눈 값, 합 = cos) 제공
+# -------------------------
+
+
+class GroupMatcher:
+    def __init__(self, target_index, mode="optimal"):
+        self.index = target_index
+        self.mode = mode
+
+    def target_vectors(self, key):
+        """(m, 30) 정규화 벡터, (m,) valid - 인덱스 배열의 view (복사·재계산 없음)"""
+        snap = self.index.snapshot()   # slice 와 배열을 같은 시점에서
+        sl = snap.people_slice(key)
+        if sl is None:
+            return None, None
+        return snap.vecs[sl], snap.valid[sl]
+
+    def match(self, live_kps, target_key, mode=None, detail=True):
+        """
+        live_kps : (n, 17, 3) 라이브 키포인트 (px)
+        -> {"score", "pairs": [{"live", "target", "score", "joints": {name: 기여도}}], "elapsed_ms"}
+        """
+        t0 = time.perf_counter()
+        tv, tvalid = self.target_vectors(target_key)
+        if tv is None:
+            return None
+        lv, lvalid = normalize_poses(live_kps)
+
+        sim = similarity_matrix(lv, tv)   # (n, m) 한 번에
+        assign = ASSIGNERS[mode or self.mode](sim[None], lvalid[None], tvalid[None])[0]
+
+        pairs = []
+        for i, j in enumerate(assign):
+            if j < 0:
+                continue
+            pair = {"live": i, "target": int(j), "score": round(float(sim[i, j]), 6)}
+            if detail:
+                # cos = sum_k a_k b_k / (|a||b|) -> 관절(x, y 두 성분) 단위로 나눔
+                denom = float(np.linalg.norm(lv[i]) * np.linalg.norm(tv[j])) or 1e-6
+                contrib = (lv[i] * tv[j]).reshape(VEC_DIM // 2, 2).sum(axis=1) / denom
+                pair["joints"] = {n: round(float(c), 6) for n, c in zip(NORM_ORDER, contrib)}
+            pairs.append(pair)
+
+        score = float(np.mean([p["score"] for p in pairs])) if pairs else 0.0
+        return {
+            "target": target_key,
+            "mode": mode or self.mode,
+            "score": round(score, 6),
+            "pairs": pairs,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 4),
+        }
@@ -1,23 +1,13 @@
-# -------------------------
-# 웹 서버 (FastAPI)
-# -------------------------
-from fastapi import FastAPI, Request, Form  # Form을 사용하기 위해 python-multipart 필요
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+import importlib
+import types
 
 # -------------------------
-# 영상 및 이미지 처리
+# 시간 처리
 # -------------------------
-import cv2
-import mediapipe as mp
-from PIL import Image
+import time
+from datetime import datetime
 
-# -------------------------
-# 데이터 처리
-# -------------------------
-import numpy as np
-import pandas as pd
+_T0 = time.perf_counter()
 
 # -------------------------
 # 파일/폴더/라벨 처리
@@ -27,7 +17,76 @@ import json
 import shutil
 
 # -------------------------
-# 시간 처리
+# 시작 시간 측정 (POSE_PROFILE_STARTUP=1 또는 python main.py --profile-startup)
+# - IMPORT_TIMES: 모듈별 import 시간(초), 지연 로드된 모듈은 처음 쓰인 시점에 기록
 # -------------------------
-import time
-from datetime import datetime
+PROFILE_STARTUP = os.environ.get("POSE_PROFILE_STARTUP", "0") == "1"
+IMPORT_TIMES = {}
+
+
+class LazyModule(types.ModuleType):
+    """첫 속성 접근 때 실제로 import 하는 모듈 프록시 (np.array 처럼 평소대로 사용)."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        mod = self.__dict__["_lazy_module"]
+        if mod is None:
+            t0 = time.perf_counter()
+            mod = importlib.import_module(self.__name__)
+            IMPORT_TIMES[self.__name__] = time.perf_counter() - t0
+            # 이후 속성 조회는 __getattr__ 를 거치지 않도록 모듈 dict 를 복사
+            self.__dict__.update(mod.__dict__)
+            self.__dict__["_lazy_module"] = mod
+            if PROFILE_STARTUP:
+                print(f"[startup] lazy import {self.__name__}: {IMPORT_TIMES[self.__name__] * 1000:.1f}ms")
+        return mod
+
+    @property
+    def loaded(self):
+        return self.__dict__["_lazy_module"] is not None
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def startup_report():
+    """import 시간 요약 (무거운 순)"""
+    lines = [f"[startup] import_data: {IMPORT_TIMES.get('import_data', 0) * 1000:.1f}ms"]
+    for name, sec in sorted(IMPORT_TIMES.items(), key=lambda kv: -kv[1]):
+        if name != "import_data":
+            lines.append(f"[startup]   {name:<12} {sec * 1000:8.1f}ms")
+    lazy = [m.__name__ for m in (cv2, mp, Image, np, pd) if not m.loaded]
+    lines.append(f"[startup] not loaded yet: {', '.join(lazy) or '-'}")
+    return "\n".join(lines)
+
+
+# -------------------------
+# 웹 서버 (FastAPI)
+# -------------------------
+_t = time.perf_counter()
+from fastapi import FastAPI, Request, Form  # Form을 사용하기 위해 python-multipart 필요
+from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.staticfiles import StaticFiles
+from fastapi.templating import Jinja2Templates
+IMPORT_TIMES["fastapi"] = time.perf_counter() - _t
+
+# -------------------------
+# 영상 및 이미지 처리 (지연 로드)
+# -------------------------
+cv2 = LazyModule("cv2")
+mp = LazyModule("mediapipe")
+Image = LazyModule("PIL.Image")
+
+# -------------------------
+# 데이터 처리 (지연 로드)
+# -------------------------
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+IMPORT_TIMES["import_data"] = time.perf_counter() - _T0
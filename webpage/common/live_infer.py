@@ -0,0 +1,261 @@
+import asyncio
+import itertools
+import threading
+
+from common.import_data import cv2, np, os, time
+from common.pose_score import person_to_array, score_frames
+from pose_tracking import PoseTracker
+
+# -------------------------
+# 실시간 서버 추론 (/ws/live)
+# - 연결(세션)마다 "대기 프레임" 자리가 1개: 새 프레임이 오면 아직 추론 안 된 이전 프레임은 버림 (dropped)
+#   -> 세션당 추론 중 1장 + 대기 1장까지만 쌓이므로 지연이 늘어나지 않음
+# - 워커 스레드 1개가 tick 마다 여러 세션의 대기 프레임을 모아 backend.infer_batch 1번 호출 (마이크로 배치)
+#   첫 프레임이 들어온 뒤 LIVE_TICK_MS 동안 더 모으거나, LIVE_MAX_BATCH 장이 차면 바로 실행
+# - LIVE_MAX_AGE_MS 보다 오래 기다린 프레임은 추론하지 않고 stale 로 버림 (과부하 시 tail latency 제한)
+# - 같은 tick 의 채점도 score_frames 한 번으로 처리
+# - 연결마다 PoseTracker: LIVE_DETECT_EVERY 프레임마다 1번만 배치 추론에 넣고 사이 프레임은 광류 추적
+#   (사람별 고정 id + 스무딩 -> slot 이 바뀌지 않고 점수가 덜 흔들림)
+# -------------------------
+
+LIVE_BACKEND = os.environ.get("POSE_LIVE_BACKEND", "auto")   # auto | ultra | mediapipe
+LIVE_MAX_BATCH = int(os.environ.get("POSE_LIVE_MAX_BATCH", "8"))
+LIVE_TICK_MS = float(os.environ.get("POSE_LIVE_TICK_MS", "15"))
+LIVE_MAX_AGE_MS = float(os.environ.get("POSE_LIVE_MAX_AGE_MS", "250"))
+LIVE_MIN_CONF = float(os.environ.get("POSE_LIVE_MIN_CONF", "0.3"))
+LIVE_MAX_FRAME_BYTES = int(os.environ.get("POSE_LIVE_MAX_FRAME_KB", "512")) * 1024
+LIVE_DETECT_EVERY = int(os.environ.get("POSE_LIVE_DETECT_EVERY", "2"))
+LIVE_TRACK_FILTER = os.environ.get("POSE_LIVE_TRACK_FILTER", "one_euro")
+
+
+def people_payload(kps):
+    """(n, 17, 3) -> COCO 순서 [[x, y, score] x 17] 목록 (/score 의 live 형식과 같음)"""
+    return [[[round(float(x), 1), round(float(y), 1), round(float(s), 3)] for x, y, s in p] for p in kps]
+
+
+def _resolve(fut, msg):
+    # 연결이 끊겨 취소된 future 는 무시
+    if not fut.done():
+        fut.set_result(msg)
+
+
+class LiveJob:
+    __slots__ = ("conn", "seq", "data", "target", "mode", "fut", "loop", "t_submit")
+
+    def __init__(self, conn, seq, data, target, mode, fut, loop):
+        self.conn = conn
+        self.seq = seq
+        self.data = data       # JPEG/PNG 바이트
+        self.target = target   # (m, 17, 3) 타겟 키포인트 또는 None (채점 안 함)
+        self.mode = mode
+        self.fut = fut
+        self.loop = loop
+        self.t_submit = time.perf_counter()
+
+    def reply(self, msg):
+        self.loop.call_soon_threadsafe(_resolve, self.fut, msg)
+
+
+class LiveBatcher:
+    """연결별 최신 프레임 1장만 보관 -> tick 마다 모아서 배치 추론 (스레드 안전)."""
+
+    def __init__(self, backend=LIVE_BACKEND, max_batch=LIVE_MAX_BATCH, tick_ms=LIVE_TICK_MS,
+                 max_age_ms=LIVE_MAX_AGE_MS, min_conf=LIVE_MIN_CONF, detect_every=LIVE_DETECT_EVERY,
+                 track_filter=LIVE_TRACK_FILTER):
+        self.backend_name = backend
+        self.detect_every = max(1, detect_every)
+        self.track_filter = track_filter
+        self.max_batch = max(1, max_batch)
+        self.tick_s = max(0.0, tick_ms) / 1000
+        self.max_age_s = max_age_ms / 1000
+        self.min_conf = min_conf
+        self.stats = {"frames": 0, "inferred": 0, "tracked": 0, "dropped": 0, "stale": 0, "batches": 0,
+                      "infer_ms": 0.0}
+        self._pending = {}   # conn -> LiveJob (추론 대기 중인 최신 프레임)
+        self._trackers = {}  # conn -> PoseTracker (열린 연결만, 워커 스레드에서만 갱신)
+        self._conns = set()
+        self._conn_ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop = False
+        self._backend_obj = None
+        self._backend_error = None
+
+    def new_conn(self):
+        conn = next(self._conn_ids)
+        with self._cond:
+            self._conns.add(conn)
+        return conn
+
+    # ---- 백엔드 (모델은 pose_models.POOL 공유, 워커 스레드에서만 사용) ----
+    def _backend(self):
+        if self._backend_obj is None and self._backend_error is None:
+            try:
+                import make_pose_keypoints as mpk
+                name = self.backend_name
+                if name not in mpk.BACKENDS:
+                    name = "ultra" if mpk.has_ultra() else "mediapipe"
+                self._backend_obj = mpk.BACKENDS[name]()
+            except Exception as e:
+                self._backend_error = str(e)
+                print(f"[live] server inference disabled: {e}")
+        return self._backend_obj
+
+    # ---- 요청 쪽 (이벤트 루프) ----
+    def submit(self, conn, seq, data, target=None, mode="greedy"):
+        """프레임 등록 -> asyncio.Future (결과 dict). 같은 연결의 대기 프레임은 dropped 로 응답."""
+        loop = asyncio.get_running_loop()
+        job = LiveJob(conn, seq, data, target, mode, loop.create_future(), loop)
+        with self._cond:
+            self.stats["frames"] += 1
+            old = self._pending.pop(conn, None)
+            self._pending[conn] = job   # 맨 뒤로 (먼저 온 연결부터 처리)
+            if old is not None:
+                self.stats["dropped"] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="live-infer", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        if old is not None:
+            _resolve(old.fut, {"type": "dropped", "seq": old.seq, "reason": "superseded"})
+        return job.fut
+
+    def cancel(self, conn):
+        """연결 종료: 대기 프레임 제거"""
+        with self._cond:
+            job = self._pending.pop(conn, None)
+            self._trackers.pop(conn, None)
+            self._conns.discard(conn)
+        if job is not None:
+            job.fut.cancel()
+
+    # ---- 워커 스레드 ----
+    def _take(self):
+        """대기 프레임에서 배치 1개를 꺼냄 (종료 시 None)"""
+        with self._cond:
+            while not self._pending and not self._stop:
+                self._cond.wait()
+            if self._stop:
+                return None
+            # 마이크로 배치: 다른 연결의 프레임을 tick 동안 더 기다림
+            deadline = time.perf_counter() + self.tick_s
+            while len(self._pending) < self.max_batch and not self._stop:
+                left = deadline - time.perf_counter()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+            jobs = list(itertools.islice(self._pending.values(), self.max_batch))
+            for job in jobs:
+                del self._pending[job.conn]
+            return jobs
+
+    def _loop(self):
+        while True:
+            jobs = self._take()
+            if jobs is None:
+                return
+            try:
+                self._run(jobs)
+            except Exception as e:
+                print(f"[live] batch failed: {e}")
+                for job in jobs:
+                    job.reply({"type": "error", "seq": job.seq, "message": str(e)})
+
+    def _run(self, jobs):
+        now = time.perf_counter()
+        fresh = []
+        for job in jobs:
+            if now - job.t_submit > self.max_age_s:
+                job.reply({"type": "dropped", "seq": job.seq, "reason": "stale"})
+            else:
+                fresh.append(job)
+        with self._cond:
+            self.stats["stale"] += len(jobs) - len(fresh)
+        if not fresh:
+            return
+
+        backend = self._backend()
+        if backend is None:
+            for job in fresh:
+                job.reply({"type": "error", "seq": job.seq, "message": f"server inference unavailable: {self._backend_error}"})
+            return
+
+        imgs, ok = [], []
+        for job in fresh:
+            img = cv2.imdecode(np.frombuffer(job.data, np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                job.reply({"type": "error", "seq": job.seq, "message": "cannot decode frame"})
+                continue
+            imgs.append(img)
+            ok.append(job)
+        if not ok:
+            return
+
+        # 검출 주기가 된 연결의 프레임만 배치 추론, 나머지는 추적만
+        trackers = []
+        with self._cond:
+            for job in ok:
+                tr = self._trackers.get(job.conn)
+                if tr is None:
+                    tr = PoseTracker(self.detect_every, self.track_filter)
+                    if job.conn in self._conns:   # 처리 중에 닫힌 연결은 등록하지 않음
+                        self._trackers[job.conn] = tr
+                trackers.append(tr)
+        det = [tr.needs_detection() for tr in trackers]
+        t0 = time.perf_counter()
+        results = iter(backend.infer_batch([img for img, d in zip(imgs, det) if d], min_conf=self.min_conf)
+                       if any(det) else [])
+        infer_ms = (time.perf_counter() - t0) * 1000
+        lives, ids = [], []
+        for job, img, tr, d in zip(ok, imgs, trackers, det):
+            people = next(results) if d else None
+            out = tr.update(job.t_submit, None if people is None else [person_to_array(p) for p in people], img,
+                            scores=None if people is None else [p.get("score", 0.0) for p in people])
+            lives.append(np.stack([k for _, k, _ in out]).astype(np.float32) if out else np.zeros((0, 17, 3), np.float32))
+            ids.append([tid for tid, _, _ in out])
+
+        # 채점: 타겟이 있는 프레임만 mode 별로 한 번에
+        scores = [None] * len(ok)
+        for mode in {job.mode for job in ok if job.target is not None}:
+            idx = [i for i, job in enumerate(ok) if job.target is not None and job.mode == mode]
+            for i, s in zip(idx, score_frames([lives[i] for i in idx], [ok[i].target for i in idx], mode=mode)):
+                scores[i] = float(s)
+
+        with self._cond:
+            self.stats["inferred"] += sum(det)
+            self.stats["tracked"] += len(ok) - sum(det)
+            self.stats["batches"] += any(det)
+            self.stats["infer_ms"] += infer_ms
+        done = time.perf_counter()
+        for job, img, kps, tids, d, s in zip(ok, imgs, lives, ids, det, scores):
+            job.reply({
+                "type": "pose",
+                "seq": job.seq,
+                "size": [int(img.shape[1]), int(img.shape[0])],
+                "people": people_payload(kps),
+                "ids": tids,          # 사람별 고정 id (people 과 같은 순서)
+                "detected": d,        # False = 광류 추적 프레임
+                "score": None if s is None else round(s, 6),
+                # JS Math.round(sim * 100) 와 같은 반올림
+                "percent": None if s is None else int(np.floor(s * 100 + 0.5)),
+                "batch": sum(det),
+                "queue_ms": round((t0 - job.t_submit) * 1000, 1),
+                "latency_ms": round((done - job.t_submit) * 1000, 1),
+            })
+
+    def info(self):
+        with self._cond:
+            stats = dict(self.stats, pending=len(self._pending))
+        stats["infer_ms"] = round(stats["infer_ms"], 1)
+        stats["avg_batch"] = round(stats["inferred"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return dict(stats, backend=self.backend_name, max_batch=self.max_batch, tick_ms=self.tick_s * 1000,
+                    detect_every=self.detect_every,
+                    max_age_ms=self.max_age_s * 1000, available=self._backend_error is None)
+
+    def shutdown(self):
+        with self._cond:
+            self._stop = True
+            pending, self._pending = list(self._pending.values()), {}
+            self._cond.notify_all()
+        for job in pending:
+            job.reply({"type": "dropped", "seq": job.seq, "reason": "shutdown"})
@@ -0,0 +1,233 @@
+from itertools import permutations
+
+from common.import_data import np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+    _HAS_SCIPY = True
+except Exception:
+    _HAS_SCIPY = False
+
+# -------------------------
+# 포즈 유사도 (play_utils.js 와 같은 계산을 NumPy 로 벡터화)
+# - normalize_poses : (N, 17, 3) -> (N, 30) 엉덩이 중심 / 몸통 길이 정규화
+# - similarity      : 코사인 -> (cos + 1) / 2 (0~1)
+# - multi_similarity: 다인 매칭 (greedy = JS computeMultiSimilarity / optimal = 최적 배정)
+# - score_frames    : 여러 프레임을 한 번에 채점 (/score)
+# -------------------------
+
+# COCO 17 keypoints (YOLO pose / MoveNet order)
+COCO_NAMES = [
+    "nose", "left_eye", "right_eye", "left_ear", "right_ear",
+    "left_shoulder", "right_shoulder", "left_elbow", "right_elbow",
+    "left_wrist", "right_wrist", "left_hip", "right_hip",
+    "left_knee", "right_knee", "left_ankle", "right_ankle"
+]
+NAME_TO_IDX = {n: i for i, n in enumerate(COCO_NAMES)}
+
+# play_utils.js normalizeKeypoints 와 같은 순서 (귀 제외 15개 -> 30차원 벡터)
+NORM_ORDER = [
+    "nose", "left_eye", "right_eye", "left_shoulder", "right_shoulder", "left_elbow", "right_elbow",
+    "left_wrist", "right_wrist", "left_hip", "right_hip", "left_knee", "right_knee", "left_ankle", "right_ankle"
+]
+NORM_IDX = np.array([NAME_TO_IDX[n] for n in NORM_ORDER], dtype=np.intp)
+VEC_DIM = len(NORM_IDX) * 2
+
+L_SH, R_SH, L_HIP, R_HIP = (NAME_TO_IDX[n] for n in ("left_shoulder", "right_shoulder", "left_hip", "right_hip"))
+
+
+def keypoints_to_array(keypoints, scale_w=1.0, scale_h=1.0):
+    """[{name, x, y, score}] -> (17, 3) float32. 없는 관절은 score=0."""
+    arr = np.zeros((len(COCO_NAMES), 3), dtype=np.float32)
+    for kp in keypoints or []:
+        i = NAME_TO_IDX.get(kp.get("name"))
+        if i is None:
+            continue
+        arr[i, 0] = float(kp["x"]) * scale_w
+        arr[i, 1] = float(kp["y"]) * scale_h
+        arr[i, 2] = float(kp.get("score", 1.0))
+    return arr
+
+
+def person_to_array(p):
+    """make_pose_keypoints 백엔드 person -> (17, 3) float32 px. YOLO 는 kps_px 배열을 그대로 사용 (없는 관절은 0)"""
+    if "kps_px" not in p:
+        return keypoints_to_array(p["keypoints_px"])
+    arr = np.zeros((len(COCO_NAMES), 3), dtype=np.float32)
+    kps = p["kps_px"][:len(COCO_NAMES)]
+    arr[:len(kps)] = kps
+    arr[arr[:, 2] <= 0] = 0
+    return arr
+
+
+def normalize_poses(kps):
+    """
+    (N, 17, 3) -> (N, 30) float64 정규화 벡터 + (N,) valid
+    (play_utils.js normalizeKeypoints 와 동일: 어깨·엉덩이 4점이 없으면 invalid, 없는 관절은 0)
+    """
+    kps = np.asarray(kps, dtype=np.float64).reshape(-1, len(COCO_NAMES), 3)
+    sel = kps[:, NORM_IDX]                       # (N, 15, 3)
+    present = sel[..., 2] > 0
+    valid = (kps[:, [L_SH, R_SH, L_HIP, R_HIP], 2] > 0).all(axis=1)
+
+    center = (kps[:, L_HIP, :2] + kps[:, R_HIP, :2]) * 0.5
+    d = (kps[:, L_SH, :2] + kps[:, R_SH, :2]) * 0.5 - center
+    torso = np.sqrt(d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1])
+    torso[torso == 0] = 1.0
+
+    # 없는 관절 / invalid 포즈는 0 (곱셈 마스크가 불리언 인덱싱보다 빠름)
+    keep = (present & valid[:, None])[..., None]
+    vec = (sel[..., :2] - center[:, None, :]) * (keep / torso[:, None, None])
+    return vec.reshape(len(kps), VEC_DIM), valid
+
+
+def _cos_to_score(dot, na, nb):
+    denom = np.sqrt(na) * np.sqrt(nb)
+    denom = np.where(denom == 0, 1e-6, denom)
+    return (np.clip(dot / denom, -1.0, 1.0) + 1.0) / 2.0
+
+
+def similarity(a, b):
+    """행 단위 유사도: (N, 30), (N, 30) -> (N,)  (JS computeSimilarity)"""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    return _cos_to_score(np.einsum("ij,ij->i", a, b), np.einsum("ij,ij->i", a, a), np.einsum("ij,ij->i", b, b))
+
+
+def similarity_matrix(a, b):
+    """모든 쌍 유사도: (N, 30), (M, 30) -> (N, M)"""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    return _cos_to_score(a @ b.T, np.einsum("ij,ij->i", a, a)[:, None], np.einsum("ij,ij->i", b, b)[None, :])
+
+
+def greedy_assign(sim, valid_a, valid_b):
+    """
+    JS computeMultiSimilarity 순서 그대로의 탐욕적 매칭을 프레임 축으로 벡터화.
+    sim (F, n, m), valid_a (F, n), valid_b (F, m)
+    -> assign (F, n) : A 의 i 와 짝지어진 B 번호 (-1 = 없음)
+    A 의 i 순서대로 남은 B 중 최고값(동점이면 앞 번호 = argmax), invalid 포즈는 건너뜀.
+    """
+    sim = np.asarray(sim, dtype=np.float64)
+    n_frames, n, m = sim.shape
+    avail = np.array(valid_b, dtype=bool, copy=True)
+    assign = np.full((n_frames, n), -1, dtype=np.intp)
+    rows = np.arange(n_frames)
+    for i in range(n):
+        cand = np.where(avail, sim[:, i, :], -np.inf)
+        j = np.argmax(cand, axis=1) if m else np.zeros(n_frames, np.intp)
+        ok = np.asarray(valid_a, dtype=bool)[:, i] & (avail.any(axis=1) if m else False)
+        assign[ok, i] = j[ok]
+        avail[rows[ok], j[ok]] = False
+    return assign
+
+
+# 전수 탐색할 최대 인원 (6! = 720 순열). 넘으면 scipy(있으면) 또는 greedy
+PERM_MAX = 6
+_PERMS = {}
+
+
+def _perms(s):
+    if s not in _PERMS:
+        _PERMS[s] = np.array(list(permutations(range(s))), dtype=np.intp).reshape(-1, s)
+    return _PERMS[s]
+
+
+def optimal_assign(sim, valid_a, valid_b):
+    """
+    유사도 합이 최대인 1:1 배정 (순서 무관). greedy_assign 과 같은 입출력.
+    인원이 적으므로(<= PERM_MAX) 정사각 패딩 후 모든 순열을 프레임 축으로 한 번에 평가한다.
+    짝 수는 min(valid A, valid B) 로 최대화 (동점이면 짝이 많은 쪽).
+    """
+    sim = np.asarray(sim, dtype=np.float64)
+    n_frames, n, m = sim.shape
+    if n == 0 or m == 0:
+        return np.full((n_frames, n), -1, dtype=np.intp)
+    s = max(n, m)
+    pair_ok = np.asarray(valid_a, dtype=bool)[:, :, None] & np.asarray(valid_b, dtype=bool)[:, None, :]
+    # 실제 쌍마다 아주 작은 보너스 -> 유사도 0 인 쌍도 버리지 않음
+    gain = np.zeros((n_frames, s, s), dtype=np.float64)
+    gain[:, :n, :m] = np.where(pair_ok, sim + 1e-9, 0.0)
+
+    if s <= PERM_MAX:
+        perms = _perms(s)                                   # (K, s)
+        total = gain[:, np.arange(s), perms].sum(axis=2)    # (F, K)
+        best = perms[np.argmax(total, axis=1)]              # (F, s)
+    elif _HAS_SCIPY:
+        best = np.stack([linear_sum_assignment(-g)[1] for g in gain])
+    else:
+        return greedy_assign(sim, valid_a, valid_b)
+
+    assign = best[:, :n].copy()
+    assign[assign >= m] = -1
+    rows = np.arange(n_frames)[:, None]
+    assign[~pair_ok[rows, np.arange(n), np.where(assign >= 0, assign, 0)]] = -1
+    return assign
+
+
+ASSIGNERS = {
+    "greedy": greedy_assign,
+    "optimal": optimal_assign,
+}
+
+
+def assigned_mean(sim, assign):
+    """짝지어진 쌍의 평균 유사도 (F,) - 짝이 하나도 없으면 0"""
+    n_frames, n, _ = sim.shape
+    matched = assign >= 0
+    vals = np.take_along_axis(sim, np.where(matched, assign, 0)[..., None], axis=2)[..., 0]
+    cnt = matched.sum(axis=1)
+    return np.where(cnt > 0, (vals * matched).sum(axis=1) / np.maximum(cnt, 1), 0.0)
+
+
+def multi_similarity(vecs_a, valid_a, vecs_b, valid_b, mode="greedy"):
+    """한 프레임 다인 유사도 (0~1). invalid 포즈는 JS 처럼 제외."""
+    sim = similarity_matrix(vecs_a, vecs_b)[None]
+    assign = ASSIGNERS[mode](sim, np.asarray(valid_a)[None], np.asarray(valid_b)[None])
+    return float(assigned_mean(sim, assign)[0])
+
+
+def score_frames(live, targets, mode="greedy"):
+    """
+    live    : 프레임별 사람 키포인트 배열 목록 [(n_i, 17, 3)]
+    targets : 프레임별 타겟 배열 목록 [(m_i, 17, 3)]
+    mode    : "greedy"(JS 와 동일) / "optimal"(최적 배정)
+    -> (F,) 유사도 (0~1)
+
+    정규화는 전체 프레임을 이어 붙여 한 번에 계산하고,
+    (사람 수 A, B) 가 같은 프레임끼리 묶어 유사도 행렬·매칭을 한 번에 처리한다.
+    """
+    n_frames = len(live)
+    if n_frames != len(targets):
+        raise ValueError("live / targets length mismatch")
+    if not n_frames:
+        return np.zeros(0, dtype=np.float64)
+
+    def stack(seq):
+        flat = [np.asarray(x, dtype=np.float64).reshape(-1, len(COCO_NAMES), 3) for x in seq]
+        counts = np.array([len(x) for x in flat], dtype=np.intp)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.intp)
+        kps = np.concatenate(flat) if offsets[-1] else np.zeros((0, len(COCO_NAMES), 3))
+        vecs, valid = normalize_poses(kps)
+        return counts, offsets, vecs, valid
+
+    assigner = ASSIGNERS[mode]
+    ca, oa, va, ma = stack(live)
+    cb, ob, vb, mb = stack(targets)
+    scores = np.zeros(n_frames, dtype=np.float64)
+
+    shapes = np.stack([ca, cb], axis=1)
+    for n, m in np.unique(shapes, axis=0):
+        if n == 0 or m == 0:
+            continue
+        g = np.nonzero((ca == n) & (cb == m))[0]
+        ia = oa[g][:, None] + np.arange(n)   # (G, n) -> va 행 번호
+        ib = ob[g][:, None] + np.arange(m)
+        A, B = va[ia], vb[ib]                # (G, n, 30), (G, m, 30)
+        sim = _cos_to_score(
+            np.einsum("gik,gjk->gij", A, B),
+            np.einsum("gik,gik->gi", A, A)[:, :, None],
+            np.einsum("gjk,gjk->gj", B, B)[:, None, :],
+        )
+        scores[g] = assigned_mean(sim, assigner(sim, ma[ia], mb[ib]))
+    return scores
@@ -0,0 +1,256 @@
+import threading
+
+from common.import_data import np, os, time
+from common.pose_score import NORM_ORDER, VEC_DIM, normalize_poses
+
+# -------------------------
+# 타겟 포즈 근접 검색 (matching 라이브러리)
+# - TargetIndex 의 정규화 벡터(.json / .multi.json / poses.npy)를 인원 폴더(players)별 float32 행렬로 보관
+#   (키가 "그룹/N.jpg" 자연 정렬이므로 그룹 = TargetIndex 배열의 연속 구간 -> 슬라이스 + 노름 계산만)
+# - 유사도는 pose_score.similarity 와 같은 (cos + 1) / 2, 관절별 가중치는 가중 코사인
+#     cos_w = sum(w a b) / sqrt(sum(w a^2)) / sqrt(sum(w b^2))   (a 는 단위 벡터로 바꿔도 값이 같음)
+# - 이미지 점수 = 질의 사람별로 이미지 안 최고 유사도 -> 평균 (단체 사진은 사람별로 가장 닮은 타겟)
+# - 포즈가 SEARCH_IVF_MIN 개 이상인 그룹은 IVF (구면 k-means 로 ~2*sqrt(R) 개 클러스터, 질의와 가까운
+#   SEARCH_NPROBE 개 클러스터만 계산) -> 10만 포즈에서도 수천 행만 계산. 작은 그룹은 전체 계산(정확)
+# - nearest: 상위 k (argpartition), diverse: 최원점 샘플링(이미 고른 것과 가장 덜 닮은 이미지부터)
+# - TargetIndex.version 이 바뀌면 그룹별 서명을 비교해 바뀐 그룹만 다시 만듦
+#   sync 는 시작 시 / 카탈로그 감시 스레드(refresh 직후)에서만 -> 요청 처리(이벤트 루프)는 만들어 둔 그룹만 읽음
+# -------------------------
+
+SEARCH_IVF_MIN = int(os.environ.get("POSE_SEARCH_IVF_MIN", "16384"))
+SEARCH_NPROBE = int(os.environ.get("POSE_SEARCH_NPROBE", "16"))
+SEARCH_KMEANS_ITERS = 8
+
+JOINT_WEIGHT_NAMES = list(NORM_ORDER)
+
+
+def weight_vector(weights):
+    """{관절 이름: 가중치} -> (30,) float32 (없는 관절은 1). 모르는 이름 / 음수는 ValueError"""
+    w = np.ones(len(NORM_ORDER), dtype=np.float32)
+    for name, v in (weights or {}).items():
+        if name not in JOINT_WEIGHT_NAMES:
+            raise ValueError(f"unknown joint: {name}")
+        if float(v) < 0:
+            raise ValueError(f"negative weight: {name}")
+        w[JOINT_WEIGHT_NAMES.index(name)] = float(v)
+    return np.repeat(w, 2)
+
+
+def _unit_rows(x):
+    n = np.linalg.norm(x, axis=1)
+    return x / np.maximum(n, 1e-6)[:, None], n
+
+
+def spherical_kmeans(unit, n_clusters, iters=SEARCH_KMEANS_ITERS, seed=0):
+    """단위 벡터 (R, D) -> (centroids (C, D), 행별 클러스터 (R,))"""
+    rng = np.random.default_rng(seed)
+    sample = unit[rng.choice(len(unit), min(len(unit), n_clusters * 64), replace=False)]
+    cent = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(sample @ cent.T, axis=1)
+        sums = np.zeros_like(cent)
+        np.add.at(sums, assign, sample)
+        empty = ~sums.any(axis=1)
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]   # 빈 클러스터는 새 점으로
+        cent = _unit_rows(sums)[0].astype(np.float32)
+    # 전체 행 배정은 나눠서 (R x C 행렬을 한 번에 만들지 않게)
+    assign = np.concatenate([np.argmax(unit[i:i + 8192] @ cent.T, axis=1) for i in range(0, len(unit), 8192)])
+    return cent, assign
+
+
+class _Group:
+    """인원 폴더 1개의 검색 행렬."""
+
+    def __init__(self, keys, starts, vecs, valid):
+        self.keys = keys                                     # 이미지 키 (G,)
+        self.lookup = {k: i for i, k in enumerate(keys)}
+        counts = np.diff(np.append(starts, len(vecs)))
+        self.starts = starts                                 # (G,) 이미지별 첫 행 (reduceat)
+        self.single = bool((counts == 1).all())              # 1행 = 1이미지 (집계 생략)
+        self.owner = np.repeat(np.arange(len(keys)), counts)
+        unit, norm = _unit_rows(np.asarray(vecs, dtype=np.float32))
+        self.valid = valid & (norm > 0)
+        self.unit = np.where(self.valid[:, None], unit, 0.0).astype(np.float32)   # (R, 30)
+        self.sq = self.unit * self.unit                      # (R, 30) 가중 노름용
+        self.bias = np.where(self.valid, 0.0, -np.inf).astype(np.float32)   # invalid 행은 -inf
+
+        # 다양성 샘플링용 이미지 서술자: 사람(slot) 순서대로 단위 벡터를 이어 붙임 (최대 인원까지 0 패딩)
+        width = int(counts.max()) if len(counts) else 1
+        desc = np.zeros((len(keys), width, VEC_DIM), np.float32)
+        desc[self.owner, np.arange(len(unit)) - np.repeat(starts, counts)] = self.unit
+        self.desc, n = _unit_rows(desc.reshape(len(keys), -1))
+        self.has_valid = n > 0                               # 유효한 사람이 하나도 없는 이미지는 제외
+
+        # IVF: 클러스터 순서로 정렬한 행 번호 + 클러스터별 구간
+        self.centroids = None
+        if self.valid.sum() >= SEARCH_IVF_MIN:
+            rows = np.flatnonzero(self.valid)
+            n_clusters = max(1, int(2 * np.sqrt(len(rows))))
+            self.centroids, assign = spherical_kmeans(self.unit[rows], n_clusters)
+            order = np.argsort(assign, kind="stable")
+            self.ivf_rows = rows[order]
+            self.ivf_offsets = np.searchsorted(assign[order], np.arange(n_clusters + 1))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _probe(self, qu, nprobe):
+        """질의 단위 벡터 (n, 30) -> 가까운 클러스터들의 행 번호 (정렬됨)"""
+        c = self.centroids @ qu.T                            # (C, n)
+        nprobe = min(nprobe, len(self.centroids))
+        near = np.unique(np.argpartition(-c, nprobe - 1, axis=0)[:nprobe].ravel())
+        return np.sort(np.concatenate([self.ivf_rows[self.ivf_offsets[i]:self.ivf_offsets[i + 1]] for i in near]))
+
+    def scores(self, q, w=None, nprobe=SEARCH_NPROBE):
+        """
+        q (n, 30) 질의 벡터 -> (이미지 번호 (M,) 또는 None = 전체, (M,) 유사도 0~1 / 후보가 아니면 -inf)
+        """
+        q = np.asarray(q, dtype=np.float32)
+        qw = q if w is None else q * np.sqrt(w)
+        qu = _unit_rows(qw)[0]
+        rows = None if self.centroids is None else self._probe(qu, nprobe)
+        unit = self.unit if rows is None else self.unit[rows]
+        if w is None:
+            # 단위 벡터끼리의 내적 = 코사인 (나눗셈 없음)
+            cos = unit @ qu.T
+        else:
+            na = np.sqrt((self.sq if rows is None else unit * unit) @ w)
+            cos = (unit @ (qu * np.sqrt(w)).T) / np.maximum(na, 1e-6)[:, None]
+        cos += (self.bias if rows is None else self.bias[rows])[:, None]
+        sim = (np.clip(cos, -1.0, 1.0) + 1.0) / 2.0          # (rows, n)
+
+        if rows is None:
+            ids = None
+            best = sim if self.single else np.maximum.reduceat(sim, self.starts, axis=0)
+        else:
+            owner = self.owner[rows]                         # rows 가 정렬돼 있으므로 이미지별로 연속
+            if self.single:
+                ids, best = owner, sim
+            else:
+                first = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+                ids, best = owner[first], np.maximum.reduceat(sim, first, axis=0)
+        out = best.mean(axis=1) if best.shape[1] > 1 else best[:, 0]
+        if ids is None:
+            out[~self.has_valid] = -np.inf
+        return ids, out
+
+
+class PoseSearchIndex:
+    """TargetIndex 위의 k-최근접 / 다양성 샘플링 검색 (스레드 안전, 읽기는 잠금 없음, 갱신은 sync 호출 시만)."""
+
+    def __init__(self, target_index, nprobe=SEARCH_NPROBE):
+        self.index = target_index
+        self.nprobe = max(1, nprobe)
+        self.groups = {}        # players -> _Group
+        self._sigs = {}         # players -> 그룹 서명 (키 + 파일 상태)
+        self._version = None
+        self._lock = threading.Lock()
+
+    # ---- 갱신 ----
+    def sync(self):
+        """TargetIndex 가 바뀌었으면 바뀐 그룹만 다시 만듦 -> 다시 만든 그룹 목록"""
+        snap = self.index.snapshot()   # keys / offsets / vecs 를 같은 시점에서
+        if self._version == snap.version:
+            return []
+        with self._lock:
+            if self._version == snap.version:
+                return []
+            t0 = time.perf_counter()
+            version, keys, offsets = snap.version, snap.keys, snap.offsets
+            spans = {}
+            for i, key in enumerate(keys):
+                g = key.split("/", 1)[0]
+                spans[g] = (spans[g][0], i + 1) if g in spans else (i, i + 1)
+            rebuilt = []
+            groups, sigs = {}, {}
+            for g, (a, b) in spans.items():
+                sig = hash(tuple((k, snap.found.get(k)) for k in keys[a:b]))
+                if self._sigs.get(g) == sig and g in self.groups:
+                    groups[g], sigs[g] = self.groups[g], sig
+                    continue
+                r0, r1 = int(offsets[a]), int(offsets[b])
+                groups[g] = _Group(keys[a:b], (offsets[a:b] - r0).astype(np.intp), snap.vecs[r0:r1], snap.valid[r0:r1])
+                sigs[g] = sig
+                rebuilt.append(g)
+            self.groups, self._sigs, self._version = groups, sigs, version
+        if rebuilt:
+            print(f"[pose_search] rebuilt groups {','.join(rebuilt)} ({sum(len(groups[g]) for g in rebuilt)} images, "
+                  f"{(time.perf_counter() - t0) * 1000:.1f}ms)")
+        return rebuilt
+
+    def group(self, players):
+        return self.groups.get(str(players))
+
+    @staticmethod
+    def query_vectors(kps):
+        """(n, 17, 3) px -> 유효한 사람의 (n', 30) 정규화 벡터"""
+        vecs, valid = normalize_poses(kps)
+        return vecs[valid].astype(np.float32)
+
+    def _scores(self, grp, q, weights, exclude):
+        """-> (후보 이미지 번호 (M,), 유사도 (M,)) - 제외 / 후보 아님(-inf) 은 뺀 상태"""
+        ids, s = grp.scores(q, None if not weights else weight_vector(weights), self.nprobe)
+        if ids is None:
+            ids = np.arange(len(grp))
+        keep = np.isfinite(s)
+        banned = [grp.lookup[key] for key in exclude if key in grp.lookup]
+        if banned:
+            keep &= ~np.isin(ids, banned)
+        return ids[keep], s[keep]
+
+    # ---- 검색 ----
+    def nearest(self, players, q, k=10, weights=None, exclude=()):
+        """-> [(key, score)] 유사도 높은 순 k 개. 그룹이 없으면 None"""
+        grp = self.group(players)
+        if grp is None:
+            return None
+        ids, s = self._scores(grp, q, weights, exclude)
+        k = min(int(k), len(s))
+        if k <= 0:
+            return []
+        top = np.argpartition(-s, k - 1)[:k]
+        top = top[np.argsort(-s[top], kind="stable")]
+        return [(grp.keys[ids[i]], float(s[i])) for i in top]
+
+    def diverse(self, players, k=10, q=None, weights=None, pool=500, exclude=(), seed=None):
+        """
+        서로 덜 닮은 k 개 -> [(key, 질의 유사도 또는 None)]
+        q 가 있으면 가까운 pool 개 안에서 (가장 가까운 것부터 시작), 없으면 무작위 pool 개 안에서
+        """
+        grp = self.group(players)
+        if grp is None:
+            return None
+        rng = np.random.default_rng(seed)
+        pool = max(1, int(pool))
+        if q is not None and len(q):
+            cand, s = self._scores(grp, q, weights, exclude)
+            if len(cand) > pool:
+                top = np.argpartition(-s, pool - 1)[:pool]
+                cand, s = cand[top], s[top]
+        else:
+            cand, s = np.flatnonzero(grp.has_valid), None
+            banned = [grp.lookup[key] for key in exclude if key in grp.lookup]
+            if banned:
+                cand = cand[~np.isin(cand, banned)]
+            if len(cand) > pool:
+                cand = rng.choice(cand, pool, replace=False)
+        k = min(int(k), len(cand))
+        if k <= 0:
+            return []
+        desc = grp.desc[cand]
+        first = int(np.argmax(s)) if s is not None else int(rng.integers(len(cand)))
+        chosen = [first]
+        closest = desc @ desc[first]           # 고른 것들과의 최대 코사인
+        closest[first] = np.inf
+        for _ in range(k - 1):
+            # 동점(같은 포즈 여러 장)은 무작위로
+            j = int(rng.choice(np.flatnonzero(closest == closest.min())))
+            chosen.append(j)
+            np.maximum(closest, desc @ desc[j], out=closest)
+            closest[j] = np.inf
+        return [(grp.keys[cand[j]], None if s is None else float(s[j])) for j in chosen]
+
+    def info(self):
+        return {g: {"images": len(grp), "poses": int(grp.valid.sum()),
+                    "clusters": 0 if grp.centroids is None else len(grp.centroids)}
+                for g, grp in sorted(self.groups.items())}
@@ -0,0 +1,260 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common.import_data import cv2, np, os
+from common.common import IMG_RESULT_CAP_DIR, IMG_RESULT_CAP_SK_DIR, IMG_RESULT_MAT_DIR, IMG_RESULT_MAT_SK_DIR
+from common.pose_score import NAME_TO_IDX, person_to_array
+
+# -------------------------
+# 결과 화면용 스켈레톤 오버레이 + 썸네일 캐시
+# - capture/{date}/{folder}/{name} -> capture_skeleton/{ab}/{hash}.jpg
+#   matching/{players}/{name}      -> matching_skeleton/{ab}/{hash}.jpg
+# - 파일 이름 = sha1(원본 경로·크기·mtime + 긴 변 + 스켈레톤 여부 + 키포인트 + RENDER_VERSION)
+#   -> 입력이 같으면 같은 이름, 원본/키포인트가 바뀌면 새 이름 (이름을 그대로 ETag 로 사용)
+# - 스켈레톤: 타겟은 TargetIndex 키포인트, 캡처는 서버에서 포즈 추론 (ultralytics 가 없으면 썸네일만)
+# - 폴더별 총 용량이 RENDER_CACHE_MB 를 넘으면 오래 안 쓴 파일부터 삭제 (CappedDir, 캐시 적중 시 mtime 갱신 = LRU)
+# - 요청 시 생성 + /result_redirect 에서 백그라운드로 미리 생성
+# -------------------------
+
+RENDER_VERSION = 1
+RENDER_CACHE_MB = int(os.environ.get("POSE_RENDER_CACHE_MB", "256"))
+RENDER_QUALITY = int(os.environ.get("POSE_RENDER_QUALITY", "82"))
+RENDER_MIN_CONF = float(os.environ.get("POSE_RENDER_MIN_CONF", "0.3"))
+RENDER_MAX_AGE = int(os.environ.get("POSE_RENDER_MAX_AGE", "86400"))
+# 긴 변 크기 (요청 값은 이 중 하나로 올림 -> 임의 크기 요청으로 캐시가 불어나지 않게)
+RENDER_SIZES = (160, 320, 480, 640, 960, 1280)
+RENDER_DEFAULT_SIZE = 640
+
+RENDER_KINDS = {
+    "capture": (IMG_RESULT_CAP_DIR, IMG_RESULT_CAP_SK_DIR),
+    "matching": (IMG_RESULT_MAT_DIR, IMG_RESULT_MAT_SK_DIR),
+}
+
+# play_utils.js JOINT_PAIRS / drawMultiSkeleton 색상 (BGR)
+JOINT_PAIRS = [(NAME_TO_IDX[a], NAME_TO_IDX[b]) for a, b in [
+    ("left_shoulder", "right_shoulder"), ("left_shoulder", "left_elbow"), ("left_elbow", "left_wrist"),
+    ("right_shoulder", "right_elbow"), ("right_elbow", "right_wrist"), ("left_shoulder", "left_hip"),
+    ("right_shoulder", "right_hip"), ("left_hip", "right_hip"), ("left_hip", "left_knee"),
+    ("left_knee", "left_ankle"), ("right_hip", "right_knee"), ("right_knee", "right_ankle"),
+]]
+SLOT_COLORS = [(94, 197, 34), (246, 130, 59), (182, 114, 244), (21, 204, 250)]
+
+
+def snap_size(size):
+    size = int(size or RENDER_DEFAULT_SIZE)
+    for s in RENDER_SIZES:
+        if size <= s:
+            return s
+    return RENDER_SIZES[-1]
+
+
+def draw_skeletons(img, kps, scale):
+    """img 위에 (N, 17, 3) px 키포인트 * scale 을 사람(slot)별 색으로 그림"""
+    thick = max(2, int(round(max(img.shape[:2]) / 320)))
+    for i, kp in enumerate(kps):
+        color = SLOT_COLORS[i % len(SLOT_COLORS)]
+        pts = np.round(kp[:, :2] * scale).astype(np.int32)
+        ok = kp[:, 2] > 0
+        for a, b in JOINT_PAIRS:
+            if ok[a] and ok[b]:
+                cv2.line(img, tuple(int(v) for v in pts[a]), tuple(int(v) for v in pts[b]), color, thick, cv2.LINE_AA)
+        for j in np.flatnonzero(ok):
+            cv2.circle(img, tuple(int(v) for v in pts[j]), thick + 1, color, -1, cv2.LINE_AA)
+    return img
+
+
+class CappedDir:
+    """
+    폴더 하나의 용량 제한 (suffix 파일만 셈, 스레드 안전).
+    총 용량이 max_bytes 를 넘으면 오래 안 쓴(mtime) 파일부터 90% 까지 삭제 -> 적중 시 touch() 로 LRU
+    """
+
+    def __init__(self, folder, max_bytes, suffix):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.size = None   # 총 바이트 (처음 add 할 때 한 번 스캔)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def touch(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def files(self):
+        out = []
+        for dirpath, _, names in os.walk(self.folder):
+            for n in names:
+                if n.endswith(self.suffix):
+                    p = os.path.join(dirpath, n)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    out.append((st.st_mtime, st.st_size, p))
+        return out
+
+    def add(self, added, keep=None):
+        """added 바이트를 새로 썼음 (keep = 방금 만든 파일, 응답으로 나가야 하므로 지우지 않음) -> 삭제한 파일 수"""
+        with self._lock:
+            if self.size is None:
+                self.size = sum(size for _, size, _ in self.files())
+            else:
+                self.size += added
+            if self.size <= self.max_bytes:
+                return 0
+            # 90% 까지 오래된 순으로 삭제 (매 요청마다 스캔하지 않도록 여유를 둠)
+            files = self.files()
+            total = sum(size for _, size, _ in files)
+            evicted = 0
+            for _, size, p in sorted(files):
+                if total <= self.max_bytes * 0.9:
+                    break
+                if p == keep:
+                    continue
+                try:
+                    os.remove(p)
+                except OSError:
+                    continue
+                total -= size
+                evicted += 1
+            self.size = total
+            return evicted
+
+
+class RenderCache:
+    """썸네일 / 스켈레톤 오버레이 생성 + 콘텐츠 주소 캐시 (스레드 안전)."""
+
+    def __init__(self, target_index=None, max_bytes=RENDER_CACHE_MB * 1024 * 1024, workers=1,
+                 min_conf=RENDER_MIN_CONF):
+        self.target_index = target_index
+        self.max_bytes = max_bytes
+        self.min_conf = min_conf
+        self.stats = {"hits": 0, "renders": 0, "evicted": 0}
+        self._dirs = {kind: CappedDir(sk_dir, max_bytes, ".jpg") for kind, (_, sk_dir) in RENDER_KINDS.items()}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="render")
+        self._backend_obj = None
+        self._backend_error = None
+        self._backend_lock = threading.Lock()
+
+    # ---- 캡처 포즈 추론 (video_analysis 와 같은 백엔드, 모델은 pose_models.POOL 공유) ----
+    def _backend(self):
+        with self._backend_lock:
+            if self._backend_obj is None and self._backend_error is None:
+                try:
+                    import make_pose_keypoints as mpk
+                    self._backend_obj = mpk.UltraBackend()
+                except Exception as e:
+                    self._backend_error = str(e)
+                    print(f"[render] capture skeletons disabled: {e}")
+            return self._backend_obj
+
+    def _infer(self, img):
+        backend = self._backend()
+        if backend is None:
+            return np.zeros((0, 17, 3), np.float32)
+        people = backend.infer(img, min_conf=self.min_conf)
+        return np.stack([person_to_array(p) for p in people]) if people else np.zeros((0, 17, 3), np.float32)
+
+    # ---- 경로 / 키 ----
+    @staticmethod
+    def source_path(kind, rel):
+        """kind 루트 밖으로 나가는 경로(..)나 없는 파일은 None"""
+        if kind not in RENDER_KINDS:
+            return None
+        root = os.path.realpath(RENDER_KINDS[kind][0])
+        path = os.path.realpath(os.path.join(root, rel))
+        if not path.startswith(root + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def lookup(self, kind, rel, size=RENDER_DEFAULT_SIZE, skeleton=True):
+        """-> (원본 경로, 캐시 키, 타겟 키포인트 또는 None). 원본이 없으면 None. 렌더링은 하지 않음."""
+        src = self.source_path(kind, rel)
+        if src is None:
+            return None
+        st = os.stat(src)
+        kps = None
+        h = hashlib.sha1(f"{RENDER_VERSION}|{kind}|{rel}|{st.st_size}|{st.st_mtime_ns}|{snap_size(size)}|"
+                         f"{int(bool(skeleton))}".encode("utf-8"))
+        if skeleton and kind == "matching" and self.target_index is not None:
+            arr = self.target_index.people(rel.replace(os.sep, "/"))
+            if arr is not None:
+                kps = np.asarray(arr, dtype=np.float32)
+                h.update(kps.tobytes())
+        return src, h.hexdigest(), kps
+
+    @staticmethod
+    def cached_path(kind, key):
+        return os.path.join(RENDER_KINDS[kind][1], key[:2], key + ".jpg")
+
+    # ---- 생성 ----
+    def get(self, kind, rel, size=RENDER_DEFAULT_SIZE, skeleton=True):
+        """-> (캐시 파일 경로, ETag) - 없으면 생성. 원본이 없거나 읽을 수 없으면 None."""
+        found = self.lookup(kind, rel, size, skeleton)
+        if found is None:
+            return None
+        src, key, kps = found
+        path = self.cached_path(kind, key)
+        if os.path.exists(path):
+            CappedDir.touch(path)
+            with self._lock:
+                self.stats["hits"] += 1
+            return path, f'"{key}"'
+        data = self._render(kind, src, snap_size(size), skeleton, kps)
+        if data is None:
+            return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + f".tmp{threading.get_ident()}"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self.stats["renders"] += 1
+        evicted = self._dirs[kind].add(len(data), keep=path)
+        if evicted:
+            with self._lock:
+                self.stats["evicted"] += evicted
+        return path, f'"{key}"'
+
+    def _render(self, kind, src, size, skeleton, kps):
+        import make_pose_keypoints as mpk
+        img, src_size = mpk.ImageDecoder(size)(src)   # JPEG 은 size 이상으로 축소 디코딩
+        if img is None:
+            return None
+        W, H = src_size
+        if skeleton and kind == "capture":
+            # 디코딩한 크기에서 추론 -> 원본 px
+            kps = self._infer(img) * np.array([W / img.shape[1], H / img.shape[0], 1.0], np.float32)
+        t = min(1.0, size / max(W, H))
+        tw, th = max(1, int(round(W * t))), max(1, int(round(H * t)))
+        thumb = img if (tw, th) == img.shape[1::-1] else cv2.resize(img, (tw, th), interpolation=cv2.INTER_AREA)
+        if skeleton and kps is not None and len(kps):
+            draw_skeletons(thumb, kps, np.array([tw / W, th / H], np.float32))
+        ok, buf = cv2.imencode(".jpg", thumb, [cv2.IMWRITE_JPEG_QUALITY, RENDER_QUALITY])
+        return buf.tobytes() if ok else None
+
+    def prerender(self, items):
+        """[(kind, rel, size, skeleton)] 를 백그라운드로 미리 생성"""
+        for item in items:
+            self._pool.submit(self._prerender_one, *item)
+
+    def _prerender_one(self, kind, rel, size, skeleton):
+        try:
+            self.get(kind, rel, size, skeleton)
+        except Exception as e:
+            print(f"[render] prerender {kind}/{rel} failed: {e}")
+
+    def info(self):
+        with self._lock:
+            return dict(self.stats, max_mb=round(self.max_bytes / 1024 / 1024, 1),
+                        used_mb={os.path.basename(d.folder): round(d.size / 1024 / 1024, 2)
+                                 for d in self._dirs.values() if d.size is not None},
+                        capture_skeleton=self._backend_error is None)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,246 @@
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from common.import_data import os, json, time
+from common.common import VAR_DIR
+
+# -------------------------
+# 세션별 상태 저장소 (기존 전역 result_store 대체)
+# - 세션 ID: 쿠키(pose_sid) 또는 X-Session-Id 헤더 (없으면 /play 에서 발급)
+# - 세션 = {필드: JSON 값} (capture_session, capture_count, video_session, latest ...)
+# - TTL: 마지막 접근 후 SESSION_TTL 초가 지나면 제거 (접근 시 확인 + SESSION_PURGE_S 초마다 일괄 purge)
+# - 백엔드: memory(프로세스 내 LRU) / sqlite(파일, 여러 uvicorn 워커가 공유)
+#   POSE_SESSION_BACKEND=memory|sqlite, POSE_SESSION_DB=경로
+# - incr() 은 원자적 (memory: 락 / sqlite: BEGIN IMMEDIATE 트랜잭션)
+# - SessionNumberAllocator: /play 의 날짜별 세션 폴더 번호 (SQLite 시퀀스, 폴더 스캔 없음)
+# -------------------------
+
+SESSION_COOKIE = "pose_sid"
+SESSION_HEADER = "x-session-id"
+SESSION_TTL = int(os.environ.get("POSE_SESSION_TTL", str(6 * 3600)))
+SESSION_MAX = int(os.environ.get("POSE_SESSION_MAX", "10000"))
+SESSION_BACKEND = os.environ.get("POSE_SESSION_BACKEND", "memory")
+SESSION_PURGE_S = float(os.environ.get("POSE_SESSION_PURGE_S", "300"))
+# 세션 ID 가 들어 있으므로 공개 정적 경로(result_images) 밖에 저장
+SESSION_DB = os.environ.get("POSE_SESSION_DB", os.path.join(VAR_DIR, "sessions.sqlite3"))
+
+
+def new_session_id():
+    return secrets.token_urlsafe(16)
+
+
+def request_session_id(request):
+    """쿠키 > 헤더 순으로 세션 ID (없으면 None)"""
+    sid = request.cookies.get(SESSION_COOKIE) or request.headers.get(SESSION_HEADER)
+    if sid and 8 <= len(sid) <= 64:
+        return sid
+    return None
+
+
+class MemorySessionStore:
+    """단일 프로세스용: OrderedDict LRU + TTL (워커 1개일 때 기본값)."""
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=SESSION_MAX):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._data = OrderedDict()   # sid -> (expires, {field: value})
+        self._lock = threading.Lock()
+
+    def _live(self, sid, create=False):
+        now = time.time()
+        item = self._data.get(sid)
+        if item is not None and item[0] < now:
+            del self._data[sid]
+            item = None
+        if item is None:
+            if not create:
+                return None
+            item = (0, {})
+        fields = item[1]
+        self._data[sid] = (now + self.ttl, fields)
+        self._data.move_to_end(sid)
+        while len(self._data) > self.max_sessions:
+            self._data.popitem(last=False)
+        return fields
+
+    def get(self, sid):
+        with self._lock:
+            fields = self._live(sid)
+            return dict(fields) if fields is not None else None
+
+    def update(self, sid, **fields):
+        with self._lock:
+            self._live(sid, create=True).update(fields)
+
+    def discard(self, sid, *keys):
+        with self._lock:
+            fields = self._live(sid)
+            for k in keys if fields is not None else ():
+                fields.pop(k, None)
+
+    def incr(self, sid, key, by=1):
+        with self._lock:
+            fields = self._live(sid, create=True)
+            fields[key] = int(fields.get(key, 0)) + by
+            return fields[key]
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def purge(self):
+        with self._lock:
+            now = time.time()
+            for sid in [sid for sid, (expires, _) in self._data.items() if expires < now]:
+                del self._data[sid]
+
+
+class _SQLiteDB:
+    """여러 워커 프로세스가 공유하는 SQLite 파일 (WAL, 스레드마다 연결 1개)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _conn(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    class _Tx:
+        def __init__(self, db):
+            self.db = db
+
+        def __enter__(self):
+            self.db.execute("BEGIN IMMEDIATE")   # 쓰기 락을 먼저 잡아 read-modify-write 를 원자적으로
+            return self.db
+
+        def __exit__(self, exc_type, exc, tb):
+            self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+    def _tx(self):
+        return self._Tx(self._conn())
+
+
+class SQLiteSessionStore(_SQLiteDB):
+    """여러 워커 프로세스가 공유하는 세션 저장소."""
+
+    def __init__(self, path=SESSION_DB, ttl=SESSION_TTL):
+        super().__init__(path)
+        self.ttl = ttl
+        with self._tx() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS session ("
+                       "sid TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                       "PRIMARY KEY (sid, key))")
+            db.execute("CREATE TABLE IF NOT EXISTS session_expiry (sid TEXT PRIMARY KEY, expires REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS session_expiry_at ON session_expiry (expires)")
+
+    def _touch(self, db, sid, create):
+        """만료 확인 + 연장. 없거나 만료됐으면(create=False) False."""
+        now = time.time()
+        row = db.execute("SELECT expires FROM session_expiry WHERE sid = ?", (sid,)).fetchone()
+        if row is not None and row[0] < now:
+            db.execute("DELETE FROM session WHERE sid = ?", (sid,))
+            row = None
+        if row is None and not create:
+            db.execute("DELETE FROM session_expiry WHERE sid = ?", (sid,))
+            return False
+        db.execute("INSERT OR REPLACE INTO session_expiry (sid, expires) VALUES (?, ?)", (sid, now + self.ttl))
+        return True
+
+    def get(self, sid):
+        with self._tx() as db:
+            if not self._touch(db, sid, create=False):
+                return None
+            rows = db.execute("SELECT key, value FROM session WHERE sid = ?", (sid,)).fetchall()
+        return {k: json.loads(v) for k, v in rows}
+
+    def update(self, sid, **fields):
+        with self._tx() as db:
+            self._touch(db, sid, create=True)
+            db.executemany("INSERT OR REPLACE INTO session (sid, key, value) VALUES (?, ?, ?)",
+                           [(sid, k, json.dumps(v, ensure_ascii=False)) for k, v in fields.items()])
+
+    def discard(self, sid, *keys):
+        with self._tx() as db:
+            db.executemany("DELETE FROM session WHERE sid = ? AND key = ?", [(sid, k) for k in keys])
+
+    def incr(self, sid, key, by=1):
+        with self._tx() as db:
+            self._touch(db, sid, create=True)
+            row = db.execute("SELECT value FROM session WHERE sid = ? AND key = ?", (sid, key)).fetchone()
+            value = int(json.loads(row[0])) + by if row else by
+            db.execute("INSERT OR REPLACE INTO session (sid, key, value) VALUES (?, ?, ?)", (sid, key, str(value)))
+        return value
+
+    def delete(self, sid):
+        with self._tx() as db:
+            db.execute("DELETE FROM session WHERE sid = ?", (sid,))
+            db.execute("DELETE FROM session_expiry WHERE sid = ?", (sid,))
+
+    def purge(self):
+        """만료 세션 일괄 삭제 (SESSION_PURGE_S 주기 타이머에서 호출)"""
+        with self._tx() as db:
+            now = time.time()
+            db.execute("DELETE FROM session WHERE sid IN (SELECT sid FROM session_expiry WHERE expires < ?)", (now,))
+            db.execute("DELETE FROM session_expiry WHERE expires < ?", (now,))
+
+
+class SessionNumberAllocator(_SQLiteDB):
+    """
+    날짜별 세션 폴더 번호 발급 (capture/{day}/N + video/{day}/N 동시 생성).
+    - 번호는 SQLite 의 (day -> last) 행을 BEGIN IMMEDIATE 로 증가 -> 워커·요청이 동시에 와도 중복 없음
+    - 그날 처음 발급할 때만 기존 폴더를 한 번 스캔해 시작값을 정함 (이후 스캔 없음)
+    - 폴더는 os.mkdir 로 만들어 이미 있으면(수동 생성 등) 다음 번호로 넘어감
+    """
+
+    def __init__(self, bases, path=SESSION_DB):
+        super().__init__(path)
+        self.bases = list(bases)   # [capture 루트, video 루트] - 같은 번호를 나눠 씀
+        with self._tx() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS session_number (day TEXT PRIMARY KEY, last INTEGER NOT NULL)")
+
+    def _scan_max(self, day):
+        last = 0
+        for base in self.bases:
+            folder = os.path.join(base, day)
+            if os.path.isdir(folder):
+                last = max([last] + [int(f) for f in os.listdir(folder) if f.isdigit()])
+        return last
+
+    def allocate(self, day):
+        """-> (번호 문자열, [생성된 폴더 경로 (bases 순)])"""
+        while True:
+            with self._tx() as db:
+                row = db.execute("SELECT last FROM session_number WHERE day = ?", (day,)).fetchone()
+                number = (row[0] if row else self._scan_max(day)) + 1
+                db.execute("INSERT OR REPLACE INTO session_number (day, last) VALUES (?, ?)", (day, number))
+            folder_nm = str(number)
+            paths = [os.path.join(base, day, folder_nm) for base in self.bases]
+            os.makedirs(os.path.dirname(paths[0]), exist_ok=True)
+            try:
+                os.mkdir(paths[0])
+            except FileExistsError:
+                continue
+            for p in paths[1:]:
+                os.makedirs(p, exist_ok=True)
+            return folder_nm, paths
+
+
+SESSION_BACKENDS = {
+    "memory": MemorySessionStore,
+    "sqlite": SQLiteSessionStore,
+}
+
+
+def make_session_store(backend=SESSION_BACKEND):
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"unknown POSE_SESSION_BACKEND: {backend} (memory|sqlite)")
+    return SESSION_BACKENDS[backend]()
@@ -0,0 +1,232 @@
+import gzip
+import hashlib
+import stat
+import threading
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.staticfiles import NotModifiedResponse
+from starlette.datastructures import Headers, QueryParams
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+from common.import_data import os
+from common.common import VAR_DIR
+from common.render_cache import CappedDir
+
+# -------------------------
+# result_images 정적 파일 (캐시 정책 / 크기별 변형 / gzip / Range)
+# - 지문(fingerprint) URL: /static/result_images/matching/2/1.jpg?v=<fp>
+#   fp = sha1(크기 + mtime) 앞 12자리. v 가 현재 파일의 fp 와 같을 때만 1년 immutable 캐시
+#   (파일이 바뀌면 fp 가 달라지므로 예전 URL 은 no-cache 로 내려가 재검증)
+# - 지문 없는 요청: no-cache + ETag/Last-Modified (304 재검증)
+# - ?w=320 : 이미지 크기별 변형 (긴 변 기준, RenderCache 가 만든 캐시 파일, capture / matching 만)
+# - .json : Accept-Encoding gzip 이면 미리 압축해 둔 .gz 로 응답 (VAR_DIR/static_gz, 공개 트리 밖)
+#   원본이 바뀌면 다시 압축하고 이전 .gz 는 삭제, 총 용량은 STATIC_GZIP_CACHE_MB 까지 (CappedDir LRU)
+# - 영상(mp4/webm): Range 요청 -> 206 부분 응답 (탐색/재생 시 필요한 부분만 전송), If-Range 지원
+# - 점(.)으로 시작하는 파일·폴더(.pose_manifest.json, .target_index.npz 등 내부 파일)는 404
+# -------------------------
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+STATIC_GZIP_MIN_BYTES = 1024
+STATIC_GZIP_DIR = os.path.join(VAR_DIR, "static_gz")
+STATIC_GZIP_CACHE_MB = int(os.environ.get("POSE_STATIC_GZIP_CACHE_MB", "64"))
+RANGE_CHUNK_SIZE = 256 * 1024
+RANGE_SUFFIXES = (".mp4", ".webm", ".mov")
+VARIANT_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+# 서버 시작 시 matching 라이브러리를 미리 만들어 둘 변형 크기 (POSE_STATIC_VARIANTS="320,640", 빈 값이면 안 함)
+STATIC_VARIANTS = [int(v) for v in os.environ.get("POSE_STATIC_VARIANTS", "320").split(",") if v.strip()]
+
+
+def fingerprint(st):
+    """os.stat_result -> 12자리 지문 (내용이 바뀌면 크기나 mtime 이 바뀜)"""
+    return hashlib.sha1(f"{st.st_size}|{st.st_mtime_ns}".encode("ascii")).hexdigest()[:12]
+
+
+def versioned_url(mount, root, rel):
+    """root 아래 rel 파일의 지문 URL (없으면 None)"""
+    try:
+        st = os.stat(os.path.join(root, rel))
+    except OSError:
+        return None
+    return f"{mount}/{rel.replace(os.sep, '/')}?v={fingerprint(st)}"
+
+
+def parse_range(value, size):
+    """
+    'bytes=a-b' / 'bytes=a-' / 'bytes=-n' -> (start, end) (end 포함).
+    여러 구간·형식 오류 -> None (전체 응답), 파일 범위 밖 -> ValueError (416)
+    """
+    unit, _, spec = (value or "").partition("=")
+    first, sep, last = spec.strip().partition("-")
+    if unit.strip().lower() != "bytes" or not sep or "," in spec:
+        return None
+    if not (first.isdigit() or first == "") or not (last.isdigit() or last == "") or first == last == "":
+        return None
+    if first == "":
+        if int(last) == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - int(last)), size - 1   # 끝에서 n 바이트
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def _iter_file(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles + 지문 URL 캐시 정책, 크기별 변형(?w=), .json gzip, 영상 Range."""
+
+    def __init__(self, *args, mount="", render_cache=None, immutable_prefixes=("matching",), **kw):
+        super().__init__(*args, **kw)
+        self.mount = mount
+        self.render_cache = render_cache
+        self.immutable_prefixes = tuple(immutable_prefixes)
+        self._gz_lock = threading.Lock()
+        self._gz_dir = CappedDir(STATIC_GZIP_DIR, STATIC_GZIP_CACHE_MB * 1024 * 1024, ".gz")
+
+    async def get_response(self, path, scope):
+        if any(part.startswith(".") for part in path.replace(os.sep, "/").split("/")):
+            raise HTTPException(status_code=404)
+        if scope["method"] in ("GET", "HEAD"):
+            full_path, st = await anyio.to_thread.run_sync(self.lookup_path, path)
+            if st is not None and stat.S_ISREG(st.st_mode):
+                # 변형 생성 / gzip 압축은 디스크 작업이므로 스레드에서
+                return await anyio.to_thread.run_sync(self.cached_response, path, full_path, st, scope)
+        return await super().get_response(path, scope)
+
+    def cache_control(self, path, st, query):
+        if query.get("v") and query["v"] == fingerprint(st):
+            return f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        if path.replace(os.sep, "/").split("/", 1)[0] in self.immutable_prefixes:
+            return "public, no-cache"
+        return "no-cache"
+
+    def cached_response(self, path, full_path, st, scope):
+        request_headers = Headers(scope=scope)
+        query = QueryParams(scope.get("query_string", b""))
+        headers = {"Cache-Control": self.cache_control(path, st, query)}
+        ext = os.path.splitext(full_path)[1].lower()
+
+        if query.get("w") and ext in VARIANT_SUFFIXES and self.render_cache is not None:
+            kind, _, rel = path.replace(os.sep, "/").partition("/")
+            variant = self.render_cache.get(kind, rel, int(query["w"]), skeleton=False) if query["w"].isdigit() else None
+            if variant is not None:
+                full_path, st = variant[0], os.stat(variant[0])
+
+        if ext == ".json" and st.st_size >= STATIC_GZIP_MIN_BYTES and "gzip" in request_headers.get("accept-encoding", ""):
+            gz = self._gzip(full_path, st)
+            if gz is not None:
+                headers.update({"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+                return self._file(gz, os.stat(gz), request_headers, headers, media_type="application/json")
+
+        if ext in RANGE_SUFFIXES:
+            headers["Accept-Ranges"] = "bytes"
+            if "range" in request_headers:
+                return self._range(full_path, st, request_headers, headers, scope["method"])
+        return self._file(full_path, st, request_headers, headers)
+
+    def _file(self, full_path, st, request_headers, headers, media_type=None):
+        response = FileResponse(full_path, stat_result=st, headers=headers, media_type=media_type)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def _range(self, full_path, st, request_headers, headers, method):
+        etag = FileResponse(full_path, stat_result=st).headers["etag"]
+        if_range = request_headers.get("if-range")
+        if if_range and if_range != etag:
+            # 그 사이 파일이 바뀜 -> 전체 응답
+            return self._file(full_path, st, request_headers, headers)
+        size = st.st_size
+        try:
+            rng = parse_range(request_headers["range"], size)
+        except ValueError:
+            return Response(status_code=416, headers=dict(headers, **{"Content-Range": f"bytes */{size}"}))
+        if rng is None:
+            return self._file(full_path, st, request_headers, headers)
+        start, end = rng
+        length = end - start + 1
+        headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(length), "ETag": etag})
+        media_type = FileResponse(full_path).media_type
+        if method == "HEAD":
+            return Response(status_code=206, headers=headers, media_type=media_type)
+        return StreamingResponse(_iter_file(full_path, start, length), status_code=206, headers=headers,
+                                 media_type=media_type)
+
+    def _gzip(self, full_path, st):
+        """
+        {STATIC_GZIP_DIR}/{ab}/{sha1(경로)}.{지문}.gz (없으면 만듦, 같은 경로의 이전 지문 .gz 는 삭제). 실패하면 None
+        """
+        key = hashlib.sha1(full_path.encode("utf-8")).hexdigest()
+        folder = os.path.join(STATIC_GZIP_DIR, key[:2])
+        gz = os.path.join(folder, f"{key}.{fingerprint(st)}.gz")
+        if os.path.exists(gz):
+            CappedDir.touch(gz)
+            return gz
+        try:
+            with open(full_path, "rb") as f:
+                data = gzip.compress(f.read(), compresslevel=9, mtime=0)
+            with self._gz_lock:
+                os.makedirs(folder, exist_ok=True)
+                tmp = gz + f".tmp{threading.get_ident()}"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, gz)
+                freed = 0
+                for name in os.listdir(folder):
+                    if name.startswith(key + ".") and name.endswith(".gz") and name != os.path.basename(gz):
+                        old = os.path.join(folder, name)
+                        try:
+                            size = os.path.getsize(old)
+                            os.remove(old)
+                        except OSError:
+                            continue
+                        freed += size
+        except OSError as e:
+            print(f"[static] gzip failed: {full_path} ({e})")
+            return None
+        self._gz_dir.add(len(data) - freed, keep=gz)
+        return gz
+
+    # ---- 지문 목록 (클라이언트가 immutable URL 을 쓰도록) ----
+    def manifest(self, folder):
+        """root 아래 folder 의 이미지 -> 지문 URL (이름 자연 정렬)"""
+        base = os.path.join(self.directory, folder)
+        if not os.path.isdir(base):
+            return None
+        names = [n for n in os.listdir(base) if os.path.splitext(n)[1].lower() in VARIANT_SUFFIXES]
+        names.sort(key=lambda n: (int(os.path.splitext(n)[0]) if os.path.splitext(n)[0].isdigit() else float("inf"), n))
+        out = {}
+        for n in names:
+            url = versioned_url(self.mount, self.directory, os.path.join(folder, n))
+            if url:
+                out[n] = url
+        return out
+
+    def prerender_variants(self, sizes=STATIC_VARIANTS, prefix="matching"):
+        """prefix 아래 이미지의 크기별 변형을 백그라운드로 미리 생성"""
+        if self.render_cache is None or not sizes:
+            return 0
+        items = []
+        for dirpath, dirnames, names in os.walk(os.path.join(self.directory, prefix)):
+            dirnames[:] = [d for d in dirnames if d != "failed"]
+            rel_dir = os.path.relpath(dirpath, os.path.join(self.directory, prefix))
+            for n in names:
+                if os.path.splitext(n)[1].lower() in VARIANT_SUFFIXES:
+                    rel = n if rel_dir == "." else f"{rel_dir.replace(os.sep, '/')}/{n}"
+                    items.extend((prefix, rel, size, False) for size in sizes)
+        self.render_cache.prerender(items)
+        return len(items)
@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import threading
+
+from common.import_data import np, os, json, time
+from common.common import IMG_RESULT_DIR, IMG_RESULT_MAT_DIR
+from common.pose_score import similarity
+from common.static_cache import versioned_url
+
+try:
+    import watchfiles
+    _HAS_WATCHFILES = True
+except Exception:
+    _HAS_WATCHFILES = False
+
+# -------------------------
+# 타겟 카탈로그 (matching/{players}/*.jpg 전체 목록 + 타겟별 메타데이터)
+# - 인원 폴더는 숫자 이름이면 모두, 파일 이름도 자유 (1..N 연번 가정 없음)
+# - 타겟별: 지문 URL(?v=), 검출 인원 / 유효 포즈 수, 난이도, meta.failed, 키포인트 유무
+#   난이도 = 그룹 평균 포즈와 덜 닮을수록 어려움 -> 그룹 안 백분위(0~1) + 단계(1 쉬움 ~ 3 어려움)
+# - 키포인트는 TargetIndex 것을 그대로 사용 (인덱스에 없는 JSON 만 직접 읽어 meta.failed 확인)
+# - 응답 JSON(+gzip)은 바뀔 때만 한 번 만들어 메모리에 보관, ETag = 내용 sha1
+# - 파일 변경 감시: watchfiles(uvicorn[standard] 에 포함)가 있으면 이벤트, 없으면 CATALOG_POLL_S 초 주기 스캔
+#   변경 시 TargetIndex.refresh -> PoseSearchIndex.sync -> 카탈로그 재생성
+#   (인덱스 version 과 이미지 파일 상태가 지난 생성 때와 같으면 재생성 생략 - 폴링 주기마다 다시 만들지 않음)
+# -------------------------
+
+CATALOG_POLL_S = float(os.environ.get("POSE_CATALOG_POLL_S", "5"))
+CATALOG_IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+CATALOG_MOUNT = "/static/result_images"
+DIFFICULTY_LEVELS = 3
+
+
+def _json_failed(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return bool(json.load(f).get("meta", {}).get("failed"))
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+def _name_key(name):
+    stem = os.path.splitext(name)[0]
+    return (int(stem) if stem.isdigit() else float("inf"), name)
+
+
+class TargetCatalog:
+    """matching 라이브러리 카탈로그 (메모리 보관 + 파일 변경 시 자동 갱신)."""
+
+    def __init__(self, target_index, pose_search=None, root=IMG_RESULT_MAT_DIR, poll_s=CATALOG_POLL_S):
+        self.index = target_index
+        self.pose_search = pose_search
+        self.root = root
+        self.poll_s = poll_s
+        self.groups = {}
+        self.etag = None
+        self.body = b""
+        self.body_gz = b""
+        self._state = None      # 마지막 생성 때의 (인덱스 version, 이미지 파일 서명)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---- 생성 ----
+    @staticmethod
+    def _difficulty(idx, sl_list):
+        """스냅샷 + 이미지별 사람 slice 목록 -> (이미지별 평균 비유사도 또는 nan)"""
+        rows = [np.arange(sl.start, sl.stop)[idx.valid[sl]] for sl in sl_list]
+        flat = np.concatenate(rows) if rows else np.zeros(0, np.intp)
+        out = np.full(len(sl_list), np.nan)
+        if not len(flat):
+            return out
+        mean = idx.vecs[flat].mean(axis=0, keepdims=True)
+        dis = 1.0 - similarity(idx.vecs[flat], np.repeat(mean, len(flat), axis=0))
+        pos = 0
+        for i, r in enumerate(rows):
+            if len(r):
+                out[i] = dis[pos:pos + len(r)].mean()
+            pos += len(r)
+        return out
+
+    def scan(self):
+        """-> {players: [타겟 dict, ...]} (이름 자연 정렬)"""
+        idx = self.index.snapshot()   # 스캔 중에 인덱스가 바뀌어도 한 시점의 값으로
+        groups = {}
+        if not os.path.isdir(self.root):
+            return groups
+        for group in sorted(os.listdir(self.root), key=lambda g: (len(g), g)):
+            gdir = os.path.join(self.root, group)
+            if not group.isdigit() or not os.path.isdir(gdir):
+                continue
+            names = sorted((n for n in os.listdir(gdir) if os.path.splitext(n)[1].lower() in CATALOG_IMAGE_SUFFIXES),
+                           key=_name_key)
+            targets, slices = [], []
+            for name in names:
+                key = f"{group}/{name}"
+                url = versioned_url(CATALOG_MOUNT, IMG_RESULT_DIR, os.path.join("matching", group, name))
+                if url is None:
+                    continue
+                sl = idx.people_slice(key)
+                t = {"name": name, "url": url, "people": 0, "valid": 0, "indexed": sl is not None,
+                     "failed": False, "difficulty": None, "level": None}
+                if sl is not None:
+                    t["people"] = sl.stop - sl.start
+                    t["valid"] = int(idx.valid[sl].sum())
+                    slices.append((len(targets), sl))
+                elif key in idx.found:
+                    # JSON 은 있는데 인덱스에 없음 = 사람 없음 / meta.failed
+                    t["failed"] = _json_failed(idx.found[key][0])
+                targets.append(t)
+
+            dis = self._difficulty(idx, [sl for _, sl in slices])
+            ok = np.flatnonzero(~np.isnan(dis))
+            if len(ok):
+                # 그룹 안 백분위 (동점은 같은 값)
+                order = np.argsort(dis[ok], kind="stable")
+                pct = np.empty(len(ok))
+                pct[order] = np.arange(len(ok)) / max(1, len(ok) - 1)
+                for j, p in zip(ok, pct):
+                    t = targets[slices[j][0]]
+                    t["difficulty"] = round(float(p), 3)
+                    t["level"] = min(DIFFICULTY_LEVELS, 1 + int(p * DIFFICULTY_LEVELS))
+            groups[group] = targets
+        return groups
+
+    def _image_state(self):
+        """이미지 파일 (이름, mtime, 크기) 서명 - JSON 이 없어 인덱스가 모르는 변경(새 이미지 / 교체)도 잡음"""
+        h = hashlib.sha1()
+        if os.path.isdir(self.root):
+            for group in sorted(os.listdir(self.root)):
+                gdir = os.path.join(self.root, group)
+                if not group.isdigit() or not os.path.isdir(gdir):
+                    continue
+                for e in sorted(os.scandir(gdir), key=lambda e: e.name):
+                    if os.path.splitext(e.name)[1].lower() in CATALOG_IMAGE_SUFFIXES:
+                        st = e.stat()
+                        h.update(f"{group}/{e.name}:{st.st_mtime_ns}:{st.st_size};".encode("utf-8"))
+        return h.hexdigest()
+
+    def rebuild(self):
+        """다시 스캔해서 응답 본문 갱신 -> 내용이 바뀌었으면 True"""
+        t0 = time.perf_counter()
+        state = (self.index.version, self._image_state())   # 스캔 전에 (스캔 중 변경은 다음 refresh 가 잡음)
+        groups = self.scan()
+        payload = {
+            "status": "ok",
+            "groups": {g: {"count": len(ts), "playable": sum(1 for t in ts if not t["failed"]), "targets": ts}
+                       for g, ts in groups.items()},
+        }
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        with self._lock:
+            self._state = state
+            if etag == self.etag:
+                return False
+            self.groups = groups
+            self.body, self.body_gz, self.etag = body, gzip.compress(body, mtime=0), etag
+        print(f"[catalog] {sum(len(ts) for ts in groups.values())} targets in {len(groups)} groups "
+              f"({(time.perf_counter() - t0) * 1000:.1f}ms)")
+        return True
+
+    def refresh(self):
+        """파일 변경 반영: 인덱스 증분 갱신 -> 검색 인덱스 -> 카탈로그 (바뀐 게 없으면 False, 재생성 안 함)"""
+        changes = self.index.refresh()
+        if any(changes.values()) and self.pose_search is not None:
+            self.pose_search.sync()
+        if (self.index.version, self._image_state()) == self._state:
+            return False
+        return self.rebuild()
+
+    def response(self):
+        """-> (ETag, 본문, gzip 본문) - 한 번에 읽어 서로 맞는 값"""
+        with self._lock:
+            return self.etag, self.body, self.body_gz
+
+    # ---- 파일 변경 감시 ----
+    @staticmethod
+    def _relevant(path):
+        # 인덱스 캐시·매니페스트 등 숨김 파일과 failed 폴더는 무시 (refresh 가 쓰는 파일로 다시 깨지 않게)
+        parts = path.replace(os.sep, "/").split("/")
+        return not parts[-1].startswith(".") and "failed" not in parts and ".tmp" not in parts[-1]
+
+    def _watch(self):
+        if _HAS_WATCHFILES and os.path.isdir(self.root):
+            for changes in watchfiles.watch(self.root, stop_event=self._stop, yield_on_timeout=False):
+                if any(self._relevant(p) for _, p in changes):
+                    self._safe_refresh()
+            return
+        while not self._stop.wait(self.poll_s):
+            self._safe_refresh()
+
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"[catalog] refresh failed: {e}")
+
+    def start_watch(self):
+        if self._thread is None and self.poll_s > 0:
+            self._thread = threading.Thread(target=self._watch, name="catalog-watch", daemon=True)
+            self._thread.start()
+            print(f"[catalog] watching {self.root} ({'watchfiles' if _HAS_WATCHFILES else f'poll {self.poll_s}s'})")
+
+    def stop_watch(self):
+        self._stop.set()
@@ -0,0 +1,299 @@
+import hashlib
+import threading
+
+from common.import_data import np, os, json, time
+from common.common import IMG_RESULT_MAT_DIR
+from common.pose_score import COCO_NAMES, keypoints_to_array, normalize_poses
+from pose_store import STORE_NAME, load_rows, group_rows
+
+# -------------------------
+# 타겟 포즈 인덱스
+# - make_pose_keypoints.py 가 만든 matching/{players}/N.multi.json(.json) 을 서버 시작 시 한 번 읽어
+#   (사람 수, 17, 3) float32 배열 + 정규화 벡터로 보관
+# - 폴더에 poses.npy(--format columnar|both)가 있으면 그 이미지는 JSON 대신 memmap 으로 읽음 (파싱 없음)
+# - matching/.target_index.npz 에 바이너리로 캐시 (JSON 이 바뀌지 않았으면 파싱 생략)
+# - refresh(): 다시 스캔해서 새로 생기거나 바뀐 파일만 파싱 (나머지는 메모리의 배열 재사용), version 증가
+# - 배열 묶음은 TargetSnapshot 하나로 만들어 참조 한 번으로 교체 (감시 스레드가 refresh 하는 중에도
+#   읽는 쪽은 snapshot() 으로 받은 한 시점의 keys/offsets/kps/vecs 를 함께 씀)
+# -------------------------
+
+INDEX_CACHE_NAME = ".target_index.npz"
+INDEX_VERSION = 1
+
+
+def _load_people(json_path):
+    """
+    .multi.json(people) / .json(단일) / make_pose_keypoints_yolo 형식(정규화 keypoints + meta) 읽기
+    -> (people keypoint arrays(px), (w, h)) / 실패(meta.failed) 면 ([], None)
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    meta = data.get("meta", {})
+    if meta.get("failed"):
+        return [], None
+
+    size = data.get("source_size") or {}
+    w, h = int(size.get("w", meta.get("image_w", 0))), int(size.get("h", meta.get("image_h", 0)))
+
+    people = data.get("people")
+    if people is None:
+        people = [data]
+    out = []
+    for p in sorted(people, key=lambda p: p.get("slot", 0)):
+        if p.get("keypoints_px"):
+            out.append(keypoints_to_array(p["keypoints_px"]))
+        elif p.get("keypoints") and w and h:
+            # 정규화 좌표만 있는 경우 px 로 환산
+            out.append(keypoints_to_array(p["keypoints"], w, h))
+    return out, (w, h)
+
+
+class TargetSnapshot:
+    """한 시점의 인덱스 (만든 뒤 바꾸지 않음). 여러 배열을 함께 읽을 때는 같은 스냅샷에서 읽어야 함."""
+
+    __slots__ = ("keys", "lookup", "offsets", "kps", "sizes", "vecs", "valid", "version", "found")
+
+    def __init__(self, keys, offsets, kps, sizes, version=0, found=None):
+        self.keys = tuple(keys)
+        self.lookup = {k: i for i, k in enumerate(self.keys)}
+        self.offsets = offsets   # (n_images + 1,) 이미지 i 의 사람 = [offsets[i], offsets[i+1])
+        self.kps = kps           # (P, 17, 3) px
+        self.sizes = sizes       # (n_images, 2) w, h
+        self.vecs, self.valid = normalize_poses(kps)   # (P, 30) float64 / (P,)
+        self.version = version
+        self.found = dict(found or {})   # 스캔 결과 {key: (path, mtime_ns, size)}
+        for a in (self.offsets, self.kps, self.sizes, self.vecs, self.valid):
+            a.flags.writeable = False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def people_slice(self, key):
+        i = self.lookup.get(key)
+        if i is None:
+            return None
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def people(self, key):
+        """(m, 17, 3) px 키포인트 (읽기 전용 view) 또는 None"""
+        sl = self.people_slice(key)
+        return None if sl is None else self.kps[sl]
+
+    def get(self, key):
+        """JSON 응답용: 사람별 px 키포인트(스켈레톤 그리기) + 정규화 벡터(유사도 계산)"""
+        sl = self.people_slice(key)
+        if sl is None:
+            return None
+        w, h = (int(v) for v in self.sizes[self.lookup[key]])
+        people = []
+        for slot, p in enumerate(range(sl.start, sl.stop)):
+            kp = self.kps[p]
+            people.append({
+                "slot": slot,
+                "valid": bool(self.valid[p]),
+                "keypoints": [
+                    {"name": COCO_NAMES[j], "x": round(float(kp[j, 0]), 2), "y": round(float(kp[j, 1]), 2),
+                     "score": round(float(kp[j, 2]), 4)}
+                    for j in range(len(COCO_NAMES)) if kp[j, 2] > 0
+                ],
+                "vector": [round(float(v), 5) for v in self.vecs[p]],
+            })
+        return {"image": key, "source_size": {"w": w, "h": h}, "people": people}
+
+
+def _snapshot_attr(name):
+    return property(lambda self: getattr(self._snap, name))
+
+
+class TargetIndex:
+    """
+    matching/{players}/*.jpg 의 키포인트를 한 번에 들고 있는 인덱스 ("players/N.jpg" 키).
+    keys / kps / vecs ... 속성은 현재 스냅샷의 값 - 두 개 이상을 함께 쓰려면 snapshot() 을 한 번 받아서 사용
+    """
+
+    keys = _snapshot_attr("keys")
+    lookup = _snapshot_attr("lookup")
+    offsets = _snapshot_attr("offsets")
+    kps = _snapshot_attr("kps")
+    sizes = _snapshot_attr("sizes")
+    vecs = _snapshot_attr("vecs")
+    valid = _snapshot_attr("valid")
+    version = _snapshot_attr("version")   # 배열이 바뀔 때마다 증가 (PoseSearchIndex 등 파생 인덱스의 갱신 판단)
+    found = _snapshot_attr("found")       # 마지막 스캔 결과 {key: (path, mtime_ns, size)}
+
+    def __init__(self, root=IMG_RESULT_MAT_DIR):
+        self.root = root
+        self.cache_path = os.path.join(root, INDEX_CACHE_NAME)
+        self._build_lock = threading.Lock()   # load / refresh 는 한 번에 하나씩
+        self._snap = TargetSnapshot([], np.zeros(1, np.int32), np.zeros((0, 17, 3), np.float32),
+                                    np.zeros((0, 2), np.int32), version=0)
+
+    def _publish(self, keys, offsets, kps, sizes, found):
+        # 새 스냅샷을 다 만든 뒤 참조 한 번으로 교체
+        self._snap = TargetSnapshot(keys, offsets, kps, sizes, self._snap.version + 1, found)
+
+    def snapshot(self):
+        return self._snap
+
+    def __len__(self):
+        return len(self._snap)
+
+    # ---- 스캔 ----
+    def _json_files(self):
+        """
+        {key: (path, mtime_ns, size)} - 이미지마다 poses.npy > .multi.json > .json 순으로 선택
+        (path 가 poses.npy 면 컬럼형)
+        """
+        found = {}
+        if not os.path.isdir(self.root):
+            return found
+        for group in sorted(os.listdir(self.root)):
+            gdir = os.path.join(self.root, group)
+            if not group.isdigit() or not os.path.isdir(gdir):
+                continue
+            with os.scandir(gdir) as it:
+                entries = {e.name: e for e in it if e.is_file()}
+            columnar = set()
+            store = entries.get(STORE_NAME)
+            if store is not None:
+                st = store.stat()
+                for name in group_rows(load_rows(gdir)):
+                    if name in entries:   # 이미지가 지워졌거나 failed 로 옮겨진 행은 무시
+                        columnar.add(name)
+                        found[f"{group}/{name}"] = (store.path, st.st_mtime_ns, st.st_size)
+            for name in entries:
+                stem, ext = os.path.splitext(name)
+                if ext.lower() not in (".jpg", ".jpeg", ".png", ".bmp", ".webp") or name in columnar:
+                    continue
+                e = entries.get(stem + ".multi.json") or entries.get(stem + ".json")
+                if e is None:
+                    continue
+                st = e.stat()
+                found[f"{group}/{name}"] = (e.path, st.st_mtime_ns, st.st_size)
+        return found
+
+    @staticmethod
+    def _signature(found):
+        sig = "|".join(f"{k}:{v[1]}:{v[2]}" for k, v in sorted(found.items()))
+        return f"v{INDEX_VERSION}:{len(found)}:{hashlib.sha1(sig.encode('utf-8')).hexdigest()}"
+
+    def build(self, found=None, reuse=None):
+        """reuse: {key: (people, wh)} - 파싱하지 않고 그대로 쓸 이미지 (refresh)"""
+        found = self._json_files() if found is None else found
+        reuse = reuse or {}
+        keys, offsets, kps, sizes = [], [0], [], []
+        stores = {}   # poses.npy path -> (memmap rows, {image: slice})
+        for key in sorted(found, key=_natural_key):
+            path = found[key][0]
+            try:
+                if key in reuse:
+                    people, wh = reuse[key]
+                elif os.path.basename(path) == STORE_NAME:
+                    if path not in stores:
+                        rows = load_rows(os.path.dirname(path))
+                        stores[path] = (rows, group_rows(rows))
+                    rows, groups = stores[path]
+                    r = rows[groups[key.split("/", 1)[1]]]
+                    people, wh = list(r["kps"]), (int(r["w"][0]), int(r["h"][0]))
+                else:
+                    people, wh = _load_people(path)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"[target_index] skip {key}: {e}")
+                continue
+            if not people:
+                continue
+            keys.append(key)
+            kps.extend(people)
+            offsets.append(offsets[-1] + len(people))
+            sizes.append(wh)
+        self._publish(
+            keys,
+            np.asarray(offsets, dtype=np.int32),
+            np.stack(kps).astype(np.float32) if kps else np.zeros((0, 17, 3), np.float32),
+            np.asarray(sizes, dtype=np.int32).reshape(-1, 2),
+            found,
+        )
+        return self
+
+    def load(self, use_cache=True):
+        """캐시(.target_index.npz)가 최신이면 그대로, 아니면 JSON 을 파싱해서 다시 만든다."""
+        with self._build_lock:
+            return self._load(use_cache)
+
+    def _load(self, use_cache):
+        t0 = time.perf_counter()
+        found = self._json_files()
+        sig = self._signature(found)
+        if use_cache and os.path.exists(self.cache_path):
+            try:
+                with np.load(self.cache_path, allow_pickle=False) as z:
+                    if str(z["signature"]) == sig:
+                        self._publish([str(k) for k in z["keys"]], z["offsets"], z["kps"], z["sizes"], found)
+                        print(f"[target_index] cache hit: {len(self)} images ({(time.perf_counter() - t0) * 1000:.1f}ms)")
+                        return self
+            except (OSError, KeyError, ValueError) as e:
+                print(f"[target_index] cache ignored: {e}")
+
+        self.build(found)
+        self._save_cache(sig, self._snap)
+        print(f"[target_index] built: {len(self)} images, {len(self._snap.kps)} people "
+              f"({(time.perf_counter() - t0) * 1000:.1f}ms)")
+        return self
+
+    def _save_cache(self, sig, snap):
+        if not snap.found:
+            return
+        try:
+            tmp = self.cache_path + ".tmp.npz"
+            np.savez(tmp, signature=np.array(sig), keys=np.array(snap.keys, dtype=str),
+                     offsets=snap.offsets, kps=snap.kps, sizes=snap.sizes)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            print(f"[target_index] cache not saved: {e}")
+
+    def refresh(self):
+        """
+        다시 스캔해서 바뀐 부분만 반영 -> {"added", "updated", "removed"} 키 목록 (바뀐 게 없으면 모두 빈 목록)
+        파일 상태(mtime/size)가 같은 이미지는 메모리의 키포인트를 그대로 재사용
+        """
+        with self._build_lock:
+            return self._refresh()
+
+    def _refresh(self):
+        t0 = time.perf_counter()
+        found = self._json_files()
+        old = self._snap
+        changes = {
+            "added": [k for k in found if k not in old.found],
+            "updated": [k for k in found if k in old.found and found[k] != old.found[k]],
+            "removed": [k for k in old.found if k not in found],
+        }
+        if not any(changes.values()):
+            return changes
+        reuse = {}
+        for key, i in old.lookup.items():
+            if key in found and found[key] == old.found.get(key):
+                reuse[key] = (list(old.kps[old.offsets[i]:old.offsets[i + 1]]), tuple(int(v) for v in old.sizes[i]))
+        self.build(found, reuse=reuse)
+        self._save_cache(self._signature(found), self._snap)
+        print(f"[target_index] refreshed: +{len(changes['added'])} ~{len(changes['updated'])} "
+              f"-{len(changes['removed'])} -> {len(self)} images ({(time.perf_counter() - t0) * 1000:.1f}ms)")
+        return changes
+
+    # ---- 조회 (각 호출은 한 스냅샷 안에서 처리) ----
+    def people_slice(self, key):
+        """주의: 결과 slice 는 같은 스냅샷의 배열에만 유효 -> 키포인트가 필요하면 people(key)"""
+        return self._snap.people_slice(key)
+
+    def people(self, key):
+        return self._snap.people(key)
+
+    def get(self, key):
+        return self._snap.get(key)
+
+
+def _natural_key(key):
+    # "1/10.jpg" 가 "1/2.jpg" 뒤에 오도록
+    group, name = key.split("/", 1)
+    stem = os.path.splitext(name)[0]
+    return (int(group), int(stem) if stem.isdigit() else float("inf"), name)
@@ -0,0 +1,226 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common.import_data import cv2, np, os, time, datetime
+from common.common import IMG_RESULT_VIDEO_DIR
+from common.pose_score import person_to_array
+from pose_tracking import PoseTracker
+
+# -------------------------
+# 업로드된 세션 영상 분석 (백그라운드)
+# - video/{date}/{session}/{date}.mp4 를 OpenCV 로 스트리밍 디코딩
+# - stride 프레임마다 1장 샘플링 (건너뛰는 프레임은 grab() 만 -> 픽셀 변환 없음)
+# - 샘플 프레임 중 TRACK_DETECT_EVERY 장마다 1장만 검출 (검출 프레임끼리 모아 UltraBackend.infer_batch 배치 추론)
+#   나머지 프레임은 pose_tracking.PoseTracker 가 광류로 추적 -> 사람마다 고정 track_id + 스무딩된 키포인트
+# - 결과는 같은 폴더의 {date}.track.npz (프레임별 키포인트 트랙)
+# - 요청 경로와 분리된 워커 풀에서 실행, 상태는 jobs 로 조회
+# -------------------------
+
+ANALYSIS_WORKERS = int(os.environ.get("POSE_ANALYSIS_WORKERS", "1"))
+ANALYSIS_STRIDE = int(os.environ.get("POSE_ANALYSIS_STRIDE", "3"))
+ANALYSIS_BATCH = int(os.environ.get("POSE_ANALYSIS_BATCH", "8"))
+ANALYSIS_MIN_CONF = float(os.environ.get("POSE_ANALYSIS_MIN_CONF", "0.3"))
+TRACK_DETECT_EVERY = int(os.environ.get("POSE_TRACK_DETECT_EVERY", "3"))   # 1 이면 모든 샘플 프레임 검출
+TRACK_FILTER = os.environ.get("POSE_TRACK_FILTER", "one_euro")             # one_euro | ema | none
+
+TRACK_SUFFIX = ".track.npz"
+
+
+def video_path(date, folder):
+    return os.path.join(IMG_RESULT_VIDEO_DIR, date, str(folder), f"{date}.mp4")
+
+
+def track_path(mp4_path):
+    return os.path.splitext(mp4_path)[0] + TRACK_SUFFIX
+
+
+def iter_sampled_frames(mp4_path, stride):
+    """(frame_idx, time_s, frame_bgr) - stride 프레임마다 1장만 디코딩"""
+    cap = cv2.VideoCapture(mp4_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"cannot open video: {mp4_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    if not (0 < fps < 1000):
+        fps = 30.0   # MediaRecorder webm 은 FPS 메타데이터가 없는 경우가 많음
+    try:
+        idx = 0
+        while True:
+            if idx % stride == 0:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                pos_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+                yield idx, (pos_ms / 1000.0 if pos_ms > 0 else idx / fps), frame
+            elif not cap.grab():
+                break
+            idx += 1
+    finally:
+        cap.release()
+
+
+def save_track(path, track):
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, **track)
+    os.replace(tmp, path)
+
+
+def load_track(path):
+    with np.load(path, allow_pickle=False) as z:
+        return {k: z[k] for k in z.files}
+
+
+class VideoAnalyzer:
+    """백그라운드 포즈 분석 작업 관리 (job_id = "{date}/{folder}")."""
+
+    def __init__(self, workers=ANALYSIS_WORKERS, stride=ANALYSIS_STRIDE, batch_size=ANALYSIS_BATCH,
+                 min_conf=ANALYSIS_MIN_CONF, detect_every=TRACK_DETECT_EVERY, track_filter=TRACK_FILTER):
+        self.stride = max(1, stride)
+        self.batch_size = max(1, batch_size)
+        self.min_conf = min_conf
+        self.detect_every = max(1, detect_every)
+        self.track_filter = track_filter
+        self.jobs = {}
+        self._futures = {}   # job_id -> Future (track() 가 기다릴 때 사용)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="video-analysis")
+        self._backend_obj = None   # 모델 인스턴스는 pose_models.POOL 이 스레드별로 체크아웃
+        self._backend_lock = threading.Lock()
+
+    def _backend(self):
+        with self._backend_lock:   # 모델 로딩 중에도 status() 는 막히지 않게 별도 락
+            if self._backend_obj is None:
+                import make_pose_keypoints as mpk
+                self._backend_obj = mpk.UltraBackend()
+            return self._backend_obj
+
+    def submit(self, date, folder, stride=None):
+        job_id = f"{date}/{folder}"
+        mp4 = video_path(date, folder)
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job and job["state"] in ("queued", "running"):
+                return job_id
+            self.jobs[job_id] = {
+                "job_id": job_id, "state": "queued", "video": mp4, "track": None,
+                "stride": stride or self.stride, "frames": 0, "sampled": 0, "detected": 0, "people": 0,
+                "fps": None, "submitted": datetime.now().isoformat(timespec="seconds"),
+                "elapsed_s": None, "error": None,
+            }
+            self._futures[job_id] = self._pool.submit(self._run, job_id)
+        return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def track(self, date, folder, timeout=None):
+        """
+        세션 트랙 dict. 분석 중이면 끝날 때까지 기다리고,
+        트랙 파일이 없거나 영상보다 오래됐으면 분석을 등록해서 기다림 (분석 워커 안에서 호출하지 말 것)
+        """
+        job_id = f"{date}/{folder}"
+        mp4 = video_path(date, folder)
+        out = track_path(mp4)
+        with self._lock:
+            job = self.jobs.get(job_id)
+            busy = job is not None and job["state"] in ("queued", "running")
+        if not busy and not (os.path.exists(out) and os.path.getmtime(out) >= os.path.getmtime(mp4)):
+            self.submit(date, folder)
+            busy = True
+        if busy:
+            with self._lock:
+                fut = self._futures.get(job_id)
+            if fut is not None:
+                fut.result(timeout=timeout)
+            job = self.status(job_id)
+            if job["state"] != "done":
+                raise RuntimeError(f"video analysis failed: {job['error']}")
+        return load_track(out)
+
+    def _update(self, job_id, **kw):
+        with self._lock:
+            self.jobs[job_id].update(kw)
+
+    def _run(self, job_id):
+        job = self.status(job_id)
+        t0 = time.perf_counter()
+        self._update(job_id, state="running")
+        try:
+            track = self.analyze(job["video"], job["stride"], progress=lambda **kw: self._update(job_id, **kw))
+            out = track_path(job["video"])
+            save_track(out, track)
+            self._update(job_id, state="done", track=out, elapsed_s=round(time.perf_counter() - t0, 2))
+            print(f"[video_analysis] {job_id}: {len(track['frame_idx'])} frames -> {out}")
+        except Exception as e:
+            self._update(job_id, state="error", error=str(e), elapsed_s=round(time.perf_counter() - t0, 2))
+            print(f"[video_analysis] {job_id} failed: {e}")
+
+    def analyze(self, mp4_path, stride, progress=None):
+        """
+        -> track dict (np.savez 용)
+           frame_idx (F,) int32 / time_s (F,) float32 / offsets (F+1,) int32 / detected (F,) bool (검출 프레임)
+           kps (P, 17, 3) float32 px (스무딩) / scores (P,) float32 / track_id (P,) int32 / size (2,) w,h / fps, stride
+        """
+        backend = self._backend()
+        tracker = PoseTracker(detect_every=self.detect_every, filter=self.track_filter)
+        frame_idx, times, counts, detected, kps, scores, track_ids = [], [], [], [], [], [], []
+        size = (0, 0)
+        chunk = []   # (fi, ts, frame, 검출 여부) - 검출 프레임이 batch_size 장 모이면 한 번에 추론
+
+        def flush():
+            keys = [f for _, _, f, det in chunk if det]
+            results = iter(backend.infer_batch(keys, min_conf=self.min_conf) if keys else [])
+            for fi, ts, frame, det in chunk:
+                people = next(results) if det else None
+                arr = scr = None
+                if people is not None:
+                    arr = [person_to_array(p) for p in people]   # slot 순서 (x-center 정렬)
+                    scr = [p.get("score", 0.0) for p in people]
+                out = tracker.update(ts, arr, frame, scores=scr)
+                frame_idx.append(fi)
+                times.append(ts)
+                detected.append(det)
+                counts.append(len(out))
+                for tid, k, sc in out:   # track_id 순 = 고정 slot
+                    track_ids.append(tid)
+                    kps.append(k)
+                    scores.append(sc)
+            chunk.clear()
+            if progress:
+                progress(sampled=len(frame_idx), frames=frame_idx[-1] + 1 if frame_idx else 0,
+                         detected=int(sum(detected)), people=len(kps))
+
+        n_keys = 0
+        for i, (fi, ts, frame) in enumerate(iter_sampled_frames(mp4_path, stride)):
+            if not i:
+                size = (frame.shape[1], frame.shape[0])
+            det = i % self.detect_every == 0
+            if det and n_keys >= self.batch_size:
+                # 검출 프레임 batch_size 장 + 그 사이 추적 프레임이 모임 -> 추론 + 추적
+                flush()
+                n_keys = 0
+            chunk.append((fi, ts, frame, det))
+            n_keys += det
+        if chunk:
+            flush()
+
+        fps = (frame_idx[-1] / times[-1]) if len(frame_idx) > 1 and times[-1] > 0 else 0.0
+        if progress:
+            progress(fps=round(fps, 3))
+        return {
+            "frame_idx": np.asarray(frame_idx, dtype=np.int32),
+            "time_s": np.asarray(times, dtype=np.float32),
+            "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int32),
+            "detected": np.asarray(detected, dtype=bool),
+            "kps": np.stack(kps).astype(np.float32) if kps else np.zeros((0, 17, 3), np.float32),
+            "scores": np.asarray(scores, dtype=np.float32),
+            "track_id": np.asarray(track_ids, dtype=np.int32),
+            "size": np.asarray(size, dtype=np.int32),
+            "fps": np.float32(fps),
+            "stride": np.int32(stride),
+            "detect_every": np.int32(self.detect_every),
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
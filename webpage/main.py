@@ -1,13 +1,79 @@
+import os
+import sys
+
+# 루트의 공용 모듈(pose_store, pose_tracking, pose_models, make_pose_keypoints)은 webpage/ 밖에 있음
+# -> 서버 진입점에서 한 번만 경로에 추가 (common 패키지는 import 시 sys.path 를 바꾸지 않음)
+#    common.target_index 가 import 시점에 pose_store 를 쓰므로 common 보다 먼저
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
 from common import (
     FastAPI, Request, HTMLResponse, RedirectResponse, StaticFiles, Jinja2Templates,
     cv2, mp, Image, np, pd, os, json, shutil, time, datetime,
     IMG_PC_DIR, IMG_RESULT_DIR, MUSIC_DIR, PAGES_HTML_DIR, PAGES_CSS_DIR, PAGES_JS_DIR
 )
-from fastapi.responses import FileResponse
-from fastapi import UploadFile, File
+from fastapi.responses import FileResponse, JSONResponse, Response
+from fastapi import UploadFile, File, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import base64
+import re
+import weakref
+from contextlib import asynccontextmanager, suppress
 
-app = FastAPI()
+from common.import_data import PROFILE_STARTUP, startup_report
+from common.target_index import TargetIndex
+from common.pose_score import keypoints_to_array, score_frames
+from common.group_match import GroupMatcher
+from common.pose_search import PoseSearchIndex
+from common.target_catalog import TargetCatalog
+from common.video_analysis import VideoAnalyzer, video_path
+from common.best_pose import BestPoseExtractor
+from common.render_cache import RenderCache, RENDER_DEFAULT_SIZE, RENDER_MAX_AGE
+from common.static_cache import CachedStaticFiles
+from common.live_infer import LiveBatcher, LIVE_MAX_FRAME_BYTES
+from pose_models import POOL as model_pool
+from common.session_store import (
+    make_session_store, new_session_id, request_session_id, SESSION_COOKIE, SESSION_TTL, SESSION_PURGE_S,
+    SessionNumberAllocator
+)
+
+# -------------------------
+# 서버 시작 / 종료 (lifespan)
+# - 시작: 타겟 인덱스 -> 카탈로그 감시 -> 세션 purge 타이머 -> 결과 이미지 변형 미리 렌더 -> 모델 preload
+# - 종료: 카탈로그 감시 -> purge 타이머 -> 영상 분석 -> 베스트 포즈 풀 -> 렌더 캐시 -> 실시간 배치 -> 모델 풀
+#   (모델을 쓰는 작업을 먼저 멈추고 모델 풀은 마지막에 닫음)
+# - 아래에서 쓰는 전역 객체는 모듈 뒤쪽에서 만들어짐 (lifespan 은 import 가 끝난 뒤 서버가 실행)
+# -------------------------
+@asynccontextmanager
+async def lifespan(app):
+    target_index.load()
+    pose_search.sync()
+    target_catalog.rebuild()
+    target_catalog.start_watch()
+    if PROFILE_STARTUP:
+        print(startup_report())
+    purge = asyncio.create_task(_purge_sessions()) if SESSION_PURGE_S > 0 else None
+    n = await run_in_threadpool(result_static.prerender_variants)
+    if n:
+        print(f"[static] prerendering {n} matching variants in background")
+    await _preload_models()
+    try:
+        yield
+    finally:
+        target_catalog.stop_watch()
+        if purge is not None:
+            purge.cancel()
+            with suppress(asyncio.CancelledError):
+                await purge
+        video_analyzer.shutdown()
+        best_pose.shutdown()
+        render_cache.shutdown()
+        live_batcher.shutdown()
+        model_pool.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # -------------------------
 # 정적 파일 라우팅
@@ -15,11 +81,81 @@ app = FastAPI()
 app.mount("/static/css", StaticFiles(directory=PAGES_CSS_DIR), name="css")
 app.mount("/static/js", StaticFiles(directory=PAGES_JS_DIR), name="js")
 app.mount("/static/images", StaticFiles(directory=IMG_PC_DIR), name="images")
-app.mount("/static/result_images", StaticFiles(directory=IMG_RESULT_DIR), name="result_images")
+# result_images: 지문 URL(?v=) immutable 캐시 / 크기별 변형(?w=) / .json gzip / 영상 Range (common/static_cache.py)
+result_static = CachedStaticFiles(directory=IMG_RESULT_DIR, mount="/static/result_images")
+app.mount("/static/result_images", result_static, name="result_images")
 app.mount("/static/music", StaticFiles(directory=MUSIC_DIR), name="music")
 
 templates = Jinja2Templates(directory=PAGES_HTML_DIR)
 
+# -------------------------
+# 타겟 포즈 인덱스 + 카탈로그 (서버 시작 시 로드)
+# - matching 폴더가 바뀌면 카탈로그 감시 스레드가 바뀐 파일만 다시 읽음 (POSE_CATALOG_POLL_S=0 이면 감시 안 함)
+# -------------------------
+target_index = TargetIndex()
+group_matcher = GroupMatcher(target_index)
+pose_search = PoseSearchIndex(target_index)
+target_catalog = TargetCatalog(target_index, pose_search)
+
+# 전체 타겟 목록 (인원 폴더별 지문 URL + 메타데이터) - 바뀔 때만 새로 만든 본문을 ETag 로 재검증
+@app.get("/target_catalog")
+async def get_target_catalog(request: Request):
+    etag, body, body_gz = target_catalog.response()
+    headers = {"ETag": etag or '""', "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag and request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        body = body_gz
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# -------------------------
+# 세션 영상 분석 워커 (업로드 완료 시 자동 등록, POSE_VIDEO_ANALYSIS=0 이면 수동만)
+# -------------------------
+video_analyzer = VideoAnalyzer()
+VIDEO_AUTO_ANALYZE = os.environ.get("POSE_VIDEO_ANALYSIS", "1") != "0"
+
+# -------------------------
+# 결과 화면 썸네일 / 스켈레톤 오버레이 캐시 (capture_skeleton, matching_skeleton)
+# -------------------------
+render_cache = RenderCache(target_index)
+result_static.render_cache = render_cache   # ?w= 변형도 같은 캐시 사용
+
+# -------------------------
+# 라운드별 베스트 포즈 (결과 전송 시 등록 -> 세션 영상 전 프레임 채점, 베스트 프레임을 캡처로)
+# -------------------------
+def _prerender_best(date, folder, result):
+    render_cache.prerender([("capture", f"{date}/{folder}/{it['best']['image']}", RENDER_DEFAULT_SIZE, True)
+                            for it in result["rounds"] if it["best"] and it["best"]["image"]])
+
+best_pose = BestPoseExtractor(video_analyzer, on_done=_prerender_best)
+
+# 타겟 이미지 지문 URL 목록 -> 클라이언트는 ?v= URL 로 요청 (반복 플레이는 브라우저 캐시에서)
+@app.get("/static_manifest/matching/{players}")
+async def static_manifest(players: str):
+    images = await run_in_threadpool(result_static.manifest, os.path.join("matching", os.path.basename(players)))
+    if images is None:
+        return JSONResponse({"status": "error", "message": "folder not found"}, status_code=404)
+    return JSONResponse({"status": "ok", "images": images}, headers={"Cache-Control": "no-cache"})
+
+# -------------------------
+# 모델 풀 (pose_models.POOL, 워커 프로세스마다 1개)
+# - POSE_MODEL_PRELOAD="yolo:yolov8n-pose.pt,mediapipe:pose-c1" 이면 시작 시 미리 로드 + warm-up
+# -------------------------
+MODEL_PRELOAD = [s.strip() for s in os.environ.get("POSE_MODEL_PRELOAD", "").split(",") if s.strip()]
+
+async def _preload_models():
+    for spec in MODEL_PRELOAD:
+        kind, _, weights = spec.partition(":")
+        try:
+            await run_in_threadpool(model_pool.preload, kind, weights)
+        except Exception as e:
+            print(f"[model_pool] preload {spec} failed: {e}")
+
+@app.get("/models")
+async def models():
+    return {"status": "ok", "max_models": model_pool.max_models, "models": model_pool.stats()}
+
 # -------------------------
 # favicon
 # -------------------------
@@ -41,133 +177,642 @@ async def home(request: Request):
 async def get_setting(request: Request):
     return templates.TemplateResponse("setting.html", {"request": request})
 
+# -------------------------
+# 세션별 상태 (쿠키 pose_sid, POSE_SESSION_BACKEND=memory|sqlite)
+# - 저장소 호출(sqlite 는 디스크 I/O + 잠금 대기)은 스레드풀에서, 만료 세션 정리는 SESSION_PURGE_S 초 주기
+# -------------------------
+session_store = make_session_store()
+# 날짜별 세션 폴더 번호 (capture / video 가 같은 번호 사용)
+session_numbers = SessionNumberAllocator([os.path.join(IMG_RESULT_DIR, "capture"), os.path.join(IMG_RESULT_DIR, "video")])
+
+async def _session(request):
+    """(sid, 세션 필드 dict) - 세션이 없거나 만료됐으면 (sid 또는 None, {})"""
+    sid = request_session_id(request)
+    return sid, (await run_in_threadpool(session_store.get, sid) if sid else None) or {}
+
+def _session_date(session):
+    """/play 에서 폴더 번호를 받은 서버 날짜 (자정을 넘겨도 같은 폴더). 예전 세션은 오늘"""
+    return session.get("session_date") or datetime.now().strftime("%Y-%m-%d")
+
+async def _purge_sessions():
+    while True:
+        await asyncio.sleep(SESSION_PURGE_S)
+        try:
+            await run_in_threadpool(session_store.purge)
+        except Exception as e:
+            print(f"[session] purge failed: {e}")
+
 @app.get("/play", response_class=HTMLResponse)
 async def get_play(request: Request):
     today = datetime.now().strftime("%Y-%m-%d")
 
-    # ---- 캡처 폴더 ----
-    capture_base = os.path.join(IMG_RESULT_DIR, "capture", today)
-    os.makedirs(capture_base, exist_ok=True)
-    subfolders = [f for f in os.listdir(capture_base) if os.path.isdir(os.path.join(capture_base, f))]
-    if not subfolders:
-        folder_nm = "1"
-    else:
-        nums = [int(f) for f in subfolders if f.isdigit()]
-        folder_nm = str(max(nums) + 1 if nums else 1)
-
-    capture_path = os.path.join(capture_base, folder_nm)
-    os.makedirs(capture_path, exist_ok=True)
-
-    # ---- 비디오 폴더 (같은 번호) ----
-    video_base = os.path.join(IMG_RESULT_DIR, "video", today)
-    os.makedirs(video_base, exist_ok=True)
-    video_path = os.path.join(video_base, folder_nm)
-    os.makedirs(video_path, exist_ok=True)
+    # ---- 캡처 / 비디오 폴더 (같은 번호, 원자적 발급) ----
+    folder_nm, (capture_path, video_path) = await run_in_threadpool(session_numbers.allocate, today)
 
-    # ✅ 세션 초기화 + 공통 번호 공유
-    result_store["capture_session"] = folder_nm
-    result_store["capture_count"] = 0
-    result_store["video_session"] = folder_nm
+    # ✅ 세션 초기화 + 공통 번호 공유 (브라우저마다 별도 세션)
+    sid = request_session_id(request) or new_session_id()
+    await run_in_threadpool(session_store.update, sid, capture_session=folder_nm, capture_count=0,
+                            video_session=folder_nm, session_date=today)
 
     print(f"[play] new session started: capture={capture_path}, video={video_path}")
-    return templates.TemplateResponse("play.html", {"request": request})
+    response = templates.TemplateResponse("play.html", {"request": request})
+    response.set_cookie(SESSION_COOKIE, sid, max_age=SESSION_TTL, httponly=True, samesite="lax")
+    return response
 
 # -------------------------
-# 결과 데이터 보관소
+# 결과 데이터 (세션의 latest 필드)
 # -------------------------
-result_store = {}
-
 @app.post("/result_redirect")
 async def result_redirect(request: Request):
     data = await request.json()
+    sid, session = await _session(request)
+    sid = sid or new_session_id()
 
-    result_store["latest"] = {
-        "date": data.get("date"),
-        "folder": data.get("folder"),
+    # 날짜 / 폴더는 세션 값 (영상·캡처를 저장한 서버 날짜). 클라이언트 값은 세션이 없을 때 화면 표시용으로만
+    from_session = "video_session" in session
+    latest = {
+        "date": _session_date(session) if from_session else data.get("date"),
+        "folder": session["video_session"] if from_session else data.get("folder"),
         "player": data.get("player"),
         "max_image": data.get("max_image"),
         "images_nm": data.get("images_nm", []),
         "images_ac": data.get("images_ac", []),
         "best_ac": data.get("best_ac", 0),
-        "targets": data.get("targets", [])
+        "targets": data.get("targets", []),
+        "round_marks": data.get("round_marks") or [],  # [[시작 s, 캡처 s], ...] (녹화 시작 기준)
+        "record_s": data.get("record_s")                # 클라이언트가 잰 녹화 길이 (marks -> 영상 시간 환산)
     }
 
+    # 세션 영상에서 라운드별 베스트 포즈 추출 (영상 분석이 끝나면 이어서 실행)
+    if from_session and _valid_session_dir(latest["date"], latest["folder"]) and latest["targets"]:
+        snap = target_index.snapshot()
+        targets = [snap.people(f"{latest['player']}/{t}") for t in latest["targets"]]
+        latest["best_pose"] = best_pose.submit(str(latest["date"]), str(latest["folder"]), latest["player"],
+                                               latest["targets"], targets, latest["round_marks"],
+                                               _positive_float(latest["record_s"]))
+    await run_in_threadpool(session_store.update, sid, latest=latest)
+
+    # 결과 화면에서 쓸 썸네일 + 스켈레톤을 미리 생성
+    render_cache.prerender(
+        [("capture", f"{latest['date']}/{latest['folder']}/{nm}", RENDER_DEFAULT_SIZE, True) for nm in latest["images_nm"] or []] +
+        [("matching", f"{latest['player']}/{t}", RENDER_DEFAULT_SIZE, True) for t in latest["targets"] or []]
+    )
+
     # ✅ 게임 종료 후 세션 정리
-    if "capture_session" in result_store:
-        del result_store["capture_session"]
-    if "capture_count" in result_store:
-        del result_store["capture_count"]
-    if "video_session" in result_store:
-        del result_store["video_session"]
+    await run_in_threadpool(session_store.discard, sid, "capture_session", "capture_count", "video_session",
+                            "session_date")
 
-    return RedirectResponse(url="/result", status_code=303)
+    response = RedirectResponse(url="/result", status_code=303)
+    response.set_cookie(SESSION_COOKIE, sid, max_age=SESSION_TTL, httponly=True, samesite="lax")
+    return response
 
 @app.get("/result", response_class=HTMLResponse)
 async def get_result(request: Request):
-    data = result_store.get("latest", {})
+    data = (await _session(request))[1].get("latest", {})
     return templates.TemplateResponse("result.html", {
         "request": request,
         "data": data
     })
 
+# -------------------------
+# 업로드 공통 (청크 단위로 디스크에 기록, 쓰기는 스레드풀에서)
+# - 크기 제한/청크 크기는 환경 변수로 조정
+# -------------------------
+UPLOAD_CHUNK_SIZE = int(os.environ.get("POSE_UPLOAD_CHUNK_KB", "1024")) * 1024
+UPLOAD_MAX_BYTES = int(os.environ.get("POSE_UPLOAD_MAX_MB", "1024")) * 1024 * 1024
+CAPTURE_MAX_BYTES = int(os.environ.get("POSE_CAPTURE_MAX_MB", "16")) * 1024 * 1024
+CAPTURE_MIN_BYTES = 128   # 헤더(SOI/DQT/SOF/DHT/SOS) + EOI 만으로도 100 바이트가 넘음
+_UPLOAD_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# 세션 폴더 경로에 쓰는 값 (video/{date}/{folder}) - 형식이 다르면 경로를 만들지 않음
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_FOLDER_RE = re.compile(r"^\d{1,9}$")
+
+def _valid_session_dir(date, folder):
+    return bool(_DATE_RE.match(str(date or ""))) and bool(_FOLDER_RE.match(str(folder or "")))
+
+def _positive_float(value):
+    """클라이언트 숫자 값 -> 양수 float 또는 None (형식이 틀리면 무시)"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if 0 < value < float("inf") else None
+
+def _bad_session_dir():
+    return JSONResponse({"status": "error", "message": "invalid date/folder"}, status_code=400)
+
+class UploadTooLarge(Exception):
+    pass
+
+async def _write_stream(chunks, path, mode="wb", start_size=0, max_bytes=UPLOAD_MAX_BYTES):
+    """async 청크 이터레이터 -> 파일. 누적 크기가 max_bytes 를 넘으면 중단."""
+    size = start_size
+    f = await run_in_threadpool(open, path, mode)
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+            await run_in_threadpool(f.write, chunk)
+    finally:
+        await run_in_threadpool(f.close)
+    return size
+
+def _is_jpeg(path, size):
+    """SOI(FFD8FF) 로 시작하고 EOI(FFD9) 로 끝나는지 (끝의 0 패딩은 허용) - 잘린/다른 형식 파일 거부"""
+    if size < CAPTURE_MIN_BYTES:
+        return False
+    with open(path, "rb") as f:
+        head = f.read(3)
+        f.seek(max(0, size - 64))
+        tail = f.read().rstrip(b"\x00")
+    return head == b"\xff\xd8\xff" and tail.endswith(b"\xff\xd9")
+
+def _write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+def _too_large(e):
+    return JSONResponse({"status": "error", "message": str(e)}, status_code=413)
+
+def _ingest_ms(t0):
+    return round((time.perf_counter() - t0) * 1000, 2)
+
+# -------------------------
+# 썸네일 / 스켈레톤 오버레이 (result 화면)
+# GET /render/capture/{date}/{folder}/{name}?size=640&skeleton=1
+# GET /render/matching/{players}/{name}?size=640&skeleton=1
+# - 캐시 파일 이름(sha1)이 곧 ETag -> If-None-Match 가 같으면 렌더링/파일 읽기 없이 304
+# -------------------------
+@app.get("/render/{kind}/{path:path}")
+async def render(request: Request, kind: str, path: str, size: int = RENDER_DEFAULT_SIZE, skeleton: int = 1):
+    found = await run_in_threadpool(render_cache.lookup, kind, path, size, bool(skeleton))
+    if found is None:
+        return JSONResponse({"status": "error", "message": "image not found"}, status_code=404)
+    headers = {"ETag": f'"{found[1]}"', "Cache-Control": f"public, max-age={RENDER_MAX_AGE}"}
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    result = await run_in_threadpool(render_cache.get, kind, path, size, bool(skeleton))
+    if result is None:
+        return JSONResponse({"status": "error", "message": "cannot decode image"}, status_code=422)
+    headers["ETag"] = result[1]
+    return FileResponse(result[0], media_type="image/jpeg", headers=headers)
+
 # -------------------------
 # 캡처 (현재 세션 폴더에 저장)
 # -------------------------
+async def _next_capture_path(sid, session):
+    today = _session_date(session)
+    base_folder = os.path.join(IMG_RESULT_DIR, "capture", today)
+    folder_nm = session["capture_session"]
+    subfolder_path = os.path.join(base_folder, folder_nm)
+
+    # 파일 번호 증가 (원자적 - 같은 세션의 동시 요청도 번호가 겹치지 않음)
+    idx = await run_in_threadpool(session_store.incr, sid, "capture_count")
+    filename = f"{today}_{idx}.jpg"
+    return folder_nm, filename, os.path.join(subfolder_path, filename)
+
 @app.post("/capture")
 async def capture(req: Request):
-    if "capture_session" not in result_store:
+    """(호환용) JSON + base64 data URL 캡처"""
+    t0 = time.perf_counter()
+    sid, session = await _session(req)
+    if "capture_session" not in session:
         return {"status": "error", "message": "No active capture session. /play 먼저 실행하세요."}
 
     data = await req.json()
     image = data["image"]
 
-    today = datetime.now().strftime("%Y-%m-%d")
-    base_folder = os.path.join(IMG_RESULT_DIR, "capture", today)
-    folder_nm = result_store["capture_session"]
-    subfolder_path = os.path.join(base_folder, folder_nm)
+    folder_nm, filename, filepath = await _next_capture_path(sid, session)
+    await run_in_threadpool(_write_file, filepath, base64.b64decode(image.split(",")[1]))
 
-    # 파일 번호 증가
-    result_store["capture_count"] += 1
-    idx = result_store["capture_count"]
-    filename = f"{today}_{idx}.jpg"
-    filepath = os.path.join(subfolder_path, filename)
+    ms = _ingest_ms(t0)
+    print(f"[capture] saved {filepath} ({ms}ms)")
+    return JSONResponse({"status": "ok", "session": folder_nm, "saved": filename, "ingest_ms": ms},
+                        headers={"Server-Timing": f"ingest;dur={ms}"})
 
-    with open(filepath, "wb") as f:
-        f.write(base64.b64decode(image.split(",")[1]))
+@app.post("/capture_raw")
+async def capture_raw(req: Request, round: int = 0, attempt: int = 0):
+    """바이너리 캡처: 본문 = JPEG 바이트 그대로 (Content-Type: image/jpeg). base64 변환·메모리 복사 없음."""
+    t0 = time.perf_counter()
+    sid, session = await _session(req)
+    if "capture_session" not in session:
+        return {"status": "error", "message": "No active capture session. /play 먼저 실행하세요."}
+    ctype = req.headers.get("content-type", "")
+    if not ctype.startswith("image/"):
+        return JSONResponse({"status": "error", "message": f"unsupported content-type: {ctype}"}, status_code=415)
+
+    folder_nm, filename, filepath = await _next_capture_path(sid, session)
+    tmp_path = filepath + ".tmp"
+    try:
+        size = await _write_stream(req.stream(), tmp_path, max_bytes=CAPTURE_MAX_BYTES)
+        if not await run_in_threadpool(_is_jpeg, tmp_path, size):
+            return JSONResponse({"status": "error", "message": "invalid or truncated jpeg"}, status_code=422)
+        os.replace(tmp_path, filepath)
+    except UploadTooLarge as e:
+        return _too_large(e)
+    finally:
+        # 거부 / 한도 초과 / 연결 끊김: 이름을 바꾸지 못한 임시 파일은 남기지 않음
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-    print(f"[capture] saved {filepath}")
-    return {"status": "ok", "session": folder_nm, "saved": filename}
+    ms = _ingest_ms(t0)
+    print(f"[capture] saved {filepath} (attempt={attempt}, round={round}, {size} bytes, {ms}ms)")
+    return JSONResponse({"status": "ok", "session": folder_nm, "saved": filename, "ingest_ms": ms},
+                        headers={"Server-Timing": f"ingest;dur={ms}"})
 
 # -------------------------
 # 비디오 업로드 (세션 폴더에 저장)
+# - 업로드 본문은 UPLOAD_CHUNK_SIZE 단위로 디스크에 바로 기록 (파일 전체를 메모리에 올리지 않음)
 # -------------------------
+def _video_session_dir(session):
+    today = _session_date(session)
+    folder_nm = session["video_session"]
+    subfolder_path = os.path.join(IMG_RESULT_DIR, "video", today, folder_nm)
+    os.makedirs(subfolder_path, exist_ok=True)
+    return today, folder_nm, subfolder_path
+
+async def _iter_upload_file(file: UploadFile):
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
 @app.post("/upload_video")
-async def upload_video(file: UploadFile = File(...)):
-    if "video_session" not in result_store:
+async def upload_video(request: Request, file: UploadFile = File(...)):
+    session = (await _session(request))[1]
+    if "video_session" not in session:
         return {"status": "error", "message": "No active video session. /play 먼저 실행하세요."}
 
-    today = datetime.now().strftime("%Y-%m-%d")
-    base_folder = os.path.join(IMG_RESULT_DIR, "video", today)
-    folder_nm = result_store["video_session"]
-    subfolder_path = os.path.join(base_folder, folder_nm)
-    os.makedirs(subfolder_path, exist_ok=True)
-
+    today, folder_nm, subfolder_path = _video_session_dir(session)
     mp4_path = os.path.join(subfolder_path, f"{today}.mp4")
+    tmp_path = mp4_path + ".tmp"
 
     try:
-        with open(mp4_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        await _write_stream(_iter_upload_file(file), tmp_path)
+        os.replace(tmp_path, mp4_path)
+    except UploadTooLarge as e:
+        os.remove(tmp_path)
+        return _too_large(e)
     except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         return {"status": "error", "message": str(e)}
 
     web_path = f"/static/result_images/video/{today}/{folder_nm}/{today}.mp4"
     print(f"[upload_video] saved {mp4_path}")
-    return {"status": "ok", "path": web_path}
+    job_id = video_analyzer.submit(today, folder_nm) if VIDEO_AUTO_ANALYZE else None
+    return {"status": "ok", "path": web_path, "analysis": job_id}
+
+# -------------------------
+# 분할(이어 올리기) 업로드
+# 1) POST /upload_video/chunk?upload_id=..&offset=N  (본문 = 원시 바이트)
+#    offset 이 서버에 받은 크기와 다르면 409 + {"received"} -> 클라이언트는 그 위치부터 다시 전송
+# 2) GET  /upload_video/status?upload_id=..          -> {"received"}
+# 3) POST /upload_video/complete?upload_id=..&size=N -> {today}.mp4 로 확정
+# -------------------------
+def _part_path(session, upload_id):
+    if not _UPLOAD_ID_RE.match(upload_id or ""):
+        return None
+    _, _, subfolder_path = _video_session_dir(session)
+    return os.path.join(subfolder_path, f".{upload_id}.part")
+
+# .part 파일별 잠금 (offset 확인 ~ 기록 ~ 확정을 한 요청씩) - 쓰는 요청이 없으면 자동으로 사라짐
+_part_locks = weakref.WeakValueDictionary()
+
+def _part_lock(part):
+    lock = _part_locks.get(part)
+    if lock is None:
+        lock = _part_locks[part] = asyncio.Lock()
+    return lock
+
+@app.post("/upload_video/chunk")
+async def upload_video_chunk(req: Request, upload_id: str, offset: int = 0):
+    session = (await _session(req))[1]
+    if "video_session" not in session:
+        return {"status": "error", "message": "No active video session. /play 먼저 실행하세요."}
+    part = _part_path(session, upload_id)
+    if part is None:
+        return JSONResponse({"status": "error", "message": "invalid upload_id"}, status_code=400)
+
+    async with _part_lock(part):
+        received = os.path.getsize(part) if os.path.exists(part) else 0
+        if offset != received:
+            return JSONResponse({"status": "error", "message": "offset mismatch", "received": received},
+                                status_code=409)
+
+        done = False
+        try:
+            size = await _write_stream(req.stream(), part, mode="ab", start_size=received)
+            done = True
+        except UploadTooLarge as e:
+            return _too_large(e)
+        finally:
+            # 한도 초과 / 연결 끊김 / 기타 오류: 이번 청크는 버림 (다음 요청은 received 부터 다시)
+            if not done and os.path.exists(part):
+                os.truncate(part, received)
+    return {"status": "ok", "received": size}
+
+@app.get("/upload_video/status")
+async def upload_video_status(req: Request, upload_id: str):
+    session = (await _session(req))[1]
+    if "video_session" not in session:
+        return {"status": "error", "message": "No active video session. /play 먼저 실행하세요."}
+    part = _part_path(session, upload_id)
+    if part is None:
+        return JSONResponse({"status": "error", "message": "invalid upload_id"}, status_code=400)
+    return {"status": "ok", "received": os.path.getsize(part) if os.path.exists(part) else 0}
+
+@app.post("/upload_video/complete")
+async def upload_video_complete(req: Request, upload_id: str, size: int = -1):
+    session = (await _session(req))[1]
+    if "video_session" not in session:
+        return {"status": "error", "message": "No active video session. /play 먼저 실행하세요."}
+    part = _part_path(session, upload_id)
+    if part is None:
+        return JSONResponse({"status": "error", "message": "unknown upload_id"}, status_code=404)
+    async with _part_lock(part):   # 기록 중인 청크가 끝난 뒤에 확정
+        if not os.path.exists(part):
+            return JSONResponse({"status": "error", "message": "unknown upload_id"}, status_code=404)
+        received = os.path.getsize(part)
+        if size >= 0 and size != received:
+            return JSONResponse({"status": "error", "message": "size mismatch", "received": received},
+                                status_code=409)
+
+        today, folder_nm, subfolder_path = _video_session_dir(session)
+        mp4_path = os.path.join(subfolder_path, f"{today}.mp4")
+        os.replace(part, mp4_path)
+
+    web_path = f"/static/result_images/video/{today}/{folder_nm}/{today}.mp4"
+    print(f"[upload_video] assembled {mp4_path} ({received} bytes)")
+    job_id = video_analyzer.submit(today, folder_nm) if VIDEO_AUTO_ANALYZE else None
+    return {"status": "ok", "path": web_path, "size": received, "analysis": job_id}
+
+# -------------------------
+# 영상 분석 (백그라운드 작업 등록 / 상태 조회)
+# -------------------------
+@app.post("/analyze_video")
+async def analyze_video(req: Request):
+    data = await req.json()
+    date, folder = str(data.get("date", "")), str(data.get("folder", ""))
+    if not _valid_session_dir(date, folder):
+        return _bad_session_dir()
+    stride = data.get("stride")
+    if stride is not None and (isinstance(stride, bool) or not str(stride).isdigit() or int(stride) < 1):
+        return JSONResponse({"status": "error", "message": "stride must be a positive integer"}, status_code=400)
+    if not os.path.exists(video_path(date, folder)):
+        return JSONResponse({"status": "error", "message": "video not found"}, status_code=404)
+    job_id = video_analyzer.submit(date, folder, stride=int(stride) if stride else None)
+    return {"status": "ok", "job_id": job_id}
+
+@app.get("/analyze_video/{date}/{folder}")
+async def analyze_video_status(date: str, folder: str):
+    if not _valid_session_dir(date, folder):
+        return _bad_session_dir()
+    job = video_analyzer.status(f"{date}/{folder}")
+    if job is None:
+        return JSONResponse({"status": "error", "message": "no analysis job"}, status_code=404)
+    job["status"] = "ok"
+    return job
+
+# 라운드별 베스트 포즈: 진행 중이면 state 만, 끝났으면 result (라운드별 베스트 프레임 + 유사도 시계열)
+@app.get("/best_pose/{date}/{folder}")
+async def best_pose_status(date: str, folder: str):
+    if not _valid_session_dir(date, folder):
+        return _bad_session_dir()
+    job = best_pose.status(f"{date}/{folder}")
+    if job is None or job["state"] == "done":
+        result = job["result"] if job else await run_in_threadpool(best_pose.load, date, folder)
+        if result is None:
+            return JSONResponse({"status": "error", "message": "no best pose result"}, status_code=404)
+        return {"status": "ok", "state": "done", "result": result}
+    job["status"] = "ok"
+    return job
+
+# -------------------------
+# 타겟 포즈 (미리 추출된 키포인트 + 정규화 벡터)
+# -------------------------
+@app.get("/target_pose/{players}/{filename}")
+async def target_pose(players: str, filename: str):
+    item = target_index.get(f"{players}/{filename}")
+    if item is None:
+        return JSONResponse({"status": "error", "message": "target not indexed"}, status_code=404)
+    return item
+
+# -------------------------
+# 서버 채점 (여러 프레임 일괄)
+# body: {"frames": [{"live": [person, ...], "target": "2/1.jpg" | [person, ...]}], "mode": "greedy" | "optimal"}
+#   person = [{name,x,y,score}, ...] 또는 COCO 순서 [[x,y,score] x 17] (파싱이 빠름)
+# -------------------------
+def _people_array(people):
+    """요청의 사람 목록 -> (n, 17, 3) float32"""
+    people = people or []
+    if not people:
+        return np.zeros((0, 17, 3), np.float32)
+    if isinstance(people[0], list) and people[0] and not isinstance(people[0][0], dict):
+        return np.asarray(people, dtype=np.float32).reshape(len(people), 17, 3)
+    return np.stack([keypoints_to_array(p) for p in people])
+
+@app.post("/score")
+async def score(req: Request):
+    t0 = time.perf_counter()
+    data = await req.json()
+    frames = data.get("frames", [])
+    mode = data.get("mode", "greedy")
+    if mode not in ("greedy", "optimal"):
+        return JSONResponse({"status": "error", "message": f"unknown mode: {mode}"}, status_code=400)
+
+    live, targets, missing = [], [], []
+    for i, fr in enumerate(frames):
+        live.append(_people_array(fr.get("live")))
+        tgt = fr.get("target")
+        if isinstance(tgt, str):
+            arr = target_index.people(tgt)
+            if arr is None:
+                missing.append(i)
+                targets.append(np.zeros((0, 17, 3), np.float32))
+            else:
+                targets.append(arr)
+        else:
+            targets.append(_people_array(tgt))
+
+    scores = score_frames(live, targets, mode=mode)
+    scores[missing] = 0.0
+    return {
+        "status": "ok",
+        "count": len(frames),
+        "scores": [round(float(s), 6) for s in scores],
+        # JS Math.round(sim * 100) 와 같은 반올림
+        "percent": [int(p) for p in np.floor(scores * 100 + 0.5)],
+        "missing_targets": missing,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3),
+    }
+
+# -------------------------
+# 단체 매칭 (최적 배정 + 짝/관절별 점수)
+# body: {"live": [person, ...], "target": "3/5.jpg", "mode": "optimal" | "greedy"}
+# -------------------------
+@app.post("/match")
+async def match(req: Request):
+    data = await req.json()
+    mode = data.get("mode", "optimal")
+    if mode not in ("greedy", "optimal"):
+        return JSONResponse({"status": "error", "message": f"unknown mode: {mode}"}, status_code=400)
+    result = group_matcher.match(_people_array(data.get("live")), data.get("target", ""), mode=mode)
+    if result is None:
+        return JSONResponse({"status": "error", "message": "target not indexed"}, status_code=404)
+    result["status"] = "ok"
+    return result
+
+# -------------------------
+# 비슷한 타겟 검색 (common/pose_search.py)
+# body: {"live": [person, ...]} 또는 {"target": "2/1.jpg"} (질의 포즈, diverse 는 생략 가능)
+#       "players": "2" (생략 시 target 의 폴더 / live 의 사람 수), "mode": "nearest" | "diverse", "k": 10,
+#       "weights": {"left_wrist": 2.0, ...} (관절별 가중치, 기본 1), "exclude": ["2/1.jpg"], "pool": 200, "seed": 0
+# -------------------------
+@app.post("/pose_search")
+async def search_poses(req: Request):
+    t0 = time.perf_counter()
+    data = await req.json()
+    mode = data.get("mode", "nearest")
+    if mode not in ("nearest", "diverse"):
+        return JSONResponse({"status": "error", "message": f"unknown mode: {mode}"}, status_code=400)
+    tgt = data.get("target")
+    if tgt:
+        arr = target_index.people(tgt)
+        if arr is None:
+            return JSONResponse({"status": "error", "message": "target not indexed"}, status_code=404)
+        q = pose_search.query_vectors(arr)
+        players = data.get("players") or tgt.split("/", 1)[0]
+    elif data.get("live") is not None:
+        q = pose_search.query_vectors(_people_array(data["live"]))
+        players = data.get("players") or len(q)
+    else:
+        q, players = None, data.get("players")
+    if q is not None and not len(q):
+        return JSONResponse({"status": "error", "message": "no valid pose in query"}, status_code=400)
+    if q is None and mode == "nearest":
+        return JSONResponse({"status": "error", "message": "nearest needs live or target"}, status_code=400)
+
+    exclude = data.get("exclude") or []
+    try:
+        if mode == "nearest":
+            found = pose_search.nearest(players, q, k=data.get("k", 10), weights=data.get("weights"), exclude=exclude)
+        else:
+            found = pose_search.diverse(players, k=data.get("k", 10), q=q, weights=data.get("weights"),
+                                        pool=int(data.get("pool", 200)), exclude=exclude, seed=data.get("seed"))
+    except (ValueError, TypeError) as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
+    if found is None:
+        return JSONResponse({"status": "error", "message": f"no targets for players={players}"}, status_code=404)
+    return {
+        "status": "ok",
+        "mode": mode,
+        "players": str(players),
+        "results": [{"image": key, "score": None if sc is None else round(sc, 6)} for key, sc in found],
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3),
+    }
+
+@app.get("/pose_search")
+async def pose_search_info():
+    return {"status": "ok", "groups": pose_search.info()}
+
+# -------------------------
+# 실시간 채점 WebSocket (WebGL 이 없는 저사양 클라이언트는 서버에서 추론)
+# - 텍스트 {"type": "target", "target": "2/1.jpg", "mode": "greedy"}  -> 채점할 타겟 설정
+# - 텍스트 {"type": "keypoints", "seq": n, "people": [person, ...]}   -> 클라이언트 키포인트 채점만
+# - 바이너리 = 축소한 JPEG 프레임 1장 (seq 는 연결마다 1부터) -> 서버 추론 + 채점
+#   응답 {"type": "pose", "seq", "size", "people", "score", "percent", "latency_ms", ...}
+#   처리 전에 다음 프레임이 오면 {"type": "dropped", "seq", "reason"} (common/live_infer.py)
+# -------------------------
+live_batcher = LiveBatcher()
+
+def _live_target(data):
+    """target 메시지 -> ((m, 17, 3) 또는 None, 오류 메시지)"""
+    tgt = data.get("target")
+    if tgt is None:
+        return None, None
+    if isinstance(tgt, str):
+        arr = target_index.people(tgt)
+        if arr is None:
+            return None, "target not indexed"
+        return arr, None
+    return _people_array(tgt), None
+
+@app.websocket("/ws/live")
+async def live_ws(ws: WebSocket):
+    await ws.accept()
+    conn = live_batcher.new_conn()
+    target, mode, seq = None, "greedy", 0
+    outbox = asyncio.Queue()
+
+    async def sender():
+        while True:
+            await ws.send_json(await outbox.get())
+
+    def on_done(fut):
+        if not fut.cancelled():
+            outbox.put_nowait(fut.result())
+
+    send_task = asyncio.create_task(sender())
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            if msg.get("bytes") is not None:
+                seq += 1
+                if len(msg["bytes"]) > LIVE_MAX_FRAME_BYTES:
+                    outbox.put_nowait({"type": "error", "seq": seq, "message": "frame too large"})
+                    continue
+                live_batcher.submit(conn, seq, msg["bytes"], target, mode).add_done_callback(on_done)
+                continue
+            try:
+                data = json.loads(msg.get("text") or "{}")
+            except ValueError:
+                outbox.put_nowait({"type": "error", "message": "invalid json"})
+                continue
+            kind = data.get("type")
+            if kind == "target":
+                new_mode = data.get("mode", mode)
+                if new_mode not in ("greedy", "optimal"):
+                    outbox.put_nowait({"type": "error", "message": f"unknown mode: {new_mode}"})
+                    continue
+                new_target, err = _live_target(data)
+                if err:
+                    outbox.put_nowait({"type": "target", "status": "error", "message": err})
+                    continue
+                target, mode = new_target, new_mode
+                outbox.put_nowait({"type": "target", "status": "ok", "mode": mode,
+                                   "people": 0 if target is None else len(target)})
+            elif kind == "keypoints":
+                live = _people_array(data.get("people"))
+                s = None if target is None else float(score_frames([live], [target], mode=mode)[0])
+                outbox.put_nowait({"type": "score", "seq": data.get("seq"), "people": len(live),
+                                   "score": None if s is None else round(s, 6),
+                                   "percent": None if s is None else int(np.floor(s * 100 + 0.5))})
+            else:
+                outbox.put_nowait({"type": "error", "message": f"unknown message type: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        live_batcher.cancel(conn)
+        send_task.cancel()
+
+@app.get("/live/stats")
+async def live_stats():
+    return {"status": "ok", **live_batcher.info()}
 
 # -------------------------
 # 실행
 # -------------------------
 if __name__ == "__main__":
     import uvicorn
+    if "--profile-startup" in sys.argv:
+        # reload 서브프로세스에도 전달되도록 환경 변수로
+        os.environ["POSE_PROFILE_STARTUP"] = "1"
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
@@ -5,19 +5,19 @@ YOLOv8-Pose 기반 포즈 키포인트 추출 (실패율 개선 버전)
 - min_conf 강화 (0.5 이상)
 - Top-1 인물 선택 시 keypoints 수 + 평균 점수 고려
 - 실패 JSON에 meta.failed=True 기록
+- 증분 재색인: matching/.pose_manifest.json 기준 신규·변경·모델 변경 이미지만 처리
 """
 
 import os, sys, json, argparse, datetime, shutil
+import importlib.util
 from pathlib import Path
 import cv2
 import numpy as np
 
-try:
-    from ultralytics import YOLO
-except ImportError:
-    print("[ERROR] ultralytics 라이브러리가 없습니다. 먼저 실행하세요:")
-    print("  pip install ultralytics opencv-python numpy tqdm")
-    sys.exit(1)
+# 루트의 공용 모듈(pose_manifest 등) 사용
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from pose_manifest import Manifest, find_matching_root
+from pose_models import POOL
 
 try:
     from tqdm import tqdm
@@ -105,8 +105,15 @@ def main():
     ap.add_argument("--min_conf", type=float, default=0.5, help="탐지 임계값")
     ap.add_argument("--imgsz", type=int, default=960, help="입력 이미지 크기")
     ap.add_argument("--overwrite", action="store_true", help="기존 JSON 덮어쓰기")
+    ap.add_argument("--no-manifest", action="store_true", help="매니페스트 무시 (JSON 존재 여부로만 skip)")
     args = ap.parse_args()
 
+    # ultralytics 는 모델 풀이 처음 로드할 때 import (여기서는 설치 여부만 확인)
+    if importlib.util.find_spec("ultralytics") is None:
+        print("[ERROR] ultralytics 라이브러리가 없습니다. 먼저 실행하세요:")
+        print("  pip install ultralytics opencv-python numpy tqdm")
+        sys.exit(1)
+
     root = Path(args.root).resolve()
     if not root.is_dir():
         print(f"[ERROR] 폴더가 없습니다: {root}")
@@ -117,37 +124,67 @@ def main():
         print("[INFO] 이미지가 없습니다.")
         return
 
-    model = YOLO(args.model)
-    ok, fail = 0, 0
+    producer = f"yolo:{Path(args.model).name}:imgsz{args.imgsz}:conf{args.min_conf}"
+    manifest = None if args.no_manifest else Manifest.open(find_matching_root(str(root)), tool="make_pose_keypoints_yolo")
 
-    for img_path in tqdm(sorted(targets), desc="processing"):
+    todo = []
+    for img_path in sorted(targets):
         json_path = os.path.splitext(img_path)[0] + ".json"
-        if (not args.overwrite) and os.path.exists(json_path):
-            continue
-
-        img = cv2.imread(img_path)
-        if img is None:
-            print(f"[WARN] 이미지 로드 실패: {img_path}")
-            continue
-
-        h, w = img.shape[:2]
-        people = extract_with_yolo(img, model, min_conf=args.min_conf, device=args.device, imgsz=args.imgsz)
-
-        if not people:
-            save_json(json_path, {"bbox": {}, "keypoints": []}, (w, h), args.model, failed=True)
-            fail += 1
-            continue
-
-        # Top-1 선택: keypoints 수 > 평균 점수 > bbox 크기
-        people_sorted = sorted(
-            people,
-            key=lambda p: (p["num_valid"], p["avg_score"], p["bbox"]["w"]*p["bbox"]["h"]),
-            reverse=True
-        )
-        save_json(json_path, people_sorted[0], (w, h), args.model, failed=False)
-        ok += 1
-
-    print(f"[DONE] 성공: {ok} / 실패: {fail} (총 {len(targets)})")
+        if args.overwrite:
+            todo.append(img_path)
+        elif manifest is None:
+            if not os.path.exists(json_path):
+                todo.append(img_path)
+        else:
+            need, why = manifest.needs_update(img_path, producer, outputs=[json_path])
+            if why == "new" and os.path.exists(json_path):
+                # 매니페스트 이전에 만들어진 JSON 은 그대로 채택
+                manifest.record(img_path, producer)
+            elif need:
+                todo.append(img_path)
+
+    if not todo:
+        if manifest:
+            manifest.save()
+        print(f"[DONE] 변경된 이미지 없음 (총 {len(targets)})")
+        return
+
+    # 공용 모델 풀 (로드 + warm-up 1회, imgsz/device 별로 보관)
+    with POOL.checkout("yolo", args.model, imgsz=args.imgsz, device=args.device) as model:
+        ok, fail = 0, 0
+
+        for img_path in tqdm(todo, desc="processing"):
+            json_path = os.path.splitext(img_path)[0] + ".json"
+
+            img = cv2.imread(img_path)
+            if img is None:
+                print(f"[WARN] 이미지 로드 실패: {img_path}")
+                continue
+
+            h, w = img.shape[:2]
+            people = extract_with_yolo(img, model, min_conf=args.min_conf, device=args.device, imgsz=args.imgsz)
+
+            if not people:
+                save_json(json_path, {"bbox": {}, "keypoints": []}, (w, h), args.model, failed=True)
+                if manifest:
+                    manifest.record(img_path, producer)
+                fail += 1
+                continue
+
+            # Top-1 선택: keypoints 수 > 평균 점수 > bbox 크기
+            people_sorted = sorted(
+                people,
+                key=lambda p: (p["num_valid"], p["avg_score"], p["bbox"]["w"]*p["bbox"]["h"]),
+                reverse=True
+            )
+            save_json(json_path, people_sorted[0], (w, h), args.model, failed=False)
+            if manifest:
+                manifest.record(img_path, producer)
+            ok += 1
+
+    if manifest:
+        manifest.save()
+    print(f"[DONE] 성공: {ok} / 실패: {fail} / 변경 없음: {len(targets) - len(todo)} (총 {len(targets)})")
 
 if __name__ == "__main__":
     main()
@@ -232,11 +232,11 @@
     const src=imgEl.getAttribute("src")||"";
     if(!src) return;
 
-    const toMulti=src.replace(/\.(jpg|jpeg|png)$/i,".multi.json");
-    const toSingle=src.replace(/\.(jpg|jpeg|png)$/i,".json");
+    const toMulti=src.replace(/\.(jpg|jpeg|png)(\?.*)?$/i,".multi.json");
+    const toSingle=src.replace(/\.(jpg|jpeg|png)(\?.*)?$/i,".json");
 
-    try{ const r=await fetch(toMulti,{cache:"no-store"}); if(r.ok){ const d=await r.json(); if(Array.isArray(d?.people)){ d.people.sort((a,b)=>((a.bbox?.x??0)+(a.bbox?.w??0)/2)-((b.bbox?.x??0)+(b.bbox?.w??0)/2)); poseMetaMulti=d; } } }catch(_){}
-    try{ const r=await fetch(toSingle,{cache:"no-store"}); if(r.ok){ const d=await r.json(); if(d?.bbox&&Array.isArray(d?.keypoints)) poseMetaSingle=d; } }catch(_){}
+    try{ const r=await fetch(toMulti,{cache:"no-cache"}); if(r.ok){ const d=await r.json(); if(Array.isArray(d?.people)){ d.people.sort((a,b)=>((a.bbox?.x??0)+(a.bbox?.w??0)/2)-((b.bbox?.x??0)+(b.bbox?.w??0)/2)); poseMetaMulti=d; } } }catch(_){}
+    try{ const r=await fetch(toSingle,{cache:"no-cache"}); if(r.ok){ const d=await r.json(); if(d?.bbox&&Array.isArray(d?.keypoints)) poseMetaSingle=d; } }catch(_){}
 
     const url=new URL(location.href);
     CFG.fit    = (url.searchParams.get("fit") || document.body.dataset.fit || CFG.fit).toLowerCase();
@@ -34,6 +34,31 @@ export async function detectTargetKeys(imgEl) {
     .map(p => p.keypoints);
 }
 
+// ✅ 서버 인덱스(/target_pose)에서 미리 추출된 타겟 포즈 사용, 없으면 MoveNet 으로 검출
+//    keypoints 배열마다 .vector(정규화 벡터)를 붙여서 유사도 계산 시 재정규화 생략
+export async function loadTargetKeys(imgEl) {
+  const m = (imgEl.src || "").match(/\/matching\/(\d+)\/([^/?#]+)(?:[?#].*)?$/);
+  if (m) {
+    try {
+      const res = await fetch(`/target_pose/${m[1]}/${m[2]}`);
+      if (res.ok) {
+        const data = await res.json();
+        const people = (data.people || []).filter(p => p.keypoints && p.keypoints.length);
+        if (people.length) {
+          return people.map(p => {
+            const kp = p.keypoints;
+            if (p.valid) kp.vector = p.vector;
+            return kp;
+          });
+        }
+      }
+    } catch (err) {
+      console.warn("[target_pose] fallback to detector", err);
+    }
+  }
+  return detectTargetKeys(imgEl);
+}
+
 // ✅ 역호환 (첫 번째 사람만 반환)
 export async function detectTargetKey(imgEl) {
   const arr = await detectTargetKeys(imgEl);
@@ -8,7 +8,7 @@ import {
   updateSavingProgress
 } from "./play_overlay.js";
 import { initCameraWithFallback, resizeCanvasToVideo } from "./play_camera.js";
-import { initDetector, detectTargetKeys } from "./play_detector.js"; // ✅ 멀티포즈
+import { initDetector, loadTargetKeys } from "./play_detector.js"; // ✅ 멀티포즈
 import { startEstimationPump, startRenderLoop } from "./play_render.js";
 import "./play_target_skeleton.js";
 
@@ -25,9 +25,21 @@ let lastCaptureFolder = null;
 let capturedImages = [];
 let capturedTargets = [];
 let capturedAccuracies = [];   // ✅ 라운드별 정확도 기록
+let roundMarks = [];           // ✅ 라운드별 [카운트다운 시작 s, 캡처 s] (녹화 시작 기준, 서버 베스트 포즈 추출용)
+let recordStartedAt = null;
+let recordDuration = null;     // ✅ 녹화 길이 (s, 같은 시계) - 서버가 roundMarks 를 영상 시간으로 환산
 
 export let mediaRecorder;
-let recordedChunks = [];
+
+// ✅ 녹화 중에 조각(timeslice)마다 서버로 이어 올리기 -> 전체 영상을 메모리에 모으지 않음
+const RECORD_TIMESLICE_MS = 2000;
+const UPLOAD_CHUNK_BYTES = 1024 * 1024;
+const UPLOAD_RETRIES = 4;
+let uploadId = null;
+let uploadOffset = 0;     // 서버가 받은 바이트 수
+let queuedBytes = 0;      // 지금까지 녹화된 바이트 수
+let uploadChain = Promise.resolve();
+let uploadError = null;
 
 // ----------------------------
 // 정확도 업데이트 (렌더루프에서 호출)
@@ -42,19 +54,79 @@ export function updateAccuracy(acc) {
 // ----------------------------
 // 녹화 관련
 // ----------------------------
+function newUploadId() {
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+}
+
+function recordingTime() {
+  return recordStartedAt === null ? 0 : (performance.now() - recordStartedAt) / 1000;
+}
+
+function sleep(ms) {
+  return new Promise(r => setTimeout(r, ms));
+}
+
+// 로컬 날짜 YYYY-MM-DD (toISOString 은 UTC 라 KST 오전에는 전날이 됨)
+function localDate() {
+  const d = new Date();
+  return `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, "0")}-${String(d.getDate()).padStart(2, "0")}`;
+}
+
+// 조각 하나 전송 (서버 offset 과 어긋나면 맞춰서 이어 보냄, 실패 시 재시도)
+async function sendPart(blob) {
+  const start = uploadOffset;      // 이 blob 의 첫 바이트 위치
+  for (let attempt = 0; attempt <= UPLOAD_RETRIES; attempt++) {
+    try {
+      while (uploadOffset < start + blob.size) {
+        const from = uploadOffset - start;
+        const part = blob.slice(from, from + UPLOAD_CHUNK_BYTES);
+        const res = await fetch(`/upload_video/chunk?upload_id=${uploadId}&offset=${uploadOffset}`, {
+          method: "POST",
+          headers: { "Content-Type": "application/octet-stream" },
+          body: part
+        });
+        const data = await res.json();
+        if (res.status === 409 && typeof data.received === "number") {
+          if (data.received < start || data.received > start + blob.size) throw new Error("offset lost");
+          uploadOffset = data.received;
+          continue;
+        }
+        if (!res.ok || data.status !== "ok") throw new Error(data.message || `HTTP ${res.status}`);
+        uploadOffset = data.received;
+      }
+      return;
+    } catch (err) {
+      if (attempt === UPLOAD_RETRIES) throw err;
+      console.warn("[recording] chunk retry", attempt + 1, err);
+      await sleep(500 * (attempt + 1));
+    }
+  }
+}
+
 export async function startWebcamRecording(videoEl) {
   const stream = videoEl.srcObject;
   if (!stream) return;
 
-  recordedChunks = [];
+  uploadId = newUploadId();
+  uploadOffset = 0;
+  queuedBytes = 0;
+  uploadChain = Promise.resolve();
+  uploadError = null;
   mediaRecorder = new MediaRecorder(stream, { mimeType: "video/webm; codecs=vp9" });
 
   mediaRecorder.ondataavailable = (e) => {
-    if (e.data.size > 0) recordedChunks.push(e.data);
+    if (e.data.size <= 0) return;
+    queuedBytes += e.data.size;
+    const blob = e.data;
+    uploadChain = uploadChain
+      .then(() => (uploadError ? null : sendPart(blob)))
+      .catch(err => { uploadError = err; });
   };
 
-  mediaRecorder.start();
-  console.log("[recording] started");
+  mediaRecorder.start(RECORD_TIMESLICE_MS);
+  recordStartedAt = performance.now();
+  recordDuration = null;
+  console.log("[recording] started", uploadId);
 }
 
 export function stopWebcamRecordingAndUpload() {
@@ -66,39 +138,32 @@ export function stopWebcamRecordingAndUpload() {
     showSavingOverlay();
 
     mediaRecorder.onstop = async () => {
-      const blob = new Blob(recordedChunks, { type: "video/webm" });
-
-      const xhr = new XMLHttpRequest();
-      xhr.open("POST", "/upload_video", true);
-
-      xhr.upload.onprogress = (e) => {
-        if (e.lengthComputable) {
-          const percent = Math.round((e.loaded / e.total) * 100);
-          updateSavingProgress(percent);
-        }
-      };
-
-      xhr.onload = () => {
-        hideSavingOverlay();
-        if (xhr.status === 200) {
-          console.log("[recording] upload complete", xhr.responseText);
-          resolve();
-        } else {
-          console.error("[recording] upload failed", xhr.responseText);
-          reject(new Error("Upload failed"));
-        }
-      };
-
-      xhr.onerror = () => {
+      // 남은 조각 전송 진행률 표시
+      const timer = setInterval(() => {
+        if (queuedBytes > 0) updateSavingProgress(Math.round((uploadOffset / queuedBytes) * 100));
+      }, 200);
+
+      try {
+        await uploadChain;
+        if (uploadError) throw uploadError;
+
+        const res = await fetch(`/upload_video/complete?upload_id=${uploadId}&size=${uploadOffset}`, { method: "POST" });
+        const data = await res.json();
+        if (!res.ok || data.status !== "ok") throw new Error(data.message || `HTTP ${res.status}`);
+
+        updateSavingProgress(100);
+        console.log("[recording] upload complete", data);
+        resolve();
+      } catch (err) {
+        console.error("[recording] upload failed", err);
+        reject(err);
+      } finally {
+        clearInterval(timer);
         hideSavingOverlay();
-        reject(new Error("XHR error"));
-      };
-
-      const formData = new FormData();
-      formData.append("file", blob, "recording.webm");
-      xhr.send(formData);
+      }
     };
 
+    recordDuration = recordingTime();
     mediaRecorder.stop();
     console.log("[recording] stopped");
   });
@@ -122,6 +187,7 @@ window.addEventListener("DOMContentLoaded", async () => {
   capturedImages = [];
   capturedTargets = [];
   capturedAccuracies = [];
+  roundMarks = [];
 
   await showLoadingOverlay();
   await pickRandomTarget(targetImgEl, players);
@@ -142,11 +208,12 @@ window.addEventListener("DOMContentLoaded", async () => {
 // 라운드 실행
 // ----------------------------
 async function runRound(roundIdx, photosCount, attemptNum, videoEl, targetImgEl) {
+  // ✅ 타겟 포즈는 pickRandomTarget 의 onload 에서 이미 로드됨 (서버 인덱스)
   if (roundIdx > 1) {
     await pickRandomTarget(targetImgEl, players);
-    targetKey.value = await detectTargetKeys(targetImgEl); // ✅ 배열
-  } else {
-    targetKey.value = await detectTargetKeys(targetImgEl);
+  }
+  if (!targetKey.value || !targetKey.value.length) {
+    targetKey.value = await loadTargetKeys(targetImgEl);
   }
 
   await showRoundOverlay(roundIdx);
@@ -155,10 +222,12 @@ async function runRound(roundIdx, photosCount, attemptNum, videoEl, targetImgEl)
     startWebcamRecording(videoEl);
   }
 
+  const roundStart = recordingTime();
   startCountdown(
     10,
     document.getElementById("countdownValue"),
     async () => {
+      roundMarks.push([roundStart, recordingTime()]);
       await captureFrame(videoEl, false, roundIdx);
 
       if (roundIdx >= photosCount) {
@@ -170,14 +239,16 @@ async function runRound(roundIdx, photosCount, attemptNum, videoEl, targetImgEl)
             method: "POST",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify({
-              date: new Date().toISOString().split("T")[0],  // 오늘 날짜
+              date: localDate(),                             // 오늘 날짜 (서버는 세션의 날짜/폴더를 우선 사용)
               folder: lastCaptureFolder,                     // 캡처 폴더 번호
               player: players,
               max_image: photosCount,
               images_nm: capturedImages,                     // 저장된 캡처 이미지들
               images_ac: capturedAccuracies,                 // ✅ 라운드별 정확도
               best_ac: bestAcc.value,                        // 최고 정확도
-              targets: capturedTargets                       // 타겟 이미지 파일명들
+              targets: capturedTargets,                      // 타겟 이미지 파일명들
+              round_marks: roundMarks,                       // ✅ 라운드 구간 (녹화 시작 기준 초)
+              record_s: recordDuration                       // ✅ 같은 시계로 잰 녹화 길이
             })
           });
         } catch (err) {
@@ -222,21 +293,16 @@ async function captureFrame(videoEl, withSkeleton, roundIdx) {
 
   ctx.drawImage(videoEl, 0, 0, canvas.width, canvas.height);
 
-  const dataUrl = canvas.toDataURL("image/jpeg");
   const targetImgEl = document.getElementById("targetImage");
-  const targetSrc = targetImgEl ? targetImgEl.src.split("/").pop() : null;
+  const targetSrc = targetImgEl ? targetImgEl.src.split("?")[0].split("/").pop() : null;
 
   try {
-    const res = await fetch("/capture", {
+    // ✅ JPEG 바이트 그대로 전송 (base64 data URL 대비 ~33% 작음)
+    const blob = await new Promise(resolve => canvas.toBlob(resolve, "image/jpeg", 0.92));
+    const res = await fetch(`/capture_raw?round=${roundIdx}&attempt=${attemptNum}`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({
-        image: dataUrl,
-        skeleton: withSkeleton,
-        round: roundIdx,
-        accuracy: currentAcc,
-        attempt: attemptNum
-      }),
+      headers: { "Content-Type": "image/jpeg" },
+      body: blob,
     });
     const result = await res.json();
     console.log("[capture result]", result);
@@ -257,35 +323,56 @@ async function captureFrame(videoEl, withSkeleton, roundIdx) {
 }
 
 // ----------------------------
-// 랜덤 타겟 선택
+// 타겟 카탈로그 (/target_catalog): 인원수별 전체 타겟 + 지문 URL(?v=) -> 반복 플레이는 브라우저 캐시(immutable)에서
 // ----------------------------
-async function pickRandomTarget(targetImgEl, players) {
-  let maxRange = 20;
-  if(players === 3){
-    maxRange = 18;
-  } else if((players === 4)) {
-    maxRange = 9;
+let targetCatalog = null;
+
+function loadTargetCatalog() {
+  if (!targetCatalog) {
+    targetCatalog = fetch("/target_catalog")
+      .then(res => (res.ok ? res.json() : {}))
+      .then(data => data.groups || {})
+      .catch(() => {
+        targetCatalog = null;   // 다음 라운드에 다시 시도
+        return {};
+      });
   }
+  return targetCatalog;
+}
 
-  if (usedImages.size >= maxRange) usedImages.clear();
-
-  let randomIdx;
-  do {
-    randomIdx = Math.floor(Math.random() * maxRange) + 1;
-  } while (usedImages.has(randomIdx));
+// ----------------------------
+// 랜덤 타겟 선택 (카탈로그의 failed 가 아닌 타겟 중 이번 게임에서 안 쓴 것)
+// ----------------------------
+async function pickRandomTarget(targetImgEl, players) {
+  const groups = await loadTargetCatalog();
+  const targets = ((groups[players] || {}).targets || []).filter(t => !t.failed);
+  if (!targets.length) {
+    console.warn(`[target] no targets for players=${players}`);
+    targetKey.value = [];
+    return null;
+  }
 
-  usedImages.add(randomIdx);
+  let candidates = targets.filter(t => !usedImages.has(t.name));
+  if (!candidates.length) {
+    usedImages.clear();
+    candidates = targets;
+  }
+  const picked = candidates[Math.floor(Math.random() * candidates.length)];
+  usedImages.add(picked.name);
 
-  const url = `/static/result_images/matching/${players}/${randomIdx}.jpg`;
+  const url = picked.url;
 
   return new Promise(resolve => {
     targetImgEl.onload = async () => {
       targetImgEl.removeAttribute("data-target-key");
       window.targetKey = null;
-      targetKey.value = await detectTargetKeys(targetImgEl); // ✅ 배열
+      targetKey.value = await loadTargetKeys(targetImgEl); // ✅ 배열
       resolve(url);
     };
-    targetImgEl.onerror = () => resolve(null);
+    targetImgEl.onerror = () => {
+      targetKey.value = [];
+      resolve(null);
+    };
     targetImgEl.src = url;
   });
 }
@@ -1,4 +1,4 @@
-import { initDetector, detectTargetKeys } from "./play_detector.js";
+import { loadTargetKeys } from "./play_detector.js";
 import { drawMultiSkeleton } from "./play_utils.js";
 
 function waitImageLoaded(img) {
@@ -48,8 +48,7 @@ async function main() {
 
   try {
     await waitImageLoaded(img);
-    await initDetector();
-    const keys = await detectTargetKeys(img);
+    const keys = await loadTargetKeys(img);
 
     if (!window.targetKeyRef) window.targetKeyRef = { value: null };
     window.targetKeyRef.value = keys || [];
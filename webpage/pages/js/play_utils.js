@@ -39,6 +39,7 @@ export function drawMultiSkeleton(allKeypoints, ctx) {
 
 export function normalizeKeypoints(keypoints) {
   if (!keypoints) return null;
+  if (keypoints.vector) return keypoints.vector;  // 서버에서 미리 정규화된 타겟 포즈
   const byName = {};
   keypoints.forEach(k => (byName[k.name] = k));
 
@@ -22,11 +22,16 @@ document.addEventListener("DOMContentLoaded", function () {
     const userImage = document.getElementById("userImage");
     const targetImage = document.getElementById("targetImage");
 
+    // 화면에는 서버가 캐시한 썸네일 + 스켈레톤(/render), 확대(zoom)·저장은 원본(data-full)
     if (userImage) {
-      userImage.src = `/static/result_images/capture/${data.date}/${data.folder}/${data.images_nm[index]}`;
+      const rel = `${data.date}/${data.folder}/${data.images_nm[index]}`;
+      userImage.src = `/render/capture/${rel}?size=640&skeleton=1`;
+      userImage.dataset.full = `/static/result_images/capture/${rel}`;
     }
     if (targetImage) {
-      targetImage.src = `/static/result_images/matching/${data.player}/${data.targets[index]}`;
+      const rel = `${data.player}/${data.targets[index]}`;
+      targetImage.src = `/render/matching/${rel}?size=640&skeleton=1`;
+      targetImage.dataset.full = `/static/result_images/matching/${rel}`;
     }
 
     document.getElementById("currentAccuracy").textContent = `${data.images_ac[index]}%`;
@@ -47,6 +52,46 @@ document.addEventListener("DOMContentLoaded", function () {
     updateDisplay(currentIndex);
   });
 
+  // ---------------------------
+  // 🏆 베스트 포즈 (서버가 세션 영상 전 프레임을 채점해 라운드별 최고 프레임을 캡처로 저장)
+  //    준비되면 캡처 이미지만 베스트 프레임으로 교체 (안 되면 기존 캡처 그대로)
+  //    서버 점수는 YOLO 키포인트 기준이라 플레이 중 MoveNet 정확도와 척도가 달라 섞지 않음
+  //    -> 표시 정확도(images_ac / best_ac)는 클라이언트 값 유지, 서버 값은 result.rounds[].best.percent
+  // ---------------------------
+  const BEST_POLL_MS = 2000;
+  const BEST_POLL_MAX = 90;
+
+  async function pollBestPose(tries = 0) {
+    try {
+      const res = await fetch(`/best_pose/${data.date}/${data.folder}`);
+      if (res.status === 404) return;
+      const body = await res.json();
+      if (body.state === "done") {
+        applyBestPose(body.result);
+        return;
+      }
+      if (body.state === "error") {
+        console.warn("[best_pose]", body.error);
+        return;
+      }
+    } catch (err) {
+      console.warn("[best_pose]", err);
+    }
+    if (tries + 1 < BEST_POLL_MAX) setTimeout(() => pollBestPose(tries + 1), BEST_POLL_MS);
+  }
+
+  function applyBestPose(result) {
+    (result.rounds || []).forEach((r, i) => {
+      if (!r.best || !r.best.image || i >= total) return;
+      data.images_nm[i] = r.best.image;
+    });
+    data.best_pose = result;
+    console.log("[best_pose]", result);
+    updateDisplay(currentIndex);
+  }
+
+  if (data.best_pose) pollBestPose();
+
   // ---------------------------
   // 🎬 비디오: 최초 1회만 세팅
   // ---------------------------
@@ -269,7 +314,7 @@ document.addEventListener("DOMContentLoaded", function () {
     const open=(src)=>{ if(!isValidSrc(src)){ return; } img.src=src; reset(); modal.classList.add("open"); modal.setAttribute("aria-hidden","false"); document.body.style.overflow="hidden"; document.dispatchEvent(new Event("zoom-modal-open")); };
     const close=()=>{ modal.classList.remove("open"); modal.setAttribute("aria-hidden","true"); document.body.style.overflow=""; };
 
-    function bindZoom(el){ if(!el) return; el.addEventListener("click", ()=>{ const src=el.getAttribute("src")||el.getAttribute("data-src"); if(!isValidSrc(src)) return; open(src); }); }
+    function bindZoom(el){ if(!el) return; el.addEventListener("click", ()=>{ const src=el.getAttribute("data-full")||el.getAttribute("src")||el.getAttribute("data-src"); if(!isValidSrc(src)) return; open(src); }); }
     bindZoom(userImage); bindZoom(targetImage);
     document.querySelectorAll("[data-zoomable]").forEach(bindZoom);
 